@@ -9,5 +9,6 @@ from .serialize import *
 from .exc import *
 from .generate import *
 from .doc import *
+from .compare import *
 from .package import *
 from .s3 import set_s3_profile
\ No newline at end of file
@@ -0,0 +1,98 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Support for Apache Arrow tables and Parquet files"""
+
+from itertools import islice
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from six import text_type
+from six.moves import zip_longest
+
+# Arrow types for schema datatypes. Other datatypes, such as dates, are stored as strings
+ARROW_TYPES = {
+    'integer': pa.int64(),
+    'int': pa.int64(),
+    'number': pa.float64(),
+    'float': pa.float64(),
+}
+
+PARQUET_BATCH_SIZE = 10000  # Rows per row group when writing Parquet files
+
+
+def arrow_type(datatype):
+    return ARROW_TYPES.get(datatype, pa.string())
+
+
+def arrow_schema(headers, datatypes=None):
+    """Return an Arrow schema for the columns, from their schema datatypes"""
+
+    return pa.schema([pa.field(text_type(h), arrow_type(dt))
+                      for h, dt in zip(headers, datatypes or [None] * len(headers))])
+
+
+def arrow_array(values, type):
+    """Convert a column, either a NumPy masked array from the numpy engine or a list of values, to an
+    Arrow array. Values that can't be converted to the type, such as strings left by failed casts in a
+    numeric column, become nulls. The Arrow array of a numeric masked array shares its memory, so the
+    masked array must not be reused """
+
+    if isinstance(values, np.ma.MaskedArray):
+        if not pa.types.is_string(type):
+            return pa.array(values.data, mask=np.ma.getmaskarray(values), type=type)
+
+        values = values.tolist()
+
+    if pa.types.is_string(type):
+        return pa.array([v if v is None or isinstance(v, text_type) else text_type(v) for v in values],
+                        type=type)
+
+    try:
+        return pa.array(values, type=type, from_pandas=True)
+    except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+        pass
+
+    def convert(v):
+        try:
+            return pa.scalar(v, type=type).as_py()
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError):
+            return None
+
+    return pa.array([convert(v) for v in values], type=type)
+
+
+def record_batch(columns, schema):
+    """Return an Arrow RecordBatch from a sequence of columns, such as the values of a ColumnBatch"""
+
+    return pa.RecordBatch.from_arrays([arrow_array(c, f.type) for c, f in zip(columns, schema)],
+                                      schema=schema)
+
+
+def write_parquet(path_or_flo, headers, datatypes, gen, size=PARQUET_BATCH_SIZE):
+    """Write rows to a Parquet file, like write_csv(), with a row group for every size rows"""
+
+    schema = arrow_schema(headers, datatypes)
+
+    with pq.ParquetWriter(path_or_flo, schema) as w:
+        for rows in iter(lambda: list(islice(gen, size)), []):
+            cols = list(zip_longest(*rows))
+            n = len(rows)
+
+            w.write_table(pa.Table.from_batches([
+                record_batch([cols[i] if i < len(cols) else [None] * n for i in range(len(headers))], schema)
+            ]))
+
+
+def parquet_rows(path_or_flo, size=PARQUET_BATCH_SIZE):
+    """Yield the column names of a Parquet file, then each of its rows as a list, like a row generator
+    for a CSV file"""
+
+    pf = pq.ParquetFile(path_or_flo)
+
+    yield list(pf.schema_arrow.names)
+
+    for b in pf.iter_batches(batch_size=size):
+        for row in zip(*[c.to_pylist() for c in b.columns]):
+            yield list(row)
@@ -0,0 +1,149 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Checkpoints for the resources of a package build. A checkpoint records the fingerprints of a resource's
+source and schema, and the checksum of the data file built from them. It is written after the data file is
+complete, so a resource with a checkpoint that matches the current source, schema and data file doesn't
+have to be built again."""
+
+import json
+from hashlib import sha1
+from os import makedirs, remove
+from os.path import exists, isdir, join
+
+try:
+    from os import replace
+except ImportError:  # Python 2, where rename() replaces a file, except on Windows
+    from os import rename as replace
+
+CHECKPOINT_DIR = '.checkpoints'  # In the package directory
+
+CHUNK_SIZE = 1024 ** 2
+
+
+def fingerprint(*parts):
+    """Return a hex digest of JSON serializable parts"""
+    return sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+def file_checksum(path):
+    """Return the SHA1 hex digest of a file's contents, or None if the file doesn't exist"""
+
+    if not exists(path):
+        return None
+
+    h = sha1()
+
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+
+    return h.hexdigest()
+
+
+def env_fingerprint(env):
+    """Return a fingerprint of the names in an env, like the dict of the package's lib module, and the source
+    files of the modules that define them, so changing the code of a transform or program changes it"""
+    import inspect
+
+    files = set()
+
+    for v in (env or {}).values():
+        try:
+            files.add(inspect.getsourcefile(inspect.getmodule(v)))
+        except TypeError:  # Builtins and values without a module
+            pass
+
+    h = sha1(json.dumps(sorted(env or {})).encode('utf8'))
+
+    for path in sorted(f for f in files if f):
+        h.update(path.encode('utf8'))
+        h.update((file_checksum(path) or '').encode('ascii'))
+
+    return h.hexdigest()
+
+
+def checkpoint_name(name):
+    """Return the path of a resource's checkpoint, relative to the package root"""
+    return CHECKPOINT_DIR + '/' + name + '.json'
+
+
+def checkpoint_path(package_dir, name):
+    return join(package_dir, checkpoint_name(name))
+
+
+class Checkpoint(object):
+    """The state of one resource in a package build"""
+
+    def __init__(self, name, fingerprints, checksum=None):
+        """
+        :param name: Resource name
+        :param fingerprints: A dict of fingerprints of the resource's inputs, from Resource.build_fingerprints()
+        :param checksum: SHA1 hex digest of the data file
+
+        """
+        self.name = name
+        self.fingerprints = dict(fingerprints)
+        self.checksum = checksum
+
+    def as_dict(self):
+        return dict(name=self.name, fingerprints=self.fingerprints, checksum=self.checksum)
+
+    def dumps(self):
+        return json.dumps(self.as_dict(), indent=4, sort_keys=True)
+
+    @classmethod
+    def loads(cls, text):
+        """Return a checkpoint from its JSON text, or None if the text is empty or not a checkpoint"""
+
+        try:
+            d = json.loads(text.decode('utf8') if isinstance(text, bytes) else text)
+            return cls(d['name'], d['fingerprints'], d.get('checksum'))
+        except (AttributeError, TypeError, ValueError, KeyError):
+            return None
+
+    def write(self, package_dir):
+        """Write the checkpoint, replacing the old one in one step, so a checkpoint is never partly written"""
+
+        path = checkpoint_path(package_dir, self.name)
+
+        if not isdir(join(package_dir, CHECKPOINT_DIR)):
+            makedirs(join(package_dir, CHECKPOINT_DIR))
+
+        with open(path + '.tmp', 'w') as f:
+            f.write(self.dumps())
+
+        replace(path + '.tmp', path)
+
+    @classmethod
+    def read(cls, package_dir, name):
+        """Return the checkpoint for a resource, or None if it has none"""
+
+        try:
+            with open(checkpoint_path(package_dir, name)) as f:
+                return cls.loads(f.read())
+        except (IOError, OSError):
+            return None
+
+    @staticmethod
+    def remove(package_dir, name):
+
+        path = checkpoint_path(package_dir, name)
+
+        if exists(path):
+            remove(path)
+
+    def matches(self, fingerprints):
+        """Return True if the checkpoint has the given fingerprints, and so was built from the same inputs.
+        A fingerprint that is None, like that of a source without a version, never matches"""
+
+        fingerprints = dict(fingerprints)
+
+        return (self.checksum is not None and None not in fingerprints.values() and
+                None not in self.fingerprints.values() and self.fingerprints == fingerprints)
+
+    def is_current(self, fingerprints, data_path):
+        """Return True if the checkpoint has the given fingerprints, and the data file has the checksum
+        recorded in the checkpoint"""
+
+        return self.matches(fingerprints) and file_checksum(data_path) == self.checksum
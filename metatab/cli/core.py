@@ -113,7 +113,7 @@ def dump_resources(doc):
         prt(r.name, r.resolved_url)
 
 
-def dump_resource(doc, name, lines=None):
+def dump_resource(doc, name, lines=None, compile_rows=False):
     import unicodecsv as csv
     import sys
     from itertools import islice
@@ -126,11 +126,14 @@ def dump_resource(doc, name, lines=None):
     if not r:
         err("Did not get resource for name '{}'".format(name))
 
+    r.compile_rows = compile_rows
+
     # WARNING! This code will not generate errors if line is set ( as for the -H
     # option because the errors are tansfered from the row pipe to the resource after the
     # iterator is exhausted
 
-    gen = islice(r, 1, lines)
+    # Without a line limit, large package CSV files are read in parallel, when rows are compiled
+    gen = islice(r, 1, lines) if lines else r.iter_rows()
 
     def dump_errors(error_set):
         for col, errors in error_set.items():
@@ -184,6 +187,35 @@ def dump_schema(doc, name):
     prt(tabulate(rows, header))
 
 
+def dump_diff(diffs):
+    """Print the output of metatab.compare.diff()"""
+
+    def term_str(t):
+        return "{}: {}".format(t.qualified_term, t.value)
+
+    for section_name, d in diffs.items():
+        prt(section_name.title())
+
+        for t in d['removed']:
+            prt('  - ' + term_str(t))
+
+        for t in d['added']:
+            prt('  + ' + term_str(t))
+
+        for ta, tb in d['changed']:
+            prt('  ~ ' + term_str(ta))
+
+            if ta.value != tb.value:
+                prt('      value: {} -> {}'.format(ta.value, tb.value))
+
+            a_props = {c.record_term_lc: c.value for c in ta.children if c.is_terminal}
+            b_props = {c.record_term_lc: c.value for c in tb.children if c.is_terminal}
+
+            for k in sorted(set(a_props) | set(b_props)):
+                if a_props.get(k) != b_props.get(k):
+                    prt('      {}: {} -> {}'.format(k, a_props.get(k), b_props.get(k)))
+
+
 def get_table(doc, name):
     t = doc.find_first('Root.Table', value=name)
 
@@ -201,10 +233,11 @@ def get_table(doc, name):
 
 PACKAGE_PREFIX = '_packages'
 
-def make_excel_package(file, cache, env, skip_if_exists):
+def make_excel_package(file, cache, env, skip_if_exists, compile_rows=False):
     from metatab.package import ExcelPackage
 
     p = ExcelPackage(file, callback=prt, cache=cache, env=env)
+    p.compile_rows = compile_rows
     prt('Making Excel Package')
     if not p.exists(PACKAGE_PREFIX) or not skip_if_exists:
         url = p.save(PACKAGE_PREFIX)
@@ -218,14 +251,15 @@ def make_excel_package(file, cache, env, skip_if_exists):
     return p, url, created
 
 
-def make_zip_package(file, cache, env, skip_if_exists):
+def make_zip_package(file, cache, env, skip_if_exists, resume=False, compile_rows=False):
 
     from metatab.package import ZipPackage
 
     p = ZipPackage(file, callback=prt, cache=cache, env=env)
+    p.compile_rows = compile_rows
     prt('Making ZIP Package')
     if not p.exists(PACKAGE_PREFIX) or not skip_if_exists:
-        url = p.save(PACKAGE_PREFIX)
+        url = p.save(PACKAGE_PREFIX, resume=resume)
         prt("Packaged saved to: {}".format(url))
         created = True
     elif p.exists(PACKAGE_PREFIX):
@@ -236,18 +270,21 @@ def make_zip_package(file, cache, env, skip_if_exists):
     return p, url, created
 
 
-def make_filesystem_package(file, cache, env, skip_if_exists):
+def make_filesystem_package(file, cache, env, skip_if_exists, resume=False, processes=1, compile_rows=False):
     from metatab.package import FileSystemPackage
 
     p = FileSystemPackage(file, callback=prt, cache=cache, env=env)
 
+    p.build_processes = processes
+    p.compile_rows = compile_rows
+
     if skip_if_exists is None:
         skip_if_exists = p.is_older_than_metatada(PACKAGE_PREFIX)
 
     if not p.exists(PACKAGE_PREFIX) or not skip_if_exists:
         prt('Making Filesystem Package ',
             '; existing package is older than metadata {}'.format(file) if (p.exists(PACKAGE_PREFIX) and not skip_if_exists) else '')
-        url = p.save(PACKAGE_PREFIX)
+        url = p.save(PACKAGE_PREFIX, resume=resume)
         prt("Packaged saved to: {}".format(url))
         created = True
     elif p.exists(PACKAGE_PREFIX):
@@ -258,6 +295,24 @@ def make_filesystem_package(file, cache, env, skip_if_exists):
     return p, url, created
 
 
+def make_parquet_package(file, cache, env, skip_if_exists, compile_rows=False):
+    from metatab.package import ParquetPackage
+
+    p = ParquetPackage(file, callback=prt, cache=cache, env=env)
+    p.compile_rows = compile_rows
+    prt('Making Parquet Package')
+    if not p.exists(PACKAGE_PREFIX) or not skip_if_exists:
+        url = p.save(PACKAGE_PREFIX)
+        prt("Packaged saved to: {}".format(url))
+        created = True
+    elif p.exists(PACKAGE_PREFIX):
+        prt("Parquet Package already exists")
+        created = False
+        url = join(p.save_path(PACKAGE_PREFIX).rstrip('/'), DEFAULT_METATAB_FILE)
+
+    return p, url, created
+
+
 def make_csv_package(file, cache, env, skip_if_exists):
 
     from metatab.package import CsvPackage
@@ -275,14 +330,14 @@ def make_csv_package(file, cache, env, skip_if_exists):
 
     return p, url, created
 
-def make_s3_package(file, url, cache,  env, acl, skip_if_exists):
+def make_s3_package(file, url, cache,  env, acl, skip_if_exists, resume=False):
     from metatab.package import S3Package
 
     p = S3Package(file, callback=prt, cache=cache, env=env, save_url=url, acl=acl)
 
     prt('Making S3 Package')
     if not p.exists() or not skip_if_exists:
-        url = p.save()
+        url = p.save(resume=resume)
         prt("Packaged saved to: {}".format(url))
         created = True
     elif p.exists():
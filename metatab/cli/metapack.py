@@ -20,7 +20,8 @@ import six
 from metatab import _meta, DEFAULT_METATAB_FILE, resolve_package_metadata_url, MetatabDoc, ConversionError
 from metatab.cli.core import prt, err, warn, dump_resource, dump_resources, metatab_info, find_files, \
     get_lib_module_dict, write_doc, datetime_now, \
-    make_excel_package, make_filesystem_package, make_s3_package, make_csv_package, make_zip_package, update_name
+    make_excel_package, make_filesystem_package, make_s3_package, make_csv_package, make_zip_package, update_name, \
+    make_parquet_package
 from metatab.util import make_metatab_file
 from rowgenerators import get_cache, RowGenerator, SelectiveRowGenerator, SourceError, Url
 from rowgenerators.util import clean_cache
@@ -69,6 +70,9 @@ def metapack():
     build_group.add_argument('-s', '--schemas', default=False, action='store_true',
                              help='Rebuild the schemas for files referenced in the resource section')
 
+    build_group.add_argument('--stats', default=False, action='store_true',
+                             help='Compute statistics for the columns of each resource and store them in the schema')
+
     build_group.add_argument('-d', '--datapackage', action='store_true', default=False,
                              help="Write a datapackage.json file adjacent to the metatab file")
 
@@ -78,6 +82,19 @@ def metapack():
     build_group.add_argument('-F', '--force', action='store_true', default=False,
                              help='Force some operations, like updating the name and building packages')
 
+    build_group.add_argument('-R', '--resume', action='store_true', default=False,
+                             help='Rebuild packages even if they are newer than the metadata, only building the '
+                                  'resources that are missing, failed, or have changed since the last build')
+
+    build_group.add_argument('--compile', default=False, action='store_true',
+                             help='Cast rows with a row processor compiled from the schema, where it can be '
+                                  "compiled, rather than with rowpipe's RowProcessor. Faster, and required for "
+                                  'reading package CSV files in parallel')
+
+    build_group.add_argument('-j', '--jobs', type=int, default=1,
+                             help='Build the resources of filesystem packages in this many processes, running '
+                                  "resources that don't depend on each other at the same time")
+
     ##
     ## Derived Package Group
 
@@ -95,6 +112,9 @@ def metapack():
     derived_group.add_argument('-v', '--csv', action='store_true', default=False,
                                help='Create a CSV archive from a metatab file')
 
+    derived_group.add_argument('--parquet', action='store_true', default=False,
+                               help='Create a filesystem package with the resources stored as Parquet files')
+
 
     ##
     ## QueryPackage Group
@@ -230,6 +250,11 @@ def metatab_build_handler(m):
 
         process_schemas(m.mt_file, cache=m.cache, clean=m.args.clean)
 
+    if m.args.stats:
+        update_name(m.mt_file, fail_on_missing=False, report_unchanged=False)
+
+        process_stats(m.mt_file, cache=m.cache)
+
     if m.args.datapackage:
         update_name(m.mt_file, fail_on_missing=False, report_unchanged=False)
 
@@ -274,17 +299,25 @@ def metatab_derived_handler(m, skip_if_exists=None):
             (hasattr(m.args, 'filesystem') and m.args.filesystem is not False) ):
         update_name(m.mt_file, fail_on_missing=False, report_unchanged=False)
 
-    if m.args.force:
+    if m.args.force or getattr(m.args, 'resume', False):
         skip_if_exists = False
 
+    # Unless forced, packages only rebuild the resources that have changed since the last build
+    resume = not m.args.force
+
+    compile_rows = getattr(m.args, 'compile', False)
+
     try:
 
         # Always create a filesystem package before ZIP or Excel, so we can use it as a source for
         # data for the other packages. This means that Transform processes and programs only need
         # to be run once.
-        if any([m.args.filesystem, m.args.excel, m.args.zip]):
+        parquet = hasattr(m.args, 'parquet') and m.args.parquet is not False
 
-            _, url, created = make_filesystem_package(m.mt_file, m.cache, env, skip_if_exists)
+        if any([m.args.filesystem, m.args.excel, m.args.zip, parquet]):
+
+            _, url, created = make_filesystem_package(m.mt_file, m.cache, env, skip_if_exists, resume=resume,
+                                                      processes=getattr(m.args, 'jobs', 1), compile_rows=compile_rows)
             create_list.append(('fs', url, created))
 
             m.mt_file = url
@@ -292,17 +325,23 @@ def metatab_derived_handler(m, skip_if_exists=None):
             env = {}  # Don't need it anymore, since no more programs will be run.
 
         if m.args.excel is not False:
-            _, url, created = make_excel_package(m.mt_file, m.cache, env, skip_if_exists)
+            _, url, created = make_excel_package(m.mt_file, m.cache, env, skip_if_exists, compile_rows=compile_rows)
             create_list.append(('xlsx', url, created))
 
         if m.args.zip is not False:
-            _, url, created = make_zip_package(m.mt_file, m.cache, env, skip_if_exists)
+            _, url, created = make_zip_package(m.mt_file, m.cache, env, skip_if_exists, resume=resume,
+                                               compile_rows=compile_rows)
             create_list.append(('zip', url, created))
 
         if m.args.csv is not False:
             _, url, created = make_csv_package(m.mt_file, m.cache, env, skip_if_exists)
             create_list.append(('csv', url, created))
 
+        if parquet:
+            _, url, created = make_parquet_package(m.mt_file, m.cache, env, skip_if_exists,
+                                                   compile_rows=compile_rows)
+            create_list.append(('parquet', url, created))
+
     except PackageError as e:
         err("Failed to generate package: {}".format(e))
 
@@ -321,7 +360,7 @@ def metatab_query_handler(m):
             return
 
         if m.resource:
-            dump_resource(doc, m.resource, limit)
+            dump_resource(doc, m.resource, limit, compile_rows=getattr(m.args, 'compile', False))
         else:
             dump_resources(doc)
 
@@ -466,6 +505,46 @@ def process_schemas(mt_file, cache, clean=False):
     write_doc(doc, mt_file)
 
 
+def _resource_stats(args):
+    """Compute the statistics for one resource, in a worker process. Any error is returned, so one resource
+    that can't be read doesn't stop the others"""
+
+    mt_file, name = args
+
+    try:
+        doc = MetatabDoc(mt_file, cache=get_cache('metapack'))
+
+        # Worker processes can't start their own pool, so each resource is read by one process
+        return name, doc.resource(name, env=get_lib_module_dict(doc)).compute_stats(write=False, parallel=False), None
+    except Exception as e:
+        return name, None, '{}: {}'.format(type(e).__name__, e)
+
+
+def process_stats(mt_file, cache, processes=None):
+    """Compute column statistics for all of the resources in parallel, one resource per process, and store
+    them in the schema"""
+    from multiprocessing import Pool
+
+    doc = MetatabDoc(mt_file, cache=cache)
+
+    names = [r.name for r in doc.resources() if r.headers]
+
+    pool = Pool(processes)
+
+    try:
+        for name, stats, error in pool.imap_unordered(_resource_stats, [(mt_file, name) for name in names]):
+            if error:
+                warn("Failed to compute statistics for '{}': {}".format(name, error))
+            else:
+                prt("Computed statistics for '{}'".format(name))
+                doc.resource(name).write_stats(stats)
+    finally:
+        pool.close()
+        pool.join()
+
+    write_doc(doc, mt_file)
+
+
 def add_single_resource(doc, ref, cache, seen_names):
     from metatab.util import slugify
 
@@ -14,8 +14,10 @@ CLI program for storing pacakges in CKAN
 """
 
 import sys
+from itertools import islice
 
 from metatab import _meta, DEFAULT_METATAB_FILE, resolve_package_metadata_url, MetatabDoc
+from metatab.doc import BATCH_SIZE
 from metatab.util import slugify
 from os import getcwd
 from os.path import join
@@ -26,6 +28,17 @@ from sqlalchemy import create_engine, MetaData
 from sqlalchemy.orm import create_session
 from .core import prt, err
 
+# Positional parameter markers for each DBAPI paramstyle. The drivers with the pyformat and named styles
+# also take the format and numeric markers, with a sequence of values
+PARAM_MARKERS = {
+    'qmark': '?',
+    'format': '%s',
+    'pyformat': '%s',
+    'numeric': ':{}',
+    'named': ':{}'
+}
+
+
 class MetapackCliMemo(object):
     def __init__(self, args):
         self.cwd = getcwd()
@@ -114,10 +127,29 @@ class Database(object):
         return Table(table_name, self.metadata, autoload=True, autoload_with=self.engine)
 
     def bulk_insert(self, table_name, rows):
+        """Insert rows, each a sequence of values in the order of the table's columns after the primary key,
+        with the DBAPI's executemany(), so the rows don't have to be converted to mappings"""
 
         table = self.get_table(table_name)
 
-        self.engine.execute(table.insert(), rows)
+        columns = [c for c in table.columns if not c.primary_key]
+
+        preparer = self.engine.dialect.identifier_preparer
+        marker = PARAM_MARKERS[self.engine.dialect.paramstyle]
+
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            preparer.format_table(table),
+            ', '.join(preparer.format_column(c) for c in columns),
+            ', '.join(marker.format(i) for i in range(1, len(columns) + 1)))
+
+        conn = self.engine.raw_connection()
+
+        try:
+            cursor = conn.cursor()
+            cursor.executemany(sql, rows)
+            conn.commit()
+        finally:
+            conn.close()
 
 
 def metasql():
@@ -213,7 +245,10 @@ def insert_data(m, doc, resource_name, db):
 
     r = doc.resource(name=resource_name)
 
-    rows = list(r.iterdict)
+    # make_table() creates the table with the resource's columns in order, so the rows are inserted
+    # positionally, one batch at a time
+    rows = islice(r, 1, None)
 
-    db.bulk_insert(table_name, rows)
+    for batch in iter(lambda: list(islice(rows, BATCH_SIZE)), []):
+        db.bulk_insert(table_name, batch)
 
@@ -322,7 +322,11 @@ def create_packages(m, second_stage_mtfile, distupdated=None):
         # data for the other packages. This means that Transform processes and programs only need
         # to be run once.
 
-        _, third_stage_mtfile, created = make_filesystem_package(second_stage_mtfile, m.cache, get_lib_module_dict(doc), skip_if_exists)
+        # Unless forced, packages only rebuild the resources that have changed since the last build
+        resume = not m.args.force
+
+        _, third_stage_mtfile, created = make_filesystem_package(second_stage_mtfile, m.cache, get_lib_module_dict(doc),
+                                                                 skip_if_exists, resume=resume)
 
         if m.args.excel is not False:
             _, ex_url, created = make_excel_package(third_stage_mtfile, m.cache, env, skip_if_exists)
@@ -330,14 +334,15 @@ def create_packages(m, second_stage_mtfile, distupdated=None):
                 urls.append(('excel', s3.write(f.read(), basename(ex_url), acl)))
 
         if m.args.zip is not False:
-            _, zip_url, created = make_zip_package(third_stage_mtfile, m.cache, env, skip_if_exists)
+            _, zip_url, created = make_zip_package(third_stage_mtfile, m.cache, env, skip_if_exists, resume=resume)
             with open(zip_url, mode='rb') as f:
                 urls.append(('zip', s3.write(f.read(), basename(zip_url), acl)))
 
         # Note! This is a FileSystem package on the remote S3 bucket, not locally
         if m.args.fs is not False:
             try:
-                fs_p, fs_url, created = make_s3_package(third_stage_mtfile, m.args.s3, m.cache, env, acl, skip_if_exists)
+                fs_p, fs_url, created = make_s3_package(third_stage_mtfile, m.args.s3, m.cache, env, acl, skip_if_exists,
+                                                        resume=resume)
             except NoCredentialsError:
                 print(getenv('AWS_SECRET_ACCESS_KEY'))
                 err("Failed to find boto credentials for S3. "
@@ -10,7 +10,7 @@ import json
 import sys
 
 from metatab import _meta, DEFAULT_METATAB_FILE, resolve_package_metadata_url, MetatabDoc
-from metatab.cli.core import prt, new_metatab_file, err, dump_resource, dump_resources, dump_schema
+from metatab.cli.core import prt, new_metatab_file, err, dump_resource, dump_resources, dump_schema, dump_diff
 from rowgenerators import get_cache, Url
 from rowgenerators.util import clean_cache
 
@@ -53,6 +53,10 @@ def metatab():
     g.add_argument('-S', '--schema',
                    help='Dump the schema for one named resource')
 
+    g.add_argument('--diff', nargs=2, metavar=('A', 'B'),
+                   help='Compare two Metatab files and print the terms that were added, removed or changed. '
+                        'Exits with 1 if there are differences, and 2 if there is an error')
+
     parser.add_argument('-d', '--show-declaration', default=False, action='store_true',
                         help='Parse a declaration file and print out declaration dict. Use -j or -y for the format')
 
@@ -105,6 +109,27 @@ def metatab():
 
         exit(0)
 
+    if args.diff:
+        from metatab.compare import diff
+        from metatab.exc import MetatabError
+
+        docs = []
+
+        for ref in args.diff:
+            try:
+                package_url, metadata_url = resolve_package_metadata_url(ref)
+                docs.append(MetatabDoc(metadata_url, cache=cache))
+            except (IOError, OSError, MetatabError) as e:
+                # Not err(), which exits with 1, the same as finding differences
+                sys.stderr.write("ERROR: Failed to open '{}': {}\n".format(ref, e))
+                exit(2)
+
+        diffs = diff(*docs)
+
+        dump_diff(diffs)
+
+        exit(1 if diffs else 0)
+
     if args.show_declaration:
 
         doc = MetatabDoc()
@@ -0,0 +1,124 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""
+Structural comparison of two Metatab documents
+"""
+
+from collections import Counter, OrderedDict
+
+from .parser import Term
+
+__all__ = ['diff']
+
+
+def _identity(t, repeated):
+    """Return the value that identifies a term among the other terms with the same qualified name. Terms
+    that appear only once, like Root.Title, are identified by name alone, so a change in the value is
+    reported as a change and not as a removal and an addition."""
+
+    name = t.get_value('name')
+
+    if name is not None and t.term_value_name.lower() != 'name':
+        return name
+    elif t.qualified_term in repeated:
+        return t.value
+    else:
+        return None
+
+
+def _keyed(terms, repeated):
+    """Return an OrderedDict of terms, keyed by qualified name, identity and a count of prior terms with the
+    same name and identity"""
+
+    seen = Counter()
+    d = OrderedDict()
+
+    for t in terms:
+        k = (t.qualified_term, _identity(t, repeated))
+        d[k + (seen[k],)] = t
+        seen[k] += 1
+
+    return d
+
+
+def _properties(t, exclude):
+    return Counter((c.record_term_lc, c.value) for c in t.children
+                   if c.is_terminal and c.qualified_term not in exclude)
+
+
+def _diff_terms(a_terms, b_terms, exclude, result):
+    """Align two lists of terms by key, and add the differences to the result. Matched terms with
+    equal fingerprints are skipped without looking at their children. """
+
+    a_terms = [t for t in a_terms if t.qualified_term not in exclude]
+    b_terms = [t for t in b_terms if t.qualified_term not in exclude]
+
+    a_count = Counter(t.qualified_term for t in a_terms)
+    b_count = Counter(t.qualified_term for t in b_terms)
+    repeated = set(k for k, v in (a_count + b_count).items() if a_count[k] > 1 or b_count[k] > 1)
+
+    a_keyed = _keyed(a_terms, repeated)
+    b_keyed = _keyed(b_terms, repeated)
+
+    for k, ta in a_keyed.items():
+
+        tb = b_keyed.get(k)
+
+        if tb is None:
+            result['removed'].append(ta)
+            continue
+
+        if ta.fingerprint(exclude) == tb.fingerprint(exclude):
+            continue
+
+        if ta.value != tb.value or _properties(ta, exclude) != _properties(tb, exclude):
+            result['changed'].append((ta, tb))
+
+        _diff_terms([c for c in ta.children if not c.is_terminal],
+                    [c for c in tb.children if not c.is_terminal],
+                    exclude, result)
+
+    for k, tb in b_keyed.items():
+        if k not in a_keyed:
+            result['added'].append(tb)
+
+
+def diff(doc_a, doc_b, exclude=None):
+    """Compare two Metatab documents and return the differences per section.
+
+    Terms are matched by qualified name and identity: the Name property if the term has one, or the term
+    value for terms that appear more than once, such as Table and Column terms. Matched terms with equal
+    fingerprints are skipped, so the comparison takes time roughly linear in the size of the documents.
+
+    :param doc_a: The original document
+    :param doc_b: The new document
+    :param exclude: Qualified names of terms to ignore. Defaults to FINGERPRINT_EXCLUDE_TERMS
+    :return: An OrderedDict, keyed by lowercased section name, of dicts with 'added' and 'removed' lists
+    of terms and a 'changed' list of (term_a, term_b) tuples. Only sections with differences are included.
+
+    """
+    from .doc import FINGERPRINT_EXCLUDE_TERMS
+
+    if exclude is None:
+        exclude = FINGERPRINT_EXCLUDE_TERMS
+
+    exclude = frozenset(Term.normalize_term(e) for e in exclude)
+
+    section_names = list(doc_a.sections.keys()) + [e for e in doc_b.sections.keys() if e not in doc_a.sections]
+
+    diffs = OrderedDict()
+
+    for name in section_names:
+
+        a_terms = doc_a.sections[name].terms if name in doc_a.sections else []
+        b_terms = doc_b.sections[name].terms if name in doc_b.sections else []
+
+        result = {'added': [], 'removed': [], 'changed': []}
+
+        _diff_terms(a_terms, b_terms, exclude, result)
+
+        if result['added'] or result['removed'] or result['changed']:
+            diffs[name] = result
+
+    return diffs
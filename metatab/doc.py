@@ -21,6 +21,7 @@ from rowgenerators.exceptions import SourceError
 from rowgenerators.util import reparse_url, parse_url_to_dict, unparse_url_dict
 from rowpipe import RowProcessor
 from rowgenerators import Url
+from os import stat
 from os.path import dirname, abspath, isdir, getmtime
 from time import time
 
@@ -56,6 +57,12 @@ def resolve_package_metadata_url(ref):
         metadata_url = reparse_url(ref)
         package_url = reparse_url(ref, path=dirname(parse_url_to_dict(ref)['path']), fragment=False) + '/'
 
+    elif du.target_format == 'parquet':
+        # A data file in a ParquetPackage, in the package's data directory
+        package_path = dirname(dirname(parse_url_to_dict(ref)['path']))
+        package_url = reparse_url(ref, path=package_path, fragment=False) + '/'
+        metadata_url = reparse_url(ref, path=join(package_path, DEFAULT_METATAB_FILE), fragment=False)
+
     elif du.target_format == 'csv':
         package_url = reparse_url(ref, fragment=False)
         metadata_url = reparse_url(ref)
@@ -96,6 +103,64 @@ def open_package(ref, cache=None, clean_cache=False):
 
 EMPTY_SOURCE_HEADER = '_NONE_'  # Marker for a column that is in the destination table but not in the source
 
+# Terms that change without changing the meaning of the metadata, left out of MetatabDoc.fingerprint()
+FINGERPRINT_EXCLUDE_TERMS = ['Root.Modified', 'Root.GitUrl']
+
+BATCH_SIZE = 10000  # Default number of rows in each Resource.iter_batches() batch
+
+
+class RowBatch(list):
+    """A list of rows from Resource.iter_batches(), with the column headers and the casting errors"""
+
+    def __init__(self, rows, headers, errors):
+        super(RowBatch, self).__init__(rows)
+        self.headers = headers
+        self.errors = errors
+
+
+class ColumnBatch(OrderedDict):
+    """A dict of column header to column values from Resource.iter_batches(), with the casting errors.
+    If headers are duplicated, the dict has only the last of the columns, but `columns` has all of them,
+    in the same order as `headers` """
+
+    def __init__(self, columns, headers, errors):
+        """
+        :param columns: A list of column values, one for each header, or a dict of header to column values
+        :param headers: Column headers
+        :param errors: Casting errors, a dict of header to a list of messages
+        """
+
+        self.columns = list(columns.values() if isinstance(columns, dict) else columns)
+        super(ColumnBatch, self).__init__(zip(headers, self.columns))
+        self.headers = headers
+        self.errors = errors
+
+    @property
+    def n_rows(self):
+        return len(self.columns[0]) if self.columns else 0
+
+
+class ProjectedRows(object):
+    """Iterate over the rows of a RowProcessor that pass the tests, which are predicates on the cast values,
+    keeping only the values at the given indexes"""
+
+    def __init__(self, rp, indexes, tests=None):
+        from .predicate import filter_rows
+
+        self.rp = rp
+        self.indexes = indexes
+        self.rows = filter_rows(rp, tests)
+
+    def __iter__(self):
+        indexes = self.indexes
+
+        for row in self.rows:
+            yield [row[i] for i in indexes]
+
+    @property
+    def errors(self):
+        return self.rp.errors
+
 
 class Resource(Term):
     _common_properties = 'url name description schema'.split()
@@ -115,12 +180,37 @@ class Resource(Term):
         self.term_value_name = term.term_value_name
         self.children = term.children
 
+        # Children are shared with the original term, so the memos must be too. A change to either
+        # clears the memos of both.
+        self._memo = term._memo
+
         self.env = env if env is not None else {}
 
         self.errors = {}  # Typecasting errors
 
+        self._projection = None  # Column headers selected with select(), or None for all columns
+        self._predicates = ()  # Predicates from where()
+
+        # A RowCache for the cast rows of a local source. If None, the cache in the metapack cache is used
+        # when METAPACK_ROW_CACHE_SIZE is set. If False, rows are never cached
+        self.row_cache = None
+
+        # If True, cast with a row processor compiled from the schema, when it can be compiled, rather than
+        # with rowpipe's RowProcessor. Required for reading in parallel
+        self.compile_rows = False
+
         self.__initialised = True
 
+    def _invalidate(self):
+        """The resource shares its children with the original term, so changes to one must also
+        clear the memos of the other"""
+        super(Resource, self)._invalidate()
+
+        orig_term = self.__dict__.get('_orig_term')  # Not set while the constructor is running
+
+        if orig_term is not None:
+            orig_term._invalidate()
+
     @property
     def _self_url(self):
         try:
@@ -131,7 +221,24 @@ class Resource(Term):
 
     def _resolved_url(self):
         """Return a URL that properly combines the base_url and a possibly relative
-        resource url"""
+        resource url. Memoized until the resource term changes, and for the current base url and resource url.
+        Wrappers of the same term share the memo, but each has its own value, so the resource url is part of
+        the key."""
+
+        key = (self._self_url, self.base_url, None if self.base_url else str(self.doc.package_url))
+
+        memo = self._memo.get('resolved_url')
+
+        if memo is not None and memo[0] == key:
+            return memo[1]
+
+        url = self._resolve_url()
+
+        self._memo['resolved_url'] = (key, url)
+
+        return url
+
+    def _resolve_url(self):
 
         from rowgenerators.generators import PROTO_TO_SOURCE_MAP
 
@@ -170,17 +277,28 @@ class Resource(Term):
         """Maps values to attributes.
         Only called if there *isn't* an attribute with this name
         """
-        try:
-            # Normal child
-            return self.__getitem__(item).value
-        except KeyError:
-            if item.lower() in self._common_properties:
-                return None
-            elif item == 'resolved_url':
-                # Looks like properties don't work properly with this method
-                return self._resolved_url()
-            else:
-                raise AttributeError(item)
+
+        if item.startswith('_'):
+            # Private attributes that aren't set, such as while the constructor is running
+            raise AttributeError(item)
+
+        if item == 'resolved_url':
+            # Looks like properties don't work properly with this method
+            return self._resolved_url()
+
+        item_lc = item.lower()
+
+        if item_lc == self.term_value_name.lower():
+            return self.value
+
+        c = self._child_index().get(item_lc)
+
+        if c is not None:
+            return c.value
+        elif item_lc in self._common_properties:
+            return None
+        else:
+            raise AttributeError(item)
 
     def __setattr__(self, item, value):
         """ """
@@ -256,8 +374,7 @@ class Resource(Term):
         t, _ = self.schema_term
 
         if t:
-            return [self._name_for_col_term(c, i)
-                    for i, c in enumerate(t.children, 1) if c.term_is("Table.Column")]
+            return [self._name_for_col_term(c, i) for i, c in self._column_terms()]
         else:
             return None
 
@@ -319,15 +436,18 @@ class Resource(Term):
 
             t = Table(self.get_value('name'))
 
+            included = set(id(c) for i, c in self._processor_columns())
+
             col_n = 0
 
             for c in table_term.children:
                 if c.term_is('Table.Column'):
-                    t.add_column(self._name_for_col_term(c, col_n),
-                                 datatype=map_type(c.get_value('datatype')),
-                                 valuetype=map_type(c.get_value('valuetype')),
-                                 transform=c.get_value('transform')
-                                 )
+                    if id(c) in included:
+                        t.add_column(self._name_for_col_term(c, col_n),
+                                     datatype=map_type(c.get_value('datatype')),
+                                     valuetype=map_type(c.get_value('valuetype')),
+                                     transform=c.get_value('transform')
+                                     )
                     col_n += 1
 
             return t
@@ -337,6 +457,14 @@ class Resource(Term):
 
     @property
     def row_generator(self):
+
+        parquet_path = self._local_path('parquet')
+
+        if parquet_path:
+            # Parquet files from a ParquetPackage, which the row generators can't read
+            from .arrow import parquet_rows
+            return parquet_rows(parquet_path)
+
         d = self.properties
 
         d['url'] = self.resolved_url
@@ -361,41 +489,672 @@ class Resource(Term):
 
         return RowGenerator(**d)
 
+    def _start_line(self):
+        # There are several args for SelectiveRowGenerator, but only
+        # start is really important.
+        try:
+            return int(self.get_value('startline', 1))
+        except ValueError as e:
+            return 1
+
+    def _source_rows(self, engine='rowpipe', rows=None):
+        """Return the source rows after the start line, or the given source rows, without the rows that
+        fail the predicates that can be evaluated on source values"""
+        from .predicate import filter_rows
+
+        raw, _ = self._split_predicates(engine)
+
+        if rows is None:
+            rows = islice(self.row_generator, self._start_line(), None)
+
+        return filter_rows(rows, [p.compile(index, cast) for p, index, cast in raw]) if raw else rows
+
+    def _compiled_columns(self):
+        """Return the (header, source_index, datatype, valuetype, transform) tuples of the processor
+        columns, for compile_row_processor()"""
+
+        source_indexes = {}
+        source_index = 0
+
+        for i, c in self._all_column_terms():
+            if c.get_value('name') != EMPTY_SOURCE_HEADER:
+                source_indexes[id(c)] = source_index
+                source_index += 1
+
+        return [(self._name_for_col_term(c, i), source_indexes.get(id(c)), c.get_value('datatype'),
+                 c.get_value('valuetype'), c.get_value('transform'))
+                for i, c in self._processor_columns()]
+
+    def _row_processor(self, rows=None):
+        """Return a row processor that casts the source rows, after the start line, with the schema:
+        rowpipe's RowProcessor, or if compile_rows is set and the schema can be compiled, a CompiledRowProcessor
+
+        :param rows: Source rows to process instead of the rows from the row generator
+        """
+
+        from .rowcompile import CompiledRowProcessor, CompileError, compile_row_processor
+
+        process_row = None
+
+        if self.compile_rows:
+            try:
+                process_row = compile_row_processor(self._compiled_columns(), self.env)
+            except CompileError:
+                pass  # A datatype, value type or transform that only rowpipe understands
+
+        if process_row:
+            rp = CompiledRowProcessor(self._source_rows(rows=rows), process_row)
+        else:
+            rp = RowProcessor(self._source_rows(rows=rows),
+                              self.row_processor_table(),
+                              source_headers=self.source_headers, env=self.env)
+
+        _, post = self._split_predicates()
+
+        if self._projection is None and not post:
+            return rp
+
+        # The processor also has the columns that the transforms of the selected columns depend on, and
+        # the columns of predicates that must be evaluated after casting.
+        positions = [id(c) for i, c in self._processor_columns()]
+
+        return ProjectedRows(rp, [positions.index(id(c)) for i, c in self._column_terms()],
+                             [p.compile(positions.index(id(c))) for p, c in post])
+
     def __iter__(self):
         """Iterate over the resource's rows"""
 
         headers = self.headers
 
+        row_cache, key = self._row_cache()
+
+        if key and row_cache.get(key):
+            yield headers
+
+            for row in row_cache.rows(key):
+                yield row
+
+            self.errors = {}  # Only error-free output is cached
+            return
+
         if headers:
-            # There are several args for SelectiveRowGenerator, but only
-            # start is really important.
-            try:
-                start = int(self.get_value('startline', 1))
-            except ValueError as e:
-                start = 1
 
             yield headers
 
-            rg = RowProcessor(islice(self.row_generator, start, None),
-                              self.row_processor_table(),
-                              source_headers=self.source_headers, env=self.env)
+            rg = self._row_processor()
 
         else:
             rg = self.row_generator
 
-        if six.PY3:
-            # Would like to do this, but Python2 can't handle the syntax
-            # yield from rg
+        writer = row_cache.writer(key, headers, self._frame_types()[0]) if key else None
+
+        try:
             for row in rg:
+                if writer:
+                    writer.add(row)
                 yield row
+
+            try:
+                self.errors = rg.errors if rg.errors else {}
+            except AttributeError:
+                self.errors = {}
+
+            if writer and not self.errors:
+                writer.commit()
+
+        finally:
+            if writer:
+                writer.discard()  # No effect after a commit
+
+    def rows_at(self, start, stop):
+        """Return a list of the rows from start up to stop, counting from 0 for the first row after the
+        header, cast like the rows from iteration. For CSV files in filesystem packages, the sidecar index
+        of row offsets is used to seek to the start of the range; other resources are read from the top.
+        """
+        from .rowindex import RowIndex
+
+        path = self._local_path('csv') if self._start_line() == 1 else None
+        index = RowIndex.for_csv(path) if path else None
+
+        if index:
+            source = index.rows(path, start, stop, encoding=self.get_value('encoding', 'utf8'))
         else:
-            for row in rg:
+            source = islice(self.row_generator, self._start_line() + start, self._start_line() + stop)
+
+        if not self.headers:
+            return [list(row) for row in source]
+
+        rp = self._row_processor(source)
+
+        rows = list(rp)
+
+        self.errors = getattr(rp, 'errors', None) or {}
+
+        return rows
+
+    def _parallel_tasks(self, n):
+        """Return the tasks for parallel.cast_range() to read the resource in about n ranges, or more if the
+        ranges would be larger than MAX_RANGE_SIZE. Returns None if the resource can't be read in parallel:
+        compile_rows isn't set, it isn't a local, uncompressed CSV file with a current row index, it has no
+        schema, the schema has transforms or can't be compiled, or the env can't be sent to worker processes.
+
+        The row index gives each range the number of its first row, for error messages, and transforms
+        may depend on the rows before the current one, through the row number or the scratch dict.
+        """
+        from .parallel import MAX_RANGE_SIZE
+        from .rowcompile import CompileError, compile_row_processor
+        from .rowindex import RowIndex
+        from .schedule import env_is_sendable
+
+        if not self.compile_rows:
+            return None  # The workers cast with a compiled row processor
+
+        path = self._local_path('csv')
+
+        if not path or not self.headers or Url(self.resolved_url).resource_format not in ('csv', None):
+            return None
+
+        if self.has_transforms:
+            return None
+
+        index = RowIndex.for_csv(path) if self._start_line() == 1 else None
+
+        if not index or not index.offsets:
+            return None
+
+        columns = self._compiled_columns()
+
+        if not env_is_sendable(self.env):
+            return None
+
+        try:
+            compile_row_processor(columns, self.env)
+        except CompileError:
+            return None
+
+        encoding = self.get_value('encoding', 'utf8')
+
+        n = max(n, index.file_size // MAX_RANGE_SIZE + 1)
+
+        # Ranges on indexed rows, so the row numbers in error messages count from the top of the file
+        stride = max(1, -(-len(index.offsets) // n))
+        blocks = list(range(0, len(index.offsets), stride))
+        ends = [index.offsets[b] for b in blocks[1:]] + [index.file_size]
+        ranges = [(index.offsets[b], end, b * index.interval + 1) for b, end in zip(blocks, ends)]
+
+        raw, post = self._split_predicates()
+
+        positions = [id(c) for i, c in self._processor_columns()]
+
+        if self._projection is None and not post:
+            indexes = None
+        else:
+            indexes = [positions.index(id(c)) for i, c in self._column_terms()]
+
+        return [dict(path=path, start=start, end=end, first_row=first_row, encoding=encoding,
+                     columns=columns, env=self.env, raw=raw, indexes=indexes,
+                     post=[(p, positions.index(id(c))) for p, c in post])
+                for start, end, first_row in ranges]
+
+    def iter_parallel(self, processes=None, ordered=True):
+        """Iterate over the cast rows of a local CSV file, without the header, reading byte ranges of the file
+        in parallel worker processes. The casting errors of all of the ranges are merged into `errors`.
+        Resources that can't be read in parallel, as described in _parallel_tasks(), are read by iteration.
+
+        :param processes: Number of worker processes. Defaults to the number of CPUs
+        :param ordered: If False, yield the rows of each range as it is finished, rather than in file order
+        """
+        from multiprocessing import cpu_count
+        from .parallel import RANGES_PER_PROCESS, cast_ranges, merge_errors
+
+        processes = processes or cpu_count()
+
+        tasks = self._parallel_tasks(processes * RANGES_PER_PROCESS)
+
+        if tasks is None:
+            for row in islice(self, 1, None):
                 yield row
+            return
+
+        self.errors = OrderedDict()
+
+        for rows, errors in cast_ranges(tasks, processes, ordered):
+            merge_errors(self.errors, errors)
+
+            for row in rows:
+                yield row
+
+    def iter_rows(self):
+        """Iterate over the cast rows, without the header, reading large local CSV files in parallel when they
+        can be, as described in _parallel_tasks()"""
+        from .parallel import PARALLEL_MIN_SIZE
+
+        path = self._local_path('csv')
+
+        if path and stat(path).st_size >= PARALLEL_MIN_SIZE:
+            return self.iter_parallel()
+        else:
+            return islice(self, 1, None)
+
+    def compute_stats(self, sample_size=None, write=True, parallel=True):
+        """Compute statistics for each column in one pass over the rows: the count of values and of empty
+        values, an approximate count of distinct values, the minimum and maximum, and for numbers, the mean,
+        standard deviation and an approximate median from a sample. Memory use doesn't depend on the
+        number of rows.
+
+        :param sample_size: Number of values in each column's sample
+        :param write: If True, store the statistics as properties of the schema's Table.Column terms
+        :param parallel: If True, read large local CSV files in parallel, with iter_rows()
+        :return: An OrderedDict of column header to a dict of statistics
+
+        The rows are read without the row cache, so a pass over every row doesn't fill it.
+        """
+        from .stats import TableStats, SAMPLE_SIZE
+
+        if not self.headers:
+            raise MetatabError("Can't compute statistics for resource '{}', which has no schema".format(self.name))
+
+        stats = TableStats(self.headers, sample_size or SAMPLE_SIZE)
+
+        r = self._view(row_cache=False)
+
+        for row in (r.iter_rows() if parallel else islice(r, 1, None)):
+            stats.add(row)
+
+        self.errors = r.errors
+
+        stats = stats.as_dict()
+
+        if write:
+            self.write_stats(stats)
+
+        return stats
+
+    def write_stats(self, stats):
+        """Store statistics from compute_stats() as properties of the schema's Table.Column terms. Statistics
+        that are None remove the property"""
+
+        for i, c in self._column_terms():
+            for k, v in stats.get(self._name_for_col_term(c, i), {}).items():
+                c[k] = six.text_type(v) if v is not None else None
+
+    def _source_version(self):
+        """Return a string that changes when the source data changes: the modification time and size of
+        a local file, or the ETag or Last-Modified header of a web resource. Returns None if the version
+        can't be determined"""
+
+        u = Url(self.resolved_url)
+
+        if u.proto == 'file':
+            try:
+                st = stat(u.parts.path)
+                return '{}:{}'.format(st.st_mtime, st.st_size)
+            except OSError:
+                return None
+
+        elif u.proto in ('http', 'https'):
+            import requests
+
+            try:
+                r = requests.head(reparse_url(self.resolved_url, fragment=False), allow_redirects=True,
+                                  timeout=10)
+            except requests.RequestException:
+                return None
+
+            return r.headers.get('ETag') or r.headers.get('Last-Modified')
+
+        else:
+            return None
+
+    def build_fingerprints(self):
+        """Return a dict of fingerprints of the inputs for building the resource into a package: `source`, for
+        the URL and version of the source data, `schema`, for the resource's properties and schema, and `lib`,
+        for the functions in the env and the code of their modules. The `source` fingerprint is None if the
+        source has no version, so a build from it never matches a checkpoint"""
+        from .checkpoint import env_fingerprint, fingerprint
+
+        version = self._source_version()
+
+        return OrderedDict([
+            ('source', fingerprint(self.resolved_url, version) if version is not None else None),
+            ('schema', self._schema_fingerprint()),
+            ('lib', env_fingerprint(self.env)),
+        ])
+
+    def _schema_fingerprint(self):
+        """Return a fingerprint of the resource's properties and schema"""
+        from .checkpoint import fingerprint
+        from .stats import STATS_PROPERTIES
+
+        table, _ = self.schema_term
+
+        # Statistics on the columns don't change the data
+        return fingerprint(self._orig_term.fingerprint(), self.headers,
+                           table.fingerprint(exclude=['Column.' + p for p in STATS_PROPERTIES]) if table else None)
+
+    def _row_cache(self):
+        """Return the RowCache and the key for this resource's cast rows, or (None, None) if the rows
+        can't be cached: the cache isn't enabled, the resource has no schema, has a datatype that doesn't
+        survive the round trip, or isn't a local file. Parquet files aren't cached, since they are
+        already as fast to read as a cache entry. """
+        from .checkpoint import env_fingerprint
+        from .rowcache import CACHEABLE_TYPES
+        from .stats import STATS_PROPERTIES
+
+        if self.row_cache is False or not self.headers or not self.resolved_url or self._local_path('parquet'):
+            return None, None
+
+        # Only local files, which have a version without a request to a server
+        if Url(self.resolved_url).proto != 'file':
+            return None, None
+
+        table, _ = self.schema_term
+
+        if any(c.get_value('datatype') not in CACHEABLE_TYPES for i, c in self._column_terms()):
+            return None, None
 
         try:
-            self.errors = rg.errors if rg.errors else {}
-        except AttributeError:
-            self.errors = {}
+            from .rowcache import RowCache, cache_key
+            row_cache = self.row_cache or RowCache.for_cache(self._doc._cache)
+        except ImportError:  # pyarrow isn't installed
+            return None, None
+
+        if row_cache is None:
+            return None, None
+
+        version = self._source_version()
+
+        if version is None:
+            return None, None
+
+        # Statistics on the columns don't change the rows
+        key = cache_key(self.resolved_url, version, self._start_line(), self._orig_term.fingerprint(),
+                        table.fingerprint(exclude=['Column.' + p for p in STATS_PROPERTIES]),
+                        env_fingerprint(self.env), self.headers,
+                        [repr(p) for p in self._predicates])
+
+        return row_cache, key
+
+    def _all_column_terms(self):
+        """Yield (position, term) for each Table.Column term of the schema. The position counts
+        all of the children of the Table term, starting at 1, as the headers property does. """
+
+        t, _ = self.schema_term
+
+        if t:
+            for i, c in enumerate(t.children, 1):
+                if c.term_is("Table.Column"):
+                    yield i, c
+
+    def _column_terms(self):
+        """Like _all_column_terms(), but only the columns selected with select(), in the selected order"""
+
+        if self._projection is None:
+            for e in self._all_column_terms():
+                yield e
+        else:
+            by_header = {self._name_for_col_term(c, i): (i, c) for i, c in self._all_column_terms()}
+
+            for h in self._projection:
+                yield by_header[h]
+
+    def _processor_columns(self):
+        """Return, in schema order, the selected columns and the columns that their transforms refer to,
+        which must also go through the row processor"""
+        import re
+
+        all_columns = list(self._all_column_terms())
+
+        if self._projection is None:
+            return all_columns
+
+        def names(c, i):
+            return set(n for n in (self._name_for_col_term(c, i), c.get_value('name')) if n)
+
+        post_columns = set(id(c) for p, c in self._split_predicates()[1])
+
+        pending = [(i, c) for i, c in all_columns if id(c) in post_columns] + list(self._column_terms())
+        included = set(id(c) for i, c in pending)
+
+        while pending:
+            i, c = pending.pop()
+            tokens = set(re.findall(r'[A-Za-z_]\w*', c.get_value('transform') or ''))
+
+            for j, d in all_columns:
+                if id(d) not in included and names(d, j) & tokens:
+                    included.add(id(d))
+                    pending.append((j, d))
+
+        return [(i, c) for i, c in all_columns if id(c) in included]
+
+    def select(self, columns):
+        """Return a view of the resource with only the given columns, in the given order. Only these
+        columns, and any columns that their transforms refer to, are cast.
+
+        :param columns: A list of column headers
+        """
+
+        headers = self.headers
+
+        if not headers:
+            raise MetatabError("Can't select columns from resource '{}', which has no schema".format(self.name))
+
+        missing = [c for c in columns if c not in headers]
+
+        if missing:
+            raise MetatabError("Resource '{}' has no columns named: {}".format(self.name, ', '.join(missing)))
+
+        return self._view(_projection=list(columns))
+
+    def where(self, *conditions, **kwargs):
+        """Return a view of the resource with only the rows that pass all of the conditions. The
+        conditions are evaluated on the source values before the row is cast, except for columns
+        with transforms, so rejected rows are skipped cheaply.
+
+        :param conditions: Comparisons of a column to a constant, either strings like "year >= 2010"
+        or "state in ('CA', 'NV')", or (column, operator, value) tuples. The operators are
+        ==, !=, <, <=, >, >=, in and not in.
+        :param kwargs: Columns that must equal a value
+
+        """
+        from .predicate import Predicate
+
+        predicates = [Predicate.parse(c) for c in conditions] + \
+                     [Predicate(k, '==', v) for k, v in sorted(kwargs.items())]
+
+        if not self.headers:
+            raise MetatabError("Can't filter resource '{}', which has no schema".format(self.name))
+
+        headers = [self._name_for_col_term(c, i) for i, c in self._all_column_terms()]
+
+        missing = [p.column for p in predicates if p.column not in headers]
+
+        if missing:
+            raise MetatabError("Resource '{}' has no columns named: {}".format(self.name, ', '.join(missing)))
+
+        return self._view(_predicates=self._predicates + tuple(predicates))
+
+    def _split_predicates(self, engine='rowpipe'):
+        """Split the predicates into those that can be evaluated on the source rows, as
+        (predicate, source_index, cast) tuples, and those that must be evaluated on the cast rows, as
+        (predicate, column term) tuples. Only columns without transforms, and with a datatype that has a
+        cast in RAW_CASTS, can be evaluated on source values. The numpy engine has no stage after casting, so
+        for the numpy engine, predicates on other columns raise MetatabError """
+        from .predicate import RAW_CASTS
+
+        if not self._predicates:
+            return [], []
+
+        columns = {}
+        source_index = 0
+
+        for i, c in self._all_column_terms():
+            if c.get_value('name') == EMPTY_SOURCE_HEADER:
+                columns[self._name_for_col_term(c, i)] = (c, None)
+            else:
+                columns[self._name_for_col_term(c, i)] = (c, source_index)
+                source_index += 1
+
+        raw, post = [], []
+
+        for p in self._predicates:
+            c, index = columns[p.column]
+            datatype = c.get_value('datatype')
+
+            if c.get_value('transform'):
+                post.append((p, c))
+            elif engine == 'numpy' and datatype not in RAW_CASTS:
+                raise MetatabError("Can't filter column '{}' of resource '{}' with the numpy engine: values of "
+                                   "datatype '{}' can't be compared before casting"
+                                   .format(p.column, self.name, datatype))
+            elif engine == 'numpy' or (datatype in RAW_CASTS and index is not None):
+                raw.append((p, index, RAW_CASTS[datatype]))
+            else:
+                post.append((p, c))
+
+        return raw, post
+
+    def _view(self, **kwargs):
+        """Return a new Resource for the same term, with some of the view attributes changed"""
+
+        r = Resource(self._orig_term, self.base_url, self.package, self.env)
+
+        for k in ('_projection', '_predicates', 'row_cache', 'compile_rows'):
+            setattr(r, k, kwargs.get(k, getattr(self, k)))
+
+        return r
+
+    def _batch_columns(self):
+        """Return a (header, datatype, source_index) tuple for each selected column of the schema,
+        for NumpyCaster"""
+
+        columns = {}
+        source_index = 0
+
+        for i, c in self._all_column_terms():
+
+            if c.get_value('name') == EMPTY_SOURCE_HEADER:
+                columns[id(c)] = (self._name_for_col_term(c, i), c.get_value('datatype'), None)
+            else:
+                columns[id(c)] = (self._name_for_col_term(c, i), c.get_value('datatype'), source_index)
+                source_index += 1
+
+        return [columns[id(c)] for i, c in self._column_terms()]
+
+    @property
+    def has_transforms(self):
+        """True if any column of the schema has a transform, which requires the rowpipe engine"""
+        return any(c.get_value('transform') for i, c in self._processor_columns())
+
+    def _column_categories(self, c):
+        """Return the categories for a column with a ValueSet property: the values of the declared value
+        set, or an empty list if the value set isn't declared. Returns None for other columns"""
+
+        vs_name = c.get_value('valueset')
+
+        if not vs_name:
+            return None
+
+        for td in self.doc.decl_terms.values():
+            if td.get('valuesetname', '').lower() == vs_name.lower() and td.get('values'):
+                return list(td['values'].keys())
+
+        return []
+
+    def iter_batches(self, size=BATCH_SIZE, layout='rows', engine='rowpipe', reuse_buffers=False):
+        """Iterate over the resource's rows in batches of up to `size` rows. The header row is not included;
+        each batch has a `headers` attribute, and an `errors` attribute with the casting errors so far,
+        which are also in the resource's `errors`.
+
+        :param size: Number of rows in each batch
+        :param layout: 'rows' to yield RowBatch lists of rows, or 'columns' to yield ColumnBatch dicts
+        of header to column. The columns are NumPy masked arrays with the numpy engine, and lists with the
+        rowpipe engine.
+        :param engine: 'rowpipe' to cast the rows with the RowProcessor, like __iter__, or 'numpy' to cast
+        whole batches at once with a NumpyCaster. The numpy engine is much faster on large resources, but
+        can't run column transforms.
+        :param reuse_buffers: With the numpy engine and the 'columns' layout, cast each batch into the
+        arrays of the previous one, so a batch is only valid until the next is requested.
+
+        """
+        from six.moves import zip_longest
+
+        if engine not in ('rowpipe', 'numpy'):
+            raise MetatabError("Unknown casting engine '{}'".format(engine))
+
+        if layout not in ('rows', 'columns'):
+            raise MetatabError("Unknown batch layout '{}'".format(layout))
+
+        headers = self.headers
+
+        self.errors = {}
+
+        if engine == 'numpy' and headers:
+            from .npcast import NumpyCaster
+
+            if self.has_transforms:
+                raise MetatabError("Can't cast resource '{}' with the numpy engine: the schema has transforms"
+                                   .format(self.name))
+
+            caster = NumpyCaster(self._batch_columns())
+
+            rows = self._source_rows('numpy')
+
+            for batch in iter(lambda: list(islice(rows, size)), []):
+                cols = caster.cast_columns(batch, reuse=reuse_buffers and layout == 'columns')
+
+                self.errors = caster.errors
+
+                if layout == 'columns':
+                    yield ColumnBatch(cols, headers, self.errors)
+                else:
+                    yield RowBatch(caster.to_rows(cols), headers, self.errors)
+
+            return
+
+        if headers:
+            rg = self._row_processor()
+            rows = iter(rg)
+        else:
+            # No schema, so the rows aren't cast, and the headers are the first row of the source
+            rg = None
+            rows = iter(self.row_generator)
+            headers = next(rows, None) or []
+
+        for batch in iter(lambda: list(islice(rows, size)), []):
+
+            if getattr(rg, 'errors', None):
+                self.errors = rg.errors
+
+            if layout == 'columns':
+                source_cols = list(zip_longest(*batch))
+                n = len(batch)
+
+                yield ColumnBatch((list(source_cols[i]) if i < len(source_cols) else [None] * n
+                                   for i, h in enumerate(headers)), headers, self.errors)
+            else:
+                yield RowBatch(batch, headers, self.errors)
+
+        if getattr(rg, 'errors', None):
+            self.errors = rg.errors
+
+    def iterrecords(self):
+        """Iterate over the resource's rows as records, tuples with the values available by attribute,
+        using the headers sanitized to identifiers, and by key, using the headers. All resources with the
+        same headers share a record class. Uses less memory than iterdict"""
+        from .records import record_class
+
+        rows = iter(self)
+
+        headers = next(rows, None)
+
+        if headers is None:
+            return
+
+        make = record_class(headers)._make
+
+        for row in rows:
+            yield make(row)
 
     @property
     def iterdict(self):
@@ -411,41 +1170,239 @@ class Resource(Term):
 
             yield dict(zip(headers, row))
 
-    def dataframe(self, limit=None):
-        """Return a pandas datafrome from the resource"""
+    def _package_csv_path(self):
+        """Return the path of the resource file if it is a local CSV file that can be read directly, like
+        the normalized files in a package: the columns can be cast in bulk, every column is in the file, and
+        the data starts on the line after the header. Otherwise returns None"""
 
-        from .pands import MetatabDataFrame
+        if not self._bulk_castable() or self._predicates or self._start_line() != 1:
+            return None
 
-        d = self.properties
+        if any(c.get_value('name') == EMPTY_SOURCE_HEADER for i, c in self._all_column_terms()):
+            return None
 
-        d['url'] = self.resolved_url
-        d['working_dir'] = self._doc.doc_dir
+        return self._local_path('csv')
+
+    def _local_path(self, target_format):
+        """Return the path of the resource file if it is a local file of the given format, or None"""
+
+        if not self.resolved_url:
+            return None
+
+        u = Url(self.resolved_url)
+
+        if u.proto != 'file' or u.target_format != target_format or not isfile(u.parts.path):
+            return None
+
+        return u.parts.path
+
+    def _frame_types(self):
+        """Return the schema datatypes and categories of the columns, for a FrameBuilder"""
+
+        if not self.headers:
+            return None, None
+
+        columns = list(self._column_terms())
+
+        return ([c.get_value('datatype') for i, c in columns],
+                [self._column_categories(c) for i, c in columns])
+
+    def _bulk_castable(self):
+        """True if the numpy engine, and pandas.read_csv, cast the columns the same way as the RowProcessor:
+        the schema has no transforms, and every column is an integer, number or string, without a value
+        type. Other columns, like dates, are left to the RowProcessor, as are predicates on columns without a
+        datatype, which the RowProcessor evaluates after casting """
+        from .npcast import numpy_castable
+        from .predicate import RAW_CASTS
 
-        rg = RowGenerator(**d)
+        if not self.headers or self.has_transforms:
+            return False
+
+        columns = {self._name_for_col_term(c, i): c for i, c in self._all_column_terms()}
+
+        if any(columns[p.column].get_value('datatype') not in RAW_CASTS for p in self._predicates):
+            return False
+
+        return all(numpy_castable(c.get_value('datatype')) and not c.get_value('valuetype')
+                   for i, c in self._column_terms())
+
+    def _frame_engine(self):
+        return 'numpy' if self._bulk_castable() else 'rowpipe'
+
+    def dataframe(self, limit=None, size=BATCH_SIZE):
+        """Return a pandas dataframe from the resource, with column types from the schema: nullable Int64
+        for integers, float64 for numbers, and categoricals for columns with a value set. The columns are
+        built from batches, and local CSV files that need no casting are read with pandas.read_csv
+
+        :param limit: Maximum number of rows to read
+        :param size: Number of rows in each batch
+        """
+
+        import pandas as pd
+        from .pands import MetatabDataFrame, FrameBuilder, pandas_dtype
 
         headers = self.headers
 
-        if headers:
-            # There are several args for SelectiveRowGenerator, but only
-            # start is really important.
-            start = d.get('start', 1)
+        datatypes, categories = self._frame_types()
 
-            rg = islice(rg, start, limit)
+        row_cache, key = self._row_cache()
 
-        else:
-            headers = next(rg)  # Get the headers from the first row of the file
+        # Cache entries are already filtered, but a Parquet resource file has all of the rows
+        parquet_path = ((self._local_path('parquet') if not self._predicates else None) or
+                        (row_cache.get(key) if key else None))
+
+        if parquet_path:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            df = pq.read_table(parquet_path, columns=headers if self._projection is not None else None) \
+                .to_pandas(types_mapper={pa.int64(): pd.Int64Dtype()}.get)
+
+            self.errors = {}
+            df = MetatabDataFrame(df if limit is None else df.head(limit), metatab_resource=self)
+            df.metatab_errors = self.errors
+
+            return df
+
+        path = self._package_csv_path()
+
+        if path:
+            try:
+                df = pd.read_csv(path, header=0, nrows=limit,
+                                 names=[self._name_for_col_term(c, i) for i, c in self._all_column_terms()],
+                                 usecols=headers,
+                                 encoding=self.get_value('encoding', 'utf8'),
+                                 # Only empty cells are missing, like with the RowProcessor, so strings
+                                 # like 'NA' and 'null' are kept
+                                 keep_default_na=False, na_values=[''],
+                                 dtype={h: pandas_dtype(dt, cats)
+                                        for h, dt, cats in zip(headers, datatypes, categories)})[headers]
+
+                self.errors = {}
+                df = MetatabDataFrame(df, metatab_resource=self)
+                df.metatab_errors = self.errors
+
+                return df
 
-        rp_table = self.row_processor_table()
+            except (ValueError, TypeError):
+                pass  # Values that pandas can't cast, so take the slow path to get the errors
 
-        if rp_table:
-            rg = RowProcessor(rg, rp_table, source_headers=headers, env={})
+        builder = None
 
-        df = MetatabDataFrame(list(rg), columns=headers, metatab_resource=self)
+        for batch in self.iter_batches(size=size, layout='columns', engine=self._frame_engine(),
+                                       reuse_buffers=True):
 
-        self.errors = df.metatab_errors = rg.errors if rg.errors else {}
+            if builder is None:
+                builder = FrameBuilder(batch.headers, datatypes, categories)
+
+            if not builder.add(batch, limit):
+                break
+
+        if builder is None:  # No rows
+            builder = FrameBuilder(headers or [], datatypes, categories)
+
+        df = builder.frame(metatab_resource=self)
+
+        df.metatab_errors = self.errors
 
         return df
 
+    def iter_dataframes(self, chunksize=BATCH_SIZE):
+        """Yield the resource as a series of dataframes of up to chunksize rows, typed like the dataframe()
+        output, so resources larger than memory can be processed. Each chunk's metatab_errors has the
+        casting errors of the rows in the chunk, and the chunk's index continues from the previous one. """
+
+        import pandas as pd
+        from .pands import FrameBuilder
+
+        datatypes, categories = self._frame_types()
+
+        reported = {}  # For each column, the errors that were reported in previous chunks
+        start = 0
+
+        for batch in self.iter_batches(size=chunksize, layout='columns', engine=self._frame_engine(),
+                                       reuse_buffers=True):
+
+            builder = FrameBuilder(batch.headers, datatypes, categories)
+            builder.add(batch)
+
+            df = builder.frame(metatab_resource=self)
+            df.index = pd.RangeIndex(start, start + builder.n_rows)
+            start += builder.n_rows
+
+            df.metatab_errors = {}
+
+            # The batch errors accumulate over the whole resource, so the errors of this chunk are the
+            # ones added since the previous chunk: the end of a list, or the new members of a set
+            for col, errors in batch.errors.items():
+                prev = reported.get(col, [])
+
+                if isinstance(errors, list):
+                    new_errors = errors[len(prev):]
+                else:
+                    new_errors = [e for e in errors if e not in prev]
+
+                if new_errors:
+                    df.metatab_errors[col] = new_errors
+                    reported[col] = list(errors) if isinstance(errors, list) else set(errors)
+
+            yield df
+
+    def _record_batches(self, size=BATCH_SIZE):
+        """Yield the resource as Arrow RecordBatches, with types from the schema"""
+
+        from .arrow import arrow_schema, record_batch
+
+        datatypes, _ = self._frame_types()
+        schema = None
+
+        # Arrow arrays share the memory of the NumPy arrays, so each batch needs its own buffers
+        for batch in self.iter_batches(size=size, layout='columns', engine=self._frame_engine()):
+            if schema is None:
+                schema = arrow_schema(batch.headers, datatypes)
+
+            yield record_batch(batch.columns, schema)
+
+    def to_arrow(self, size=BATCH_SIZE):
+        """Return the resource as an Arrow table, with types from the schema: int64 for integers, float64
+        for numbers and strings for everything else. Casting errors are in `errors`"""
+
+        import pyarrow as pa
+        from .arrow import arrow_schema
+
+        batches = list(self._record_batches(size))
+
+        if batches:
+            return pa.Table.from_batches(batches)
+        else:
+            return arrow_schema(self.headers or [], self._frame_types()[0]).empty_table()
+
+    def to_parquet(self, path, size=BATCH_SIZE):
+        """Write the resource to a Parquet file, one row group per batch, with the same types as to_arrow()
+        Returns the path"""
+
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        from .arrow import arrow_schema
+
+        writer = None
+
+        try:
+            for rb in self._record_batches(size):
+                if writer is None:
+                    writer = pq.ParquetWriter(path, rb.schema)
+
+                writer.write_table(pa.Table.from_batches([rb]))
+
+            if writer is None:  # No rows, but still write the schema
+                writer = pq.ParquetWriter(path, arrow_schema(self.headers or [], self._frame_types()[0]))
+
+        finally:
+            if writer is not None:
+                writer.close()
+
+        return path
+
     def _repr_html_(self):
         return ("<h3><a name=\"resource-{name}\"></a>{name}</h3><p><a target=\"_blank\" href=\"{url}\">{url}</a></p>" \
                 .format(name=self.name, url=self.resolved_url)) + \
@@ -561,6 +1518,35 @@ class MetatabDoc(object):
 
         return doc
 
+    def fingerprint(self, sections=None, exclude=None):
+        """Return a hex digest of the contents of the document, which changes only when the terms
+        in the document change. Section and term fingerprints are memoized, so after a change only the changed
+        terms are re-hashed.
+
+        :param sections: A section name or list of section names to include. Defaults to all sections.
+        :param exclude: Qualified names of terms to leave out, at any level of the document.
+        Defaults to FINGERPRINT_EXCLUDE_TERMS.
+        """
+        from hashlib import sha1
+
+        if exclude is None:
+            exclude = FINGERPRINT_EXCLUDE_TERMS
+
+        exclude = frozenset(Term.normalize_term(e) for e in exclude)
+
+        if isinstance(sections, six.string_types):
+            sections = [sections]
+
+        names = None if sections is None else set(e.lower() for e in sections)
+
+        h = sha1()
+
+        for s_name, s in self.sections.items():
+            if names is None or s_name in names:
+                h.update(s.fingerprint(exclude).encode('ascii'))
+
+        return h.hexdigest()
+
     @property
     def doc_dir(self):
 
@@ -704,6 +1690,13 @@ class MetatabDoc(object):
         import sys
         if kwargs:  # Look for terms with particular property values
 
+            found_terms = self._find_indexed(term, value, section, kwargs)
+
+            if found_terms is not None:
+                return found_terms
+
+            # The property index can't answer the query, so scan all of the terms.
+
             terms = self.find(term, value, section)
 
             found_terms = []
@@ -759,6 +1752,52 @@ class MetatabDoc(object):
 
             return found
 
+    def _find_indexed(self, term, value, section, kwargs):
+        """Implement the property value path of find() with the per-section property indexes. Returns None
+        if the query can't be answered from the indexes, such as for wildcard terms or None property values"""
+
+        if isinstance(term, (list, tuple)):
+            found = []
+
+            for e in term:
+                terms = self._find_indexed(e, value, section, kwargs)
+
+                if terms is None:
+                    return None
+
+                found.extend(terms)
+
+            return found
+
+        term = term.lower()
+
+        if not '.' in term:
+            term = 'root.' + term
+
+        if not term.startswith('root.') or '*' in term or term in ('root.root', 'root.section'):
+            return None
+
+        if any(v is None or not isinstance(v, collections.Hashable) for v in kwargs.values()):
+            return None
+
+        if section is None:
+            sections = list(self.sections.values())
+        else:
+            names = [e.lower() for e in section] if isinstance(section, (list, tuple)) else [section.lower()]
+            sections = [s for s in self.sections.values() if s.name.lower() in names]
+
+        props = [(k.lower(), v) for k, v in kwargs.items()]
+        (k0, v0), rest = props[0], props[1:]
+
+        found = []
+
+        for s in sections:
+            for t in s._property_index().get((term, k0, v0), []):
+                if (value is False or value == t.value) and all(t.get_value(k) == v for k, v in rest):
+                    found.append(t)
+
+        return found
+
     def find_first(self, term, value=False, section=None, **kwargs):
 
         terms = self.find(term, value=value, section=section, **kwargs)
@@ -790,21 +1829,21 @@ class MetatabDoc(object):
 
         base_url = self.package_url if self.package_url else self._ref
 
-        for t in self['Resources'].terms:
-
-            if term and not t.term_is(term):
-                continue
+        for t in self._resource_terms(name, term):
+            yield Resource(t, base_url)
 
-            if name and t.get_value('name') != name:
-                continue
+    def _resource_terms(self, name=None, term='Root.Datafile'):
+        """Return the Resources section terms for resources(), looking up names in the property index"""
 
-            if not 'url' in t.properties:
-                pass
+        if name and term:
+            return self.find(term, section='Resources', name=name)
 
-            yield Resource(t, base_url)
+        return [t for t in self['Resources'].terms
+                if (not term or t.term_is(term)) and (not name or t.get_value('name') == name)]
 
     def resource(self, name=None, term='Root.Datafile', env=None):
-        """
+        """Return the first resource that matches the name and term. Each call returns a new Resource
+        wrapper, so the env and view attributes of one caller's resource aren't changed by another's.
 
         :param name:
         :param term:
@@ -812,15 +1851,16 @@ class MetatabDoc(object):
         :return:
         """
 
-        resources = list(self.resources(name=name, term=term))
+        terms = self._resource_terms(name=name, term=term)
 
-        if not resources:
+        if not terms:
             return None
 
-        else:
-            r = resources[0]
-            r.env = env
-            return r
+        t = terms[0]
+
+        base_url = self.package_url if self.package_url else self._ref
+
+        return Resource(t, base_url, env=env)
 
     def load_terms(self, terms):
         """Create a builder from a sequence of terms, usually a TermInterpreter"""
@@ -0,0 +1,147 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Stream data to an S3 object with a multipart upload. Parts are uploaded on a pool of threads while the
+rest of the data is written, and memory use is bounded by the part size and the number of threads, not
+the size of the object."""
+
+from multiprocessing.pool import ThreadPool
+from threading import BoundedSemaphore
+
+PART_SIZE = 8 * 1024 ** 2  # S3 requires at least 5MB for every part but the last
+
+UPLOAD_THREADS = 4  # Parts uploaded at the same time
+
+
+class MultipartWriter(object):
+    """A binary file-like object that uploads the data written to it to an S3 object. An object smaller than
+    one part is uploaded with a single put_object() on close(); larger objects use a multipart upload, which
+    close() completes. If there is an error, or the writer is used as a context manager and the block raises an
+    exception, the upload is aborted, and the object isn't created or changed.
+    """
+
+    def __init__(self, client, bucket, key, part_size=None, threads=None, **kwargs):
+        """
+        :param client: A boto3 S3 client, or an object with the same multipart upload methods
+        :param bucket: Bucket name
+        :param key: Object key
+        :param part_size: Bytes in each part
+        :param threads: Parts uploaded at the same time. Up to this many parts, and the one being
+        written, are held in memory.
+        :param kwargs: Other arguments for creating the object, such as ACL and ContentType
+        """
+
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size or PART_SIZE
+        self.threads = threads or UPLOAD_THREADS
+        self.kwargs = kwargs
+
+        self.size = 0  # Bytes written
+        self.closed = False
+
+        self._buffer = []
+        self._buffered = 0
+        self._upload_id = None
+        self._pool = None
+        self._parts = []  # The result of uploading each part, in order
+        self._slots = BoundedSemaphore(self.threads)
+
+    def write(self, b):
+
+        if self.closed:
+            raise ValueError("Write to a closed MultipartWriter")
+
+        self._buffer.append(bytes(b))
+        self._buffered += len(b)
+        self.size += len(b)
+
+        if self._buffered >= self.part_size:
+            self._upload_buffer()
+
+        return len(b)
+
+    def _upload_buffer(self):
+        """Start uploading the buffered data as the next part"""
+
+        data = b''.join(self._buffer)
+        self._buffer = []
+        self._buffered = 0
+
+        if self._upload_id is None:
+            self._upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key,
+                                                                  **self.kwargs)['UploadId']
+            self._pool = ThreadPool(self.threads)
+
+        # Report a failed part now, rather than after all of the data is written
+        for result in self._parts:
+            if result.ready() and not result.successful():
+                self.abort()
+                result.get()
+
+        self._slots.acquire()  # Wait for an upload to finish if all of the threads are busy
+
+        self._parts.append(self._pool.apply_async(self._upload_part, (len(self._parts) + 1, data)))
+
+    def _upload_part(self, part_number, data):
+
+        try:
+            r = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                        PartNumber=part_number, Body=data)
+
+            return {'PartNumber': part_number, 'ETag': r['ETag']}
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """Finish the upload"""
+
+        if self.closed:
+            return
+
+        try:
+            if self._upload_id is None:
+                self.client.put_object(Bucket=self.bucket, Key=self.key, Body=b''.join(self._buffer), **self.kwargs)
+            else:
+                if self._buffered:
+                    self._upload_buffer()
+
+                parts = [result.get() for result in self._parts]
+
+                self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self._upload_id,
+                                                      MultipartUpload={'Parts': parts})
+        except Exception:
+            self.abort()
+            raise
+
+        self.closed = True
+        self._buffer = []
+        self._close_pool()
+
+    def abort(self):
+        """Abort the upload, discarding the parts that have been uploaded"""
+
+        self.closed = True
+        self._buffer = []
+
+        self._close_pool()
+
+        if self._upload_id is not None:
+            upload_id, self._upload_id = self._upload_id, None
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=upload_id)
+
+    def _close_pool(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
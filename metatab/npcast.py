@@ -0,0 +1,204 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Vectorized casting of resource rows with NumPy, an alternative to the cell-by-cell casting
+of rowpipe's RowProcessor"""
+
+from collections import OrderedDict
+from itertools import islice
+
+import numpy as np
+from six import string_types, text_type
+from six.moves import zip_longest
+
+from .exc import MetatabError
+
+# Schema datatypes that are cast in bulk. Columns without a datatype are passed through as objects, and
+# other datatypes can't be cast
+NUMPY_TYPES = {
+    'integer': np.int64,
+    'int': np.int64,
+    'number': np.float64,
+    'float': np.float64,
+    'string': object,
+    'str': object,
+    'text': object,
+}
+
+TEXT_TYPES = ('string', 'str', 'text')  # Cast to text, like RowProcessor, so numeric cells become strings
+
+MAX_COLUMN_ERRORS = 100  # Messages recorded per column. All errors are counted in error_counts
+
+
+def numpy_castable(datatype):
+    """Return True if a NumpyCaster can cast a column with the given schema datatype"""
+    return not datatype or datatype in NUMPY_TYPES
+
+
+def _cast_value(v, dtype):
+    """Cast one value, raising ValueError for integer columns if the value isn't integral, rather than
+    truncating it the way NumPy does"""
+
+    if dtype is not np.int64:
+        return dtype(v)
+
+    if isinstance(v, string_types):
+        try:
+            return int(v)
+        except ValueError:
+            v = float(v)  # Integers formatted as floats, like '1.0'
+
+    i = int(v)
+
+    if i != v:
+        raise ValueError(v)
+
+    return i
+
+
+class NumpyCaster(object):
+    """Cast chunks of source rows to NumPy masked arrays, one per schema column. Empty cells and cells that
+    can't be cast are masked. Casting errors are recorded per column in `errors`, a dict of column
+    name to a list of messages, like RowProcessor.errors """
+
+    def __init__(self, columns):
+        """
+        :param columns: A list of (header, datatype, source_index) tuples, one per destination column.
+        source_index is None for columns that don't exist in the source. Raises MetatabError for
+        datatypes that can't be cast, like dates, so they aren't passed through as uncast strings.
+        """
+
+        for header, datatype, source_index in columns:
+            if not numpy_castable(datatype):
+                raise MetatabError("Can't cast column '{}' of datatype '{}' with NumPy".format(header, datatype))
+
+        self.columns = columns
+        self.headers = [c[0] for c in columns]
+        self.errors = OrderedDict()
+        self.error_counts = {}
+
+        self._n_source = max([c[2] for c in columns if c[2] is not None] or [-1]) + 1
+
+        self._row_offset = 0  # Index of the first row of the current chunk, for error messages
+
+        self._buffers = {}  # Data and mask arrays for each column, reused between chunks
+
+    def _add_error(self, header, row_n, value, dtype):
+
+        n = self.error_counts.get(header, 0) + 1
+        self.error_counts[header] = n
+
+        if n <= MAX_COLUMN_ERRORS:
+            self.errors.setdefault(header, []).append(
+                "Failed to cast '{}' to {} in row {}".format(value, np.dtype(dtype).name, row_n))
+
+    def _arrays(self, col_n, dtype, n, reuse):
+        """Return data and mask arrays of length n, from the buffers of the column at position col_n if
+        reuse is true"""
+
+        if not reuse:
+            return np.empty(n, dtype=dtype), np.empty(n, dtype=bool)
+
+        data, mask = self._buffers.get(col_n, (None, None))
+
+        if data is None or len(data) < n:
+            data, mask = np.empty(n, dtype=dtype), np.empty(n, dtype=bool)
+            self._buffers[col_n] = (data, mask)
+
+        return data[:n], mask[:n]
+
+    def _cast_column(self, col_n, header, values, dtype, reuse, text=False):
+
+        a = np.array(values, dtype=object)
+
+        data, mask = self._arrays(col_n, dtype, len(a), reuse)
+
+        np.equal(a, None, out=mask)
+        mask |= np.equal(a, '')
+
+        if dtype is object:
+            data[...] = a
+
+            if text:
+                for i in np.flatnonzero(~mask):
+                    if not isinstance(data[i], text_type):
+                        data[i] = text_type(data[i])
+
+            return np.ma.MaskedArray(data, mask=mask, copy=False)
+
+        a[mask] = 0
+
+        try:
+            data[...] = a  # Casts the whole column, or fails on the first bad value
+
+            if dtype is not np.int64:
+                return np.ma.MaskedArray(data, mask=mask, copy=False)
+
+            # NumPy truncates floats, so check the integers against the values cast to floats. Very large
+            # integers that don't round trip through a float are checked again below.
+            check = np.flatnonzero(data != a.astype(np.float64))
+
+        except (ValueError, TypeError, OverflowError):
+            # At least one bad value; cast element by element to find it.
+            check = np.flatnonzero(~mask)
+
+        for i in check:
+            v = a[i]
+            try:
+                data[i] = _cast_value(v, dtype)
+            except (ValueError, TypeError, OverflowError):
+                mask[i] = True
+                self._add_error(header, self._row_offset + i + 1, v, dtype)
+
+        return np.ma.MaskedArray(data, mask=mask, copy=False)
+
+    def cast(self, rows, reuse=False):
+        """Cast a list of source rows, returning an OrderedDict of header to masked array. If headers
+        are duplicated, only the last of the columns is in the dict; use cast_columns() to get all of them.
+
+        :param rows: A list of source rows
+        :param reuse: If True, the arrays are views of buffers that are overwritten by the next call,
+        which avoids allocating new arrays for every chunk.
+        """
+
+        return OrderedDict(zip(self.headers, self.cast_columns(rows, reuse)))
+
+    def cast_columns(self, rows, reuse=False):
+        """Cast a list of source rows, like cast(), but return a list of masked arrays, one for each
+        column, in order"""
+
+        # Transposing with zip_longest pads short rows with None, so the missing cells are masked
+        if rows:
+            source_cols = list(islice(zip_longest(*rows), self._n_source))
+        else:
+            source_cols = []
+
+        n = len(rows)
+
+        cols = []
+
+        for col_n, (header, datatype, source_index) in enumerate(self.columns):
+
+            dtype = NUMPY_TYPES.get(datatype, object)
+
+            if source_index is None or source_index >= len(source_cols):
+                data, mask = self._arrays(col_n, dtype, n, reuse)
+                mask[...] = True
+                cols.append(np.ma.MaskedArray(data, mask=mask, copy=False))
+            else:
+                cols.append(self._cast_column(col_n, header, source_cols[source_index], dtype, reuse,
+                                              text=datatype in TEXT_TYPES))
+
+        self._row_offset += n
+
+        return cols
+
+    @staticmethod
+    def to_rows(cols):
+        """Convert a list, or an OrderedDict, of masked arrays to a list of row lists, with None for
+        masked values"""
+
+        if isinstance(cols, dict):
+            cols = cols.values()
+
+        return [list(row) for row in zip(*[c.tolist() for c in cols])]
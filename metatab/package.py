@@ -6,7 +6,10 @@
 from __future__ import print_function
 import json
 import shutil
-from collections import namedtuple
+import sys
+import zipfile
+from hashlib import sha1
+from collections import OrderedDict, namedtuple
 from io import BytesIO
 from itertools import islice
 from os import getcwd, makedirs, remove
@@ -21,7 +24,10 @@ from metatab.util import slugify, Bunch
 from rowgenerators import RowGenerator, SourceSpec, TextEncodingError, Url, enumerate_contents
 from rowgenerators.util import get_cache
 from tableintuit import RowIntuiter
+from .checkpoint import Checkpoint, checkpoint_name, file_checksum, fingerprint
 from .exc import PackageError
+from .prefetch import Prefetcher
+from .rowindex import RowIndex, index_path
 
 TableColumn = namedtuple('TableColumn', 'path name start_line header_lines columns')
 
@@ -34,12 +40,16 @@ def ensure_exists(d):
         makedirs(d)
 
 
-def write_csv(path_or_flo, headers, gen):
+def write_csv(path_or_flo, headers, gen, index=None):
+    """Write the headers and rows to a CSV file, or a binary file-like object, which is left open. If index is a
+    RowIndex, record the offsets of the rows in it"""
     try:
         f = open(path_or_flo, "wb")
+        close = True
 
     except TypeError:
         f = path_or_flo  # Assume that it's already a file-like-object
+        close = False
 
     try:
         w = csv.writer(f)
@@ -47,8 +57,13 @@ def write_csv(path_or_flo, headers, gen):
 
         row = None
         try:
-            for row in gen:
-                w.writerow(row)
+            if index is not None:
+                for row_n, row in enumerate(gen):
+                    index.add(row_n, f.tell())
+                    w.writerow(row)
+            else:
+                for row in gen:
+                    w.writerow(row)
         except:
             import sys
             print("write_csv: ERROR IN ROW", row, file=sys.stderr)
@@ -60,7 +75,74 @@ def write_csv(path_or_flo, headers, gen):
             return None
 
     finally:
-        f.close()
+        if close:
+            f.close()
+
+
+class HashingWriter(object):
+    """Wrap a binary file-like object, computing the SHA1 digest and the size of the data written through it"""
+
+    def __init__(self, f):
+        self.f = f
+        self.sha1 = sha1()
+        self.size = 0
+
+    def write(self, b):
+        self.sha1.update(b)
+        self.size += len(b)
+        return self.f.write(b)
+
+    def close(self):
+        self.f.close()
+
+    def hexdigest(self):
+        return self.sha1.hexdigest()
+
+    def __enter__(self):
+        self.f.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return self.f.__exit__(exc_type, exc_val, exc_tb)
+
+
+def write_data(path, data_format, r, gen, headers):
+    """Write the rows of a resource to a data file in a package: a CSV file, with a row index, or a Parquet file"""
+
+    makedirs(dirname(path), exist_ok=True)
+
+    if exists(path):
+        remove(path)
+
+    if data_format == 'parquet':
+        from .arrow import write_parquet
+
+        datatypes, _ = r._frame_types()
+
+        write_parquet(path, headers, datatypes, gen)
+
+    else:
+        index = RowIndex()
+
+        write_csv(path, headers, gen, index=index)
+
+        index.write(index_path(path), path)
+
+
+def _build_resource(task):
+    """Read a resource from the source document and write its data file, returning the checksum of the file.
+    Runs in the build worker processes"""
+
+    doc = MetatabDoc(task['ref'], cache=get_cache('metapack'))
+
+    r = doc.resource(task['name'], env=task['env'])
+
+    r.compile_rows = task['compile_rows']
+
+    # Worker processes can't start their own pool, so the rows are read by iteration
+    write_data(task['path'], task['format'], r, islice(r, 1, None), task['headers'])
+
+    return file_checksum(task['path'])
 
 
 def write_geojson(path_or_flo, columns, gen):
@@ -102,7 +184,19 @@ def write_geojson(path_or_flo, columns, gen):
 
 
 class Package(object):
-    def __new__(cls, ref=None, cache=None, callback=None, env=None, save_url=None, acl=None):
+
+    # Resources to download ahead of the one being loaded, and the most bytes to hold in downloads that
+    # haven't been loaded yet. None uses METAPACK_PREFETCH_DEPTH and METAPACK_PREFETCH_BUDGET, or the defaults
+    prefetch_depth = None
+    prefetch_budget = None
+
+    data_format = 'csv'  # Format of the resource data files
+
+    # If True, resources are cast with a row processor compiled from the schema, where it can be compiled,
+    # rather than with rowpipe's RowProcessor. See Resource.compile_rows
+    compile_rows = False
+
+    def __new__(cls, ref=None, cache=None, callback=None, env=None, save_url=None, acl=None, **kwargs):
 
         if cls == Package:
 
@@ -135,6 +229,8 @@ class Package(object):
         self._callback = callback
         self._env = env if env is not None else {}
 
+        self._init_build(False)
+
         self.init_doc()
 
     def load_doc(self, ref):
@@ -203,12 +299,7 @@ class Package(object):
     def datafile(self, ref):
         """Return a resource, as a file-like-object, given it's name or url as a reference. """
 
-        r = list(self.doc.resources(name=ref))
-
-        if not r:
-            return None
-        else:
-            return r[0]
+        return self.doc.resource(name=ref)
 
     @property
     def documentation(self):
@@ -458,21 +549,114 @@ class Package(object):
                 col['altname'] = None
                 col['transform'] = None
 
+    def _prefetch_source(self, r):
+        """Download a remote resource source into the cache, returning its size. Runs on the
+        prefetcher's threads"""
+        from rowgenerators.generators import download_and_cache
+        from os.path import getsize
+
+        if not r.url or Url(r.resolved_url).proto not in ('http', 'https', 'ftp', 's3'):
+            return None
+
+        d = download_and_cache(SourceSpec(r.resolved_url), self._cache)
+
+        return getsize(d['sys_path'])
+
+    def _data_url(self, r):
+        return 'data/' + r.name + '.' + self.data_format
+
+    def _init_build(self, resume):
+        """Reset the state of a save"""
+
+        self._resume = resume
+        self._fingerprints = {}
+        self._checksums = {}  # Resource name to the checksum of its data file, once it is built or kept
+        self._dependencies = None
+
+    def _build_fingerprints(self, r):
+        """Return the resource's build fingerprints. The fingerprints of its own inputs are computed once per
+        save, before its url is changed to the data file. The `depends` fingerprint, of the data files of the
+        resources it depends on, is computed on each call, since they may be built after it is first checked.
+        """
+
+        if r.name not in self._fingerprints:
+            self._fingerprints[r.name] = r.build_fingerprints()
+
+        fingerprints = OrderedDict(self._fingerprints[r.name])
+
+        fingerprints['depends'] = self._depends_fingerprint(r)
+
+        return fingerprints
+
+    def _depends_fingerprint(self, r):
+        """Return a fingerprint of the checksums of the data files of the resources that a resource depends on,
+        or None if they haven't all been built or kept yet in this save"""
+        from .schedule import resource_dependencies
+
+        if self._dependencies is None:
+            resources = [d for d in self.datafiles if d.url]
+
+            try:
+                self._dependencies = resource_dependencies(resources)
+            except PackageError:
+                # Bad DependsOn properties, so any resource may depend on the ones before it
+                names = [d.name for d in resources]
+                self._dependencies = {name: set(names[:i]) for i, name in enumerate(names)}
+
+        checksums = [(name, self._checksums.get(name)) for name in sorted(self._dependencies.get(r.name, ()))]
+
+        if any(checksum is None for _, checksum in checksums):
+            return None
+
+        return fingerprint(checksums)
+
+    def _resource_is_current(self, r):
+        """When resuming, return True if the resource's checkpoint from the previous build matches its current
+        fingerprints, and the data from that build can be kept. A current resource is pointed at its data"""
+
+        if not self._resume:
+            return False
+
+        cp = self._read_checkpoint(r.name)
+
+        if cp is None or not cp.matches(self._build_fingerprints(r)) or not self._keep_data(r, cp):
+            return False
+
+        r.url = self._data_url(r)
+
+        self._checksums[r.name] = cp.checksum
+
+        return True
+
+    def _read_checkpoint(self, name):
+        """Return a resource's checkpoint from the previous build, or None. Packages that don't keep
+        checkpoints have none"""
+        return None
+
+    def _keep_data(self, r, cp):
+        """Keep the data of a current resource from the previous build. Return False if it can't be kept"""
+        return False
+
+    def _write_checkpoint(self, r, checksum):
+        self._checksums[r.name] = checksum
+        self._save_checkpoint(Checkpoint(r.name, self._build_fingerprints(r), checksum))
+
+    def _save_checkpoint(self, cp):
+        pass
+
     def _load_resources(self):
-        """Copy all of the Datafile entries into the package"""
+        """Copy all of the Datafile entries into the package. The sources of the next resources are
+        downloaded in the background while each resource is loaded"""
 
-        for r in self.datafiles:
+        for r in Prefetcher(self.datafiles, self._prefetch_source, self.prefetch_depth, self.prefetch_budget):
 
             if not r.url:
                 self.warn("No value for URL for {} ".format(r.term))
                 continue
 
-            try:
-                if self._resource.exists(r):
-                    self.prt("Resource '{}' exists, skipping".format(r.name))
+            if self._resource_is_current(r):
+                self.prt("Resource '{}' is up to date, skipping".format(r.name))
                 continue
-            except AttributeError:
-                pass
 
             self.prt("Reading resource {} from {} ".format(r.name, r.resolved_url))
 
@@ -483,9 +667,11 @@ class Package(object):
 
             assert rg is not None
 
+            rg.compile_rows = self.compile_rows
+
             if True:
                 # Skipping the first line because we'll insetrt the headers manually
-                self._load_resource(r, islice(rg, 1, None), r.headers)
+                self._load_resource(r, rg.iter_rows(), r.headers)
 
             else:
 
@@ -558,7 +744,12 @@ class GooglePackage(Package):
 class FileSystemPackage(Package):
     """A File System package"""
 
-    """A Zip File package"""
+    dir_suffix = ''  # Appended to the package name for the package directory
+
+    # Worker processes for building resources. With more than one, resources that don't depend on each other
+    # are built at the same time, if the document hasn't been changed since it was loaded. None for the
+    # number of CPUs
+    build_processes = 1
 
     def __init__(self, path=None, callback=None, cache=None, env=None):
 
@@ -589,20 +780,29 @@ class FileSystemPackage(Package):
 
     def save_path(self, path=None):
 
-        base = self.doc.find_first_value('Root.Name')
+        base = self.doc.find_first_value('Root.Name') + self.dir_suffix
 
         if path and not path.endswith('.zip'):
             return join(path, base)
         else:
             return base
 
-    def save(self, path=None):
+    def save(self, path=None, resume=False):
+        """Build the package.
+
+        :param path: Directory to build the package in
+        :param resume: If True, only build the resources that weren't built by an earlier save, failed, or
+        have changed since, keeping the data files of the others. Each resource's checkpoint records the
+        fingerprints of its source and schema, and the checksum of its data file.
+        """
 
         self.check_is_ready()
 
         if not self.doc.find_first_value('Root.Name'):
             raise PackageError("Package must have Root.Name term defined")
 
+        self._init_build(resume)
+
         self.sections.resources.sort_by_term()
 
         self.doc.cleanse()
@@ -632,7 +832,7 @@ class FileSystemPackage(Package):
         if path is None:
             path = getcwd()
 
-        name = self.doc.find_first_value('Root.Name')
+        name = self.doc.find_first_value('Root.Name') + self.dir_suffix
 
         np = join(path, name)
 
@@ -644,7 +844,7 @@ class FileSystemPackage(Package):
         if path is None:
             path = getcwd()
 
-        name = self.doc.find_first_value('Root.Name')
+        name = self.doc.find_first_value('Root.Name') + self.dir_suffix
 
         np = join(path, name)
 
@@ -668,20 +868,128 @@ class FileSystemPackage(Package):
         with open(join(self.package_dir, 'index.html'), 'w') as f:
             f.write(self._doc.html)
 
+    def _read_checkpoint(self, name):
+        return Checkpoint.read(self.package_dir, name)
+
+    def _keep_data(self, r, cp):
+        """The data file is kept in place, if it hasn't changed since it was written"""
+        return file_checksum(join(self.package_dir, self._data_url(r))) == cp.checksum
+
+    def _save_checkpoint(self, cp):
+        cp.write(self.package_dir)
+
+    def _build_tasks(self):
+        """Return an OrderedDict of resource name to the task for _build_resource(), or None if the resources
+        can't be built in worker processes: the document isn't a local file, its resources have been changed
+        since it was loaded, the env can't be sent to the workers, or there is only one resource. Resources
+        that are current are skipped"""
+        from .schedule import env_is_sendable
+
+        if not self.doc.ref or Url(self.doc.ref).proto != 'file':
+            return None
+
+        if not env_is_sendable(self._env):
+            return None
+
+        if len([r for r in self.datafiles if r.url]) < 2:
+            return None
+
+        # The workers load the resources from the document's file, so changes made in memory would be lost
+        source = MetatabDoc(self.doc.ref, cache=self._cache)
+
+        for r in self.datafiles:
+            sr = source.resource(r.name) if r.url else None
+
+            if r.url and (sr is None or sr._schema_fingerprint() != r._schema_fingerprint()):
+                return None
+
+        tasks = OrderedDict()
+
+        for r in self.datafiles:
+
+            if not r.url:
+                continue
+
+            if self._resource_is_current(r):
+                self.prt("Resource '{}' is up to date, skipping".format(r.name))
+                continue
+
+            if not r.headers:
+                raise PackageError("Resource {} does not have header. Have schemas been generated?".format(r.name))
+
+            # Fingerprint the resource before its url changes, and remove the checkpoint until the build succeeds
+            self._build_fingerprints(r)
+            Checkpoint.remove(self.package_dir, r.name)
+
+            tasks[r.name] = dict(ref=self.doc.ref, name=r.name, env=self._env, headers=r.headers,
+                                 format=self.data_format, path=join(self.package_dir, self._data_url(r)),
+                                 compile_rows=self.compile_rows)
+
+        return tasks
+
+    def _load_resources(self):
+        """Build the resources in worker processes, running resources that don't depend on each other at
+        the same time. Resources are built one at a time if build_processes is 1, or if they can't be sent to
+        workers. The sources aren't prefetched, since the workers download them at the same time anyway"""
+        from multiprocessing import cpu_count
+        from .schedule import resource_dependencies, run_scheduled
+
+        processes = self.build_processes or cpu_count()
+
+        tasks = self._build_tasks() if processes > 1 else None
+
+        if tasks is None:
+            return super(FileSystemPackage, self)._load_resources()
+
+        if not tasks:
+            return
+
+        resources = OrderedDict()
+
+        for r in self.datafiles:
+            if r.url:
+                resources[r.name] = r
+            else:
+                self.warn("No value for URL for {} ".format(r.term))
+
+        # Resources that are current are already done
+        deps = {name: d & set(tasks) for name, d in resource_dependencies(list(resources.values())).items()
+                if name in tasks}
+
+        self.prt("Building {} resources in {} processes".format(len(tasks), processes))
+
+        for name, checksum, error in run_scheduled(tasks, deps, _build_resource, processes):
+
+            if error:
+                raise PackageError("Failed to build resource '{}': {}".format(name, error))
+
+            r = resources[name]
+            r.url = self._data_url(r)
+
+            self._write_checkpoint(r, checksum)
+
+            self.prt("Loaded data for '{}' ".format(name))
+
+            # Writing after each resource, before the resources that depend on it start, so row-generating
+            # programs and notebooks can access previously created resources.
+            self._write_doc()
+
     def _load_resource(self, r, gen, headers):
 
         self.prt("Loading data for '{}' ".format(r.name))
 
-        r.url = 'data/' + r.name + '.csv'
+        self._build_fingerprints(r)
 
-        path = join(self.package_dir, r.url)
+        # The checkpoint is removed until the new data file is complete, so a failed build is rebuilt
+        Checkpoint.remove(self.package_dir, r.name)
 
-        makedirs(dirname(path), exist_ok=True)
+        r.url = self._data_url(r)
 
-        if exists(path):
-            remove(path)
+        path = join(self.package_dir, r.url)
+
+        write_data(path, self.data_format, r, gen, headers)
 
-        write_csv(path, headers, gen)
+        self._write_checkpoint(r, file_checksum(path))
 
         # Writting between resources so row-generating programs and notebooks can
         # access previously created resources.
@@ -710,6 +1018,15 @@ class FileSystemPackage(Package):
             f.write(contents)
 
 
+class ParquetPackage(FileSystemPackage):
+    """A File System package that stores each resource as a Parquet file, with Arrow types from the schema,
+    so the data can be read back without parsing and casting CSV text"""
+
+    dir_suffix = '-parquet'
+
+    data_format = 'parquet'
+
+
 class SocrataPackage(Package):
     """"""
 
@@ -838,13 +1155,91 @@ class ExcelPackage(Package):
             ws.append(row)
 
 
+# bzip2 and lzma need Python 3.3
+ZIP_COMPRESSION = {name: getattr(zipfile, const) for name, const in (('stored', 'ZIP_STORED'),
+                                                                     ('deflate', 'ZIP_DEFLATED'),
+                                                                     ('bzip2', 'ZIP_BZIP2'),
+                                                                     ('lzma', 'ZIP_LZMA'))
+                   if hasattr(zipfile, const)}
+
+ZIP_OPEN_WRITE = sys.version_info >= (3, 6)  # ZipFile.open() can write entries
+
+ZIP_COMPRESSLEVEL = sys.version_info >= (3, 7)  # ZipFile takes a compresslevel
+
+
+class TempZipEntry(object):
+    """A binary file for writing a zip entry with Pythons before 3.6, where ZipFile.open() can't write. The data
+    is written to a temporary file, which is copied into the zip file on close(), so memory use still doesn't
+    depend on the size of the entry"""
+
+    def __init__(self, zf, name):
+        from tempfile import NamedTemporaryFile
+
+        self.zf = zf
+        self.name = name
+        self.f = NamedTemporaryFile(suffix='.zipentry', delete=False)
+
+    def write(self, b):
+        return self.f.write(b)
+
+    def close(self):
+
+        if self.f.closed:
+            return
+
+        self.f.close()
+
+        try:
+            self.zf.write(self.f.name, self.name)
+        finally:
+            remove(self.f.name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
 class ZipPackage(Package):
-    """A Zip File package"""
+    """A Zip File package. Resources are streamed into the zip file, so memory use doesn't depend on their size"""
 
-    def __init__(self, ref=None, callback=None, cache=None, env=None):
+    compression = 'stored'  # One of ZIP_COMPRESSION
+    compresslevel = None  # Level for deflate and bzip2. None for the default
+
+    # Write data entries with ZIP64 headers, since their size isn't known until they are written. Without
+    # them, an entry larger than 2GB can't be written
+    zip64 = True
+
+    buffer_size = 1024 ** 2  # Bytes of CSV rows buffered before they are compressed into an entry
+
+    def __init__(self, ref=None, callback=None, cache=None, env=None, compression=None, compresslevel=None,
+                 zip64=None):
+        """
+        :param compression: One of 'stored', 'deflate', 'bzip2' or 'lzma'
+        :param compresslevel: Compression level, 0 to 9 for deflate and 1 to 9 for bzip2. Ignored before
+        Python 3.7, which always uses the default level
+        :param zip64: If False, don't write ZIP64 headers for data entries, for readers that don't support them
+        """
 
         super(ZipPackage, self).__init__(ref, callback=callback, cache=cache, env=env)
 
+        if compression is not None:
+            self.compression = compression
+
+        if compresslevel is not None:
+            self.compresslevel = compresslevel
+
+        if zip64 is not None:
+            self.zip64 = zip64
+
+        if self.compression not in ZIP_COMPRESSION:
+            raise PackageError("Unknown zip compression '{}'; must be one of: {}"
+                               .format(self.compression, ', '.join(sorted(ZIP_COMPRESSION))))
+
+        self.zf = None
+        self._previous = None  # The zip file from the previous build, when resuming
+
     def save_path(self, path=None):
         base = self.doc.find_first_value('Root.Name') + '.zip'
 
@@ -855,13 +1250,21 @@ class ZipPackage(Package):
         else:
             return base
 
-    def save(self, path=None):
+    def save(self, path=None, resume=False):
+        """Build the package.
+
+        :param path: Directory or path for the zip file
+        :param resume: If True, copy the resources that haven't changed since the previous build from the
+        existing zip file, rather than building them again
+        """
 
         self.check_is_ready()
 
         if not self.doc.find_first_value('Root.Name'):
             raise PackageError("Package must have Root.Name term defined")
 
+        self._init_build(resume)
+
         self.sections.resources.sort_by_term()
 
         self.load_declares()
@@ -888,22 +1291,84 @@ class ZipPackage(Package):
 
     def _init_zf(self, path):
 
-        from zipfile import ZipFile
+        from zipfile import ZipFile, BadZipfile
+
+        save_path = self.save_path(path)
+        previous_path = save_path + '.previous'
+
+        if self._resume and exists(save_path):
+            # If a previous resumed build failed, its zip file is incomplete, and the one before it is kept
+            if exists(previous_path):
+                remove(save_path)
+            else:
+                shutil.move(save_path, previous_path)
+
+        if self._resume and exists(previous_path):
+            try:
+                self._previous = ZipFile(previous_path)
+            except BadZipfile:
+                self._previous = None
+
+        kwargs = dict(compresslevel=self.compresslevel) if ZIP_COMPRESSLEVEL else {}
 
-        self.zf = ZipFile(self.save_path(path), 'w')
+        self.zf = ZipFile(save_path, 'w', compression=ZIP_COMPRESSION[self.compression], allowZip64=True, **kwargs)
 
     def close(self):
         if self.zf:
             self.zf.close()
 
-    def _write_doc(self):
+        if self._previous:
+            self._previous.close()
+            remove(self._previous.filename)
+            self._previous = None
 
-        bio = BytesIO()
-        writer = csv.writer(bio)
+    def _entry_name(self, path):
+        return self.package_name + '/' + path
 
-        writer.writerows(self.doc.rows)
+    def _open_entry(self, path):
+        """Open an entry for writing, returning a buffered binary file"""
+        import io
+
+        if not ZIP_OPEN_WRITE:
+            return TempZipEntry(self.zf, self._entry_name(path))  # The size is known, so zip64 isn't needed
 
-        self.zf.writestr(self.package_name + '/metadata.csv', bio.getvalue())
+        return io.BufferedWriter(self.zf.open(self._entry_name(path), 'w', force_zip64=self.zip64),
+                                 self.buffer_size)
+
+    def _read_checkpoint(self, name):
+
+        if not self._previous:
+            return None
+
+        try:
+            return Checkpoint.loads(self._previous.read(self._entry_name(checkpoint_name(name))))
+        except KeyError:
+            return None
+
+    def _keep_data(self, r, cp):
+        """Copy the data file and the checkpoint from the previous zip file"""
+
+        try:
+            src = self._previous.open(self._entry_name(self._data_url(r)))
+        except KeyError:
+            return False
+
+        self.prt("Copying data for '{}' from the previous build".format(r.name))
+
+        with src, self._open_entry(self._data_url(r)) as dst:
+            shutil.copyfileobj(src, dst, self.buffer_size)
+
+        self._save_checkpoint(cp)
+
+        return True
+
+    def _save_checkpoint(self, cp):
+        self.zf.writestr(self._entry_name(checkpoint_name(cp.name)), cp.dumps())
+
+    def _write_doc(self):
+
+        with self._open_entry(DEFAULT_METATAB_FILE) as f:
+            csv.writer(f).writerows(self.doc.rows)
 
     def _write_dpj(self):
         from metatab.datapackage import convert_to_datapackage
@@ -924,13 +1389,14 @@ class ZipPackage(Package):
 
         self.prt("Loading data for '{}'  from '{}'".format(r.name, r.resolved_url))
 
-        r.url = 'data/' + r.name + '.csv'
+        self._build_fingerprints(r)
 
-        bio = BytesIO()
+        r.url = self._data_url(r)
 
-        v = write_csv(bio, headers, gen)
+        with HashingWriter(self._open_entry(r.url)) as f:
+            write_csv(f, headers, gen)
 
-        self.zf.writestr(self.package_name + '/' + r.url, v)
+        self._write_checkpoint(r, f.hexdigest())
 
     def _load_documentation(self, term, contents, file_name):
         title = term['title'].value
@@ -943,7 +1409,11 @@ class ZipPackage(Package):
 
 
 class S3Package(Package):
-    """A Zip File package"""
+    """A File System package in an S3 bucket. Resources are streamed to S3 with multipart uploads, so memory use
+    doesn't depend on their size"""
+
+    part_size = None  # Bytes in each part of a multipart upload. None for multipart.PART_SIZE
+    upload_threads = None  # Parts uploaded at the same time. None for multipart.UPLOAD_THREADS
 
     def __init__(self, path=None, callback=None, cache=None, env=None, save_url=None, acl=None):
 
@@ -966,7 +1436,14 @@ class S3Package(Package):
 
             self.bucket = S3Bucket(url, acl=acl)
 
-    def save(self, url=None, acl=None):
+    def save(self, url=None, acl=None, resume=False):
+        """Build the package in the bucket.
+
+        :param url: S3 url of the bucket and prefix
+        :param acl: S3 ACL for the objects
+        :param resume: If True, keep the data of the resources that haven't changed since the previous build
+        in the bucket, rather than building them again
+        """
 
         self.check_is_ready()
 
@@ -977,6 +1454,8 @@ class S3Package(Package):
         if not name:
             raise PackageError("Package must have Root.Name term defined")
 
+        self._init_build(resume)
+
         self.prt("Preparing S3 package '{}' ".format(name))
 
         self.sections.resources.sort_by_term()
@@ -1029,12 +1508,25 @@ class S3Package(Package):
 
         return self.bucket.exists(self.package_name, 'index.html')
 
-    def write_to_s3(self, path, body):
+    def write_to_s3(self, path, body, skip_existing=True):
 
-        self.bucket.write(body, join(self.package_name, path), acl=self._acl)
+        self.bucket.write(body, join(self.package_name, path), acl=self._acl, skip_existing=skip_existing)
 
         return
 
+    def read_from_s3(self, path):
+        return self.bucket.read(join(self.package_name, path))
+
+    def _read_checkpoint(self, name):
+        return Checkpoint.loads(self.read_from_s3(checkpoint_name(name)))
+
+    def _keep_data(self, r, cp):
+        """The data object is kept in the bucket, if it still exists"""
+        return self.bucket.exists(self.package_name, self._data_url(r))
+
+    def _save_checkpoint(self, cp):
+        self.write_to_s3(checkpoint_name(cp.name), cp.dumps(), skip_existing=False)
+
     def _write_doc(self):
 
         bio = BytesIO()
@@ -1055,15 +1547,20 @@ class S3Package(Package):
 
     def _load_resource(self, r, gen, headers):
 
-        r.url = 'data/' + r.name + '.csv'
+        self._build_fingerprints(r)
 
-        bio = BytesIO()
+        r.url = self._data_url(r)
+
+        self.prt("Loading data for '{}' to '{}' ".format(r.name, r.url))
 
-        data = write_csv(bio, headers, gen)
+        # The rows are uploaded in parts as they are written. If there is an error, the upload is aborted
+        with HashingWriter(self.bucket.open_writer(join(self.package_name, r.url), acl=self._acl,
+                                                   part_size=self.part_size, threads=self.upload_threads)) as f:
+            write_csv(f, headers, gen)
 
-        self.prt("Loading data ({} bytes) to '{}' ".format(len(data), r.url))
+        self.prt("Loaded data ({} bytes) to '{}' ".format(f.size, r.url))
 
-        self.write_to_s3(r.url, data)
+        self._write_checkpoint(r, f.hexdigest())
 
     def _load_documentation(self, term, contents, file_name):
 
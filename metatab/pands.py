@@ -61,3 +61,103 @@ class MetatabDataFrame(DataFrame):
             yield list(t)
 
 
+
+
+CATEGORY_CASTS = {'integer': int, 'int': int, 'number': float, 'float': float}
+
+
+def pandas_dtype(datatype, categories=None):
+    """Return the pandas dtype for a schema datatype. Columns with categories, from a value set, are
+    categorical; an empty list of categories means the categories come from the data. Value sets are
+    declared as strings, so the categories of numeric columns are cast to the datatype, and numeric columns
+    with categories that can't be cast aren't categorical."""
+    import pandas as pd
+
+    if categories and datatype in CATEGORY_CASTS:
+        try:
+            categories = [CATEGORY_CASTS[datatype](c) for c in categories]
+        except (TypeError, ValueError):
+            categories = None
+
+    if categories is not None:
+        return pd.CategoricalDtype(categories or None)
+    elif datatype in ('integer', 'int'):
+        return 'Int64'
+    elif datatype in ('number', 'float'):
+        return 'float64'
+    else:
+        return object
+
+
+class FrameBuilder(object):
+    """Build the columns of a dataframe incrementally from the ColumnBatches of Resource.iter_batches(),
+    so the rows never have to exist as Python lists all at once."""
+
+    def __init__(self, headers, datatypes=None, categories=None):
+        """
+        :param headers: Column headers, which may be duplicated
+        :param datatypes: Schema datatype for each column, by position, or None if the resource has no schema
+        :param categories: For each column, None or a list of categories, as for pandas_dtype()
+        """
+
+        self.headers = headers
+        self.dtypes = [pandas_dtype(dt, cats) for dt, cats in zip(datatypes or [None] * len(headers),
+                                                                    categories or [None] * len(headers))]
+        self._chunks = [[] for _ in headers]
+        self.n_rows = 0
+
+    def add(self, batch, limit=None):
+        """Add the columns of a ColumnBatch, up to a total of limit rows. Returns False when the limit
+        has been reached """
+
+        n = batch.n_rows
+
+        if limit is not None:
+            n = min(n, limit - self.n_rows)
+
+        for chunks, col in zip(self._chunks, batch.columns):
+            col = col[:n]
+
+            if isinstance(col, np.ma.MaskedArray):
+                # Copy, since the batch may reuse its buffers
+                chunks.append((col.data.copy(), np.ma.getmaskarray(col).copy()))
+            else:
+                chunks.append(col)
+
+        self.n_rows += n
+
+        return limit is None or self.n_rows < limit
+
+    def _column(self, chunks, dtype):
+        import pandas as pd
+
+        if chunks and isinstance(chunks[0], tuple):
+            data = np.concatenate([c[0] for c in chunks])
+            mask = np.concatenate([c[1] for c in chunks])
+
+            if dtype == 'Int64':
+                return pd.arrays.IntegerArray(data, mask)
+            elif dtype == 'float64':
+                data[mask] = np.nan
+                return data
+            else:
+                values = data.astype(object)
+                values[mask] = None
+        else:
+            values = [v for c in chunks for v in c]
+
+        try:
+            return pd.array(values, dtype=dtype)
+        except (TypeError, ValueError):
+            return pd.array(values, dtype=object)  # Cast failures, which are left as strings
+
+    def frame(self, metatab_resource=None):
+        """Return a MetatabDataFrame of the accumulated columns"""
+
+        columns = [self._column(chunks, dtype) for chunks, dtype in zip(self._chunks, self.dtypes)]
+
+        df = MetatabDataFrame(dict(enumerate(columns)), columns=list(range(len(columns))),
+                              metatab_resource=metatab_resource)
+        df.columns = self.headers
+
+        return df
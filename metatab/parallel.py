@@ -0,0 +1,129 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Read and cast a local CSV file in parallel. The file is split into byte ranges on the offsets in its
+row index, which start on record boundaries and give the row numbers of the ranges, and each range is
+cast by a worker process with a compiled row processor."""
+
+import mmap
+from collections import OrderedDict, deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+
+import unicodecsv as csv
+
+from .predicate import filter_rows
+from .rowcompile import MAX_COLUMN_ERRORS, compile_row_processor
+
+RANGES_PER_PROCESS = 4  # More ranges than processes balances the work when ranges cast at different speeds
+
+MAX_RANGE_SIZE = 8 * 1024 ** 2  # Bytes in a range, which a worker returns as one list of rows
+
+PENDING_PER_PROCESS = 2  # Ranges sent to the workers, but not yet yielded, for each process
+
+PARALLEL_MIN_SIZE = 32 * 1024 ** 2  # Files smaller than this aren't worth reading in parallel by default
+
+
+def read_range(path, start, end, encoding='utf8'):
+    """Yield the records of the file that start in the byte range"""
+
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        try:
+            mm.seek(start)
+
+            def lines():
+                while mm.tell() < end:
+                    line = mm.readline()
+                    if not line:
+                        break
+                    yield line
+
+            for row in csv.reader(lines(), encoding=encoding):
+                yield row
+        finally:
+            mm.close()
+
+
+def cast_range(task):
+    """Read and cast one range of the file. Runs in the worker processes.
+
+    :param task: A dict with the path, start, end and encoding of the range, the columns and env for
+    compile_row_processor(), `raw`, a list of (predicate, source_index, cast) tuples to evaluate on the source
+    rows, `post`, a list of (predicate, index) tuples to evaluate on the cast rows, and `indexes`,
+    the positions of the output columns in the cast rows, or None for all of them.
+    :return: A tuple of the list of rows and the dict of errors
+    """
+
+    process_row = compile_row_processor(task['columns'], task['env'])
+
+    rows = read_range(task['path'], task['start'], task['end'], task['encoding'])
+    rows = filter_rows(rows, [p.compile(i, cast) for p, i, cast in task['raw']])
+
+    tests = [p.compile(i) for p, i in task['post']]
+    indexes = task['indexes']
+
+    errors = OrderedDict()
+    scratch = {}
+    out = []
+
+    for row_n, row in enumerate(rows, task['first_row']):
+        row = process_row(row, row_n, errors, scratch)
+
+        if tests and not all(t(row) for t in tests):
+            continue
+
+        out.append(row if indexes is None else [row[i] for i in indexes])
+
+    return out, errors
+
+
+def merge_errors(errors, new_errors):
+    """Add the errors from a range to the errors from the previous ranges"""
+
+    for header, messages in new_errors.items():
+        existing = errors.setdefault(header, [])
+        existing.extend(messages[:max(0, MAX_COLUMN_ERRORS - len(existing))])
+
+    return errors
+
+
+def cast_ranges(tasks, processes=None, ordered=True):
+    """Cast the ranges in a pool of worker processes, yielding a (rows, errors) tuple for each range,
+    in the order of the ranges if ordered is True, or as they are finished. Only PENDING_PER_PROCESS ranges
+    for each process are sent to the workers ahead of the caller, so memory use doesn't grow with
+    the size of the file when the caller is slower than the workers. """
+
+    processes = processes or cpu_count()
+
+    tasks = iter(tasks)
+    pending = deque()
+
+    pool = Pool(processes)
+
+    try:
+        for task in islice(tasks, processes * PENDING_PER_PROCESS):
+            pending.append(pool.apply_async(cast_range, (task,)))
+
+        while pending:
+
+            if ordered:
+                result = pending.popleft()
+            else:
+                # The first finished range, or the oldest one, if none are finished
+                result = next((r for r in pending if r.ready()), None)
+
+                while result is None:
+                    pending[0].wait(0.05)
+                    result = next((r for r in pending if r.ready()), None)
+
+                pending.remove(result)
+
+            for task in islice(tasks, 1):
+                pending.append(pool.apply_async(cast_range, (task,)))
+
+            yield result.get()
+    finally:
+        pool.terminate()
+        pool.join()
@@ -66,14 +66,19 @@ class Term(object):
             except AttributeError:
                 return v
 
-        self.parent = parent  # If set, term was generated from term args
+        # Memoized conversions of this term, such as the as_dict() output. Cleared by _invalidate()
+        self._memo = {}
+        self._section = None
+        self.parent = None
 
         self.term = term  # A lot going on in this setter!
 
-        self.value = strip_if_str(value) if value else None
+        # Set after the term, so constructing a term doesn't invalidate the parent's memos
+        self.parent = parent  # If set, term was generated from term args
+
+        self._value = strip_if_str(value) if value else None
         self.args = [strip_if_str(x) for x in term_args]
 
-        self._section = None
         self.section = section
         self.doc = doc
 
@@ -94,6 +99,15 @@ class Term(object):
 
         assert self.file_name is None or isinstance(self.file_name, six.string_types)
 
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, v):
+        self._value = v
+        self._invalidate()
+
     @property
     def section(self):
         return self._section
@@ -110,6 +124,23 @@ class Term(object):
             self._doc = v.doc
 
 
+    def _invalidate(self):
+        """Discard the memoized conversions of this term, the ancestors up to the section level, and
+        the section that holds the top level ancestor. Called on every mutation of the term. """
+
+        t = self
+
+        while True:
+            t._memo.clear()
+
+            if t.parent is None or isinstance(t.parent, SectionTerm):
+                break
+
+            t = t.parent
+
+        if t._section is not None and t._section is not t:
+            t._section._memo.clear()
+
     @classmethod
     def split_term(cls, term):
         """
@@ -160,6 +191,7 @@ class Term(object):
         self.children.append(child)
         child.parent = self
         assert not child.term_is("Datafile.Section")
+        self._invalidate()
 
     def new_child(self, term, value, **kwargs):
         """Create a new term and add it to this term as a child. Creates grandchildren from the kwargs.
@@ -173,12 +205,14 @@ class Term(object):
         c = Term(term, str(value), parent=self, doc=self.doc, section=self.section).new_children(**kwargs)
         assert not c.term_is("*.Section")
         self.children.append(c)
+        self._invalidate()
         return c
 
     def remove_child(self, child):
         """Remove the term from this term's children. """
         assert isinstance(child, Term)
         self.children.remove(child)
+        self._invalidate()
 
     def new_children(self, **kwargs):
         """Create new children from kwargs"""
@@ -209,6 +243,21 @@ class Term(object):
                 if value is None or c.value == value:
                     yield c
 
+    def _child_index(self):
+        """Return a dict of record term to the first child with that name. Memoized until the term changes"""
+
+        index = self._memo.get('children')
+
+        if index is None:
+            index = {}
+
+            for c in self.children:
+                index.setdefault(c.record_term_lc, c)
+
+            self._memo['children'] = index
+
+        return index
+
     def find_first(self, term, value = None):
         """Like find(), but returns only the first matching term"""
 
@@ -216,6 +265,9 @@ class Term(object):
             parent, term = term.split('.')
             assert parent.lower() == self.record_term_lc, (term, parent.lower(),self.record_term_lc)
 
+        if value is None:
+            return self._child_index().get(term.lower())
+
         for c in self.children:
             if c.record_term_lc == term.lower():
                 if value is None or c.value == value:
@@ -249,6 +301,7 @@ class Term(object):
             c = Term(term, value, parent=self, doc=self.doc, section=self.section).new_children(**kwargs)
             assert not c.term_is("Datafile.Section"), (self, c)
             self.children.append(c)
+            self._invalidate()
 
         else:
             if value is not None:
@@ -326,6 +379,8 @@ class Term(object):
 
         self.parent_term, self.record_term = Term.split_term_lower(self._term)
 
+        self._invalidate()
+
 
     @classmethod
     def normalize_term(cls, term):
@@ -459,13 +514,25 @@ class Term(object):
 
     def as_dict(self):
         """Convert the term, and it's children, to a minimal data structure form, which may
-        be a scalar for a term with a single value or a dict if it has multiple proerties. """
+        be a scalar for a term with a single value or a dict if it has multiple proerties.
+
+        The conversion is memoized until the term or one of its descendents is changed. The returned
+        dict is a copy, but nested values are shared with the memo, so they should not be altered. """
 
-        return self._convert_to_dict(self)
+        d = self._convert_to_dict(self)
+
+        return dict(d) if isinstance(d, dict) else d
+
+    @property
+    def _dict_children(self):
+        """The terms that are converted into the entries of this term's dict"""
+        return self.children
 
     @classmethod
     def _convert_to_dict(cls, term):
-        """Converts a record heirarchy to nested dicts.
+        """Converts a record heirarchy to nested dicts. The conversion is done with an explicit stack,
+        rather than recursion, and each converted term is memoized, so only terms that have changed since the
+        last conversion are re-visited.
 
         :param term: Root term at which to start conversion
 
@@ -474,40 +541,112 @@ class Term(object):
         if not term:
             return None
 
-        if term.children:
+        stack = [(term, False)]
 
-            d = {}
+        while stack:
+            t, expanded = stack.pop()
 
-            for c in term.children:
+            if 'dict' in t._memo:
+                continue
 
-                if c.child_property_type == 'scalar':
-                    d[c.record_term_lc] = cls._convert_to_dict(c)
+            children = t._dict_children
 
-                elif c.child_property_type == 'sequence':
-                    try:
-                        d[c.record_term_lc].append(cls._convert_to_dict(c))
-                    except (KeyError, AttributeError):
-                        # The c.term property doesn't exist, so add a list
-                        d[c.record_term_lc] = [cls._convert_to_dict(c)]
+            if not children:
+                t._memo['dict'] = t.value
 
-                else:
-                    try:
-                        d[c.record_term_lc].append(cls._convert_to_dict(c))
-                    except KeyError:
-                        # The c.term property doesn't exist, so add a scalar or a map
-                        d[c.record_term_lc] = cls._convert_to_dict(c)
-                    except AttributeError as e:
-                        # d[c.term] exists, but is a scalar, so convert it to a list
+            elif not expanded:
+                # Revisit the term after all of its children have been converted.
+                stack.append((t, True))
+                stack.extend((c, False) for c in children if 'dict' not in c._memo)
 
-                        d[c.record_term_lc] = [d[c.record_term]] + [cls._convert_to_dict(c)]
+            else:
+                t._memo['dict'] = cls._fold_children(t, children)
 
-            if term.value:
-                d[term.term_value_name.lower()] = term.value
+        return term._memo['dict']
 
-            return d
+    @staticmethod
+    def _fold_children(term, children):
+        """Combine the converted values of a term's children into a dict. Children with the same record
+        term are collected into a list, unless the term's child property type is 'scalar' """
 
-        else:
-            return term.value
+        d = {}
+
+        for c in children:
+            k = c.record_term_lc
+            v = c._memo['dict']
+            cpt = c.child_property_type
+
+            if cpt == 'scalar':
+                d[k] = v
+
+            elif isinstance(d.get(k), list):
+                d[k].append(v)
+
+            elif cpt == 'sequence':
+                d[k] = [v]
+
+            elif k in d:
+                # d[k] exists, but is a scalar, so convert it to a list
+                d[k] = [d[k], v]
+
+            else:
+                d[k] = v
+
+        if term.value:
+            d[term.term_value_name.lower()] = term.value
+
+        return d
+
+    def fingerprint(self, exclude=None):
+        """Return a hex digest of the term's record term, value and the fingerprints of its children, in order.
+        The digest is memoized until the term or one of its descendents is changed, so after a change only
+        the changed terms and their ancestors are re-hashed.
+
+        :param exclude: An optional collection of qualified term names, such as 'root.modified'. Descendents
+        with these names are left out of the fingerprint.
+        """
+
+        exclude = frozenset(Term.normalize_term(e) for e in exclude) if exclude else frozenset()
+
+        return self._fingerprint(self, exclude)
+
+    @classmethod
+    def _fingerprint(cls, term, exclude):
+        from hashlib import sha1
+
+        key = ('hash', exclude)
+
+        def included(c):
+            return not exclude or c.qualified_term not in exclude
+
+        stack = [(term, False)]
+
+        while stack:
+            t, expanded = stack.pop()
+
+            if key in t._memo:
+                continue
+
+            children = [c for c in t._dict_children if included(c)]
+
+            if children and not expanded:
+                # Revisit the term after all of its children have been hashed.
+                stack.append((t, True))
+                stack.extend((c, False) for c in children if key not in c._memo)
+                continue
+
+            h = sha1()
+            h.update(t.record_term_lc.encode('utf8'))
+            h.update(b'\x1f')
+            h.update(b'\x00' if t.value is None else six.text_type(t.value).encode('utf8'))
+
+            for c in children:
+                h.update(b'\x1e')
+                h.update(c._memo[key].encode('ascii'))
+
+            t._memo[key] = h.hexdigest()
+
+        return term._memo[key]
 
     @property
     def rows(self):
@@ -615,6 +754,7 @@ class SectionTerm(Term):
         if t not in self.terms:
             if t.parent_term_lc == 'root':
                 self.terms.append(t)
+                self._invalidate()
 
                 self.doc.add_term(t, add_section=False)
 
@@ -670,6 +810,7 @@ class SectionTerm(Term):
         """Remove a term from the terms. Must be the identical term, the same object"""
 
         self.terms.remove(term)
+        self._invalidate()
 
     def clean(self):
         """Remove all of the terms from the section, and also remove them from the document"""
@@ -706,6 +847,8 @@ class SectionTerm(Term):
 
             self.terms = sorted_terms
 
+        self._invalidate()
+
     def __getitem__(self, item):
         """Synonym for get_term()"""
         return self.get_term(item)
@@ -767,16 +910,46 @@ class SectionTerm(Term):
                 else:
                     yield row
 
-    def as_dict(self):
-        """Return the whole section as a dict"""
-        old_children = self.children
-        self.children = self.terms
+    @property
+    def _dict_children(self):
+        return self.terms
 
-        d = super(SectionTerm, self).as_dict()
+    def _property_index(self):
+        """Return a dict that maps (qualified term, property, value) to the list of terms in this section
+        with that property value, in document order. The term value is indexed under the term's term value name.
+        Only terms with a root parent are indexed, which are the terms that MetatabDoc.find() can match
+        with an unqualified name. The index is memoized until a term in the section changes. """
 
-        self.children = old_children
+        index = self._memo.get('index')
 
-        return d
+        if index is None:
+            index = {}
+
+            for rt in self.terms:
+                for t in [rt] + list(rt.descendents):
+
+                    if t.parent_term_lc != 'root':
+                        continue
+
+                    props = {}
+
+                    # Only the first child with a name is a property value, as in Term.get_value()
+                    for c in t.children:
+                        props.setdefault(c.record_term_lc, c.value)
+
+                    props[t.term_value_name.lower()] = t.value
+
+                    for k, v in props.items():
+                        if v is not None:
+                            index.setdefault((t.join_lc, k, v), []).append(t)
+
+            self._memo['index'] = index
+
+        return index
+
+    def as_dict(self):
+        """Return the whole section as a dict. The dict is memoized until a term in the section changes. """
+        return super(SectionTerm, self).as_dict()
 
 
 class RootSectionTerm(SectionTerm):
@@ -974,8 +1147,8 @@ class TermParser(object):
 
     @classmethod
     def generate_terms(cls, ref, root, doc=None, file_type=None):
-        """An generator that yields term objects, handling includes and argument
-        children.
+        """An generator that yields the row terms, handling includes. The argument children
+        are created in __iter__, which has the parameter map for the current section.
 
         """
 
@@ -1052,16 +1225,6 @@ class TermParser(object):
 
                 yield t
 
-                # Yield any child terms, from the term row arguments
-                if not t.term_is('section') and not t.term_is('header'):
-                    for col, value in enumerate(t.args, 0):
-                        if six.text_type(value).strip():
-                            yield Term(t.record_term_lc + '.' + six.text_type(col), six.text_type(value), [],
-                                       row=line_n,
-                                       col=col + 2,  # The 0th argument starts in col 2
-                                       file_name=ref,
-                                       file_type=file_type,
-                                       parent=t)
         except IncludeError as e:
             from six import text_type
             exc = IncludeError(text_type(e) + "; in '{}' ".format(ref))
@@ -1086,35 +1249,23 @@ class TermParser(object):
 
         try:
 
-            for i, t in enumerate(self.generate_terms(self._ref, root, self._doc)):
+            for t in self._with_arg_children(self.generate_terms(self._ref, root, self._doc)):
 
-                # Substitute synonyms
-                if t.join_lc in self.synonyms:
+                # Substitute synonyms. Arg children already have their final names, from the parameter map
+                if not t.is_arg_child and t.join_lc in self.synonyms:
                     t.parent_term, t.record_term = Term.split_term_lower(self.synonyms[t.join_lc]);
 
-                # Remap integer record terms to names from the parameter map
-                try:
-                    t.record_term = str(self._param_map[int(t.record_term)])
-                except ValueError:
-                    pass  # the record term wasn't an integer
-
-                except IndexError:
-                    pass  # Probably no parameter map.
-
                 t.section = last_section
 
-                def munge_param_map(t):
-                    return [p.lower() if p else i for i, p in enumerate(t.args)]
-
                 if t.term_is('root.header'):
-                    self._param_map = munge_param_map(t)
+                    self._param_map = self.param_map(t)
                     default_term_value_name = t.value.lower()
                     last_section.header_args = t.args
                     last_section.default_term_value_name = default_term_value_name
                     continue
 
                 elif t.term_is('root.section'):
-                    self._param_map = munge_param_map(t)
+                    self._param_map = self.param_map(t)
                     # Parentage should not persist across sections
                     last_parent_term = self.root.record_term
 
@@ -1178,6 +1329,44 @@ class TermParser(object):
             raise
 
 
+    @staticmethod
+    def param_map(t):
+        """Return the parameter map for a Section or Header term: the property name for each argument
+        column, lowercased, or the column number for columns that don't have a name"""
+
+        return [p.lower() if p else six.text_type(i) for i, p in enumerate(t.args)]
+
+    def _with_arg_children(self, terms):
+        """Yield each term, followed by the child terms created from the term's arguments. The children
+        are named after the parent has been handled in __iter__, so they get the parent's name after
+        synonyms are substituted, and the parameter map of the section that holds the parent. Include,
+        Declare, Section and Header terms don't have argument children. """
+
+        for t in terms:
+
+            has_arg_children = bool(t.args) and not t.term_is(('include', 'declare', 'section', 'header'))
+
+            yield t
+
+            if not has_arg_children:
+                continue
+
+            param_map = self._param_map
+            n_params = len(param_map)
+
+            for col, value in enumerate(t.args):
+                value = six.text_type(value)
+
+                if value.strip():
+                    name = param_map[col] if col < n_params else six.text_type(col)
+
+                    yield Term(t.record_term_lc + '.' + name, value, [],
+                               row=t.row,
+                               col=col + 2,  # The 0th argument starts in col 2
+                               file_name=t.file_name,
+                               file_type=t.file_type,
+                               parent=t)
+
     def manage_declare_terms(self, t):
 
         if t.term_is('root.declaresection'):
@@ -0,0 +1,154 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Simple comparisons on resource columns, for Resource.where(). Predicates on columns that don't need a
+transform are evaluated on the source values, before the rows are cast, so rejected rows are skipped
+cheaply. """
+
+import operator
+import re
+from ast import literal_eval
+
+from six import string_types, text_type
+
+from .exc import MetatabError
+
+OPERATORS = {
+    '==': operator.eq,
+    '=': operator.eq,
+    '!=': operator.ne,
+    '<': operator.lt,
+    '<=': operator.le,
+    '>': operator.gt,
+    '>=': operator.ge,
+    'in': lambda v, values: v in values,
+    'not in': lambda v, values: v not in values,
+}
+
+EXPRESSION = re.compile(r'^\s*(\w+)\s*(==|!=|<=|>=|=|<|>|\s+not\s+in\s+|\s+in\s+)\s*(.+?)\s*$')
+
+
+def _int(v):
+    try:
+        return int(v)
+    except ValueError:
+        f = float(v)  # Integers formatted as floats, like '1.0'
+        if not f.is_integer():
+            raise
+        return int(f)
+
+
+# Casts for source values, for the datatypes that can be compared before the row processor casts the row
+RAW_CASTS = {
+    'integer': _int,
+    'int': _int,
+    'number': float,
+    'float': float,
+    'string': text_type,
+    'str': text_type,
+    'text': text_type,
+}
+
+
+class Predicate(object):
+    """A comparison of a column to a constant, such as ``year >= 2010`` or ``state in ('CA', 'NV')``.
+    Empty values, and values that can't be cast, compare false, except with '!=' and 'not in' """
+
+    def __init__(self, column, op, value):
+
+        if op not in OPERATORS:
+            raise MetatabError("Unknown comparison operator '{}'".format(op))
+
+        if op in ('in', 'not in') and (isinstance(value, string_types) or not hasattr(value, '__iter__')):
+            raise MetatabError("The '{}' operator requires a sequence of values".format(op))
+
+        self.column = column
+        self.op = op
+        self.value = value
+
+    @classmethod
+    def parse(cls, condition):
+        """Return a Predicate from a string expression, such as "year >= 2010", or a (column, op, value) tuple.
+        Values in expressions are Python literals; a value that isn't a literal is used as a string """
+
+        if isinstance(condition, Predicate):
+            return condition
+
+        if not isinstance(condition, string_types):
+            try:
+                column, op, value = condition
+            except (TypeError, ValueError):
+                raise MetatabError("Can't use '{}' as a condition".format(condition))
+
+            return cls(column, op, value)
+
+        m = EXPRESSION.match(condition)
+
+        if not m:
+            raise MetatabError("Can't parse condition '{}'".format(condition))
+
+        column, op, value = m.groups()
+
+        try:
+            value = literal_eval(value)
+        except (ValueError, SyntaxError):
+            pass
+
+        return cls(column, ' '.join(op.split()), value)
+
+    def _cast_value(self, cast):
+
+        try:
+            if self.op in ('in', 'not in'):
+                return frozenset(cast(v) for v in self.value)
+            else:
+                return cast(self.value)
+        except (ValueError, TypeError):
+            raise MetatabError("Can't compare column '{}' to '{}'".format(self.column, self.value))
+
+    def compile(self, index, cast=None):
+        """Return a function of a row that is True if the row passes the comparison.
+
+        :param index: Position of the column in the row, or None if the column is always empty.
+        :param cast: Function to cast the value in the row, and the constant, or None if the values in
+        the row are already cast
+        """
+
+        f = OPERATORS[self.op]
+        value = self._cast_value(cast) if cast else self.value
+        if_empty = self.op in ('!=', 'not in')
+
+        def test(row):
+            v = row[index] if index is not None and index < len(row) else None
+
+            if v is None or v == '':
+                return if_empty
+
+            if cast:
+                try:
+                    v = cast(v)
+                except (ValueError, TypeError):
+                    return if_empty
+
+            try:
+                return f(v, value)
+            except TypeError:
+                return if_empty
+
+        return test
+
+    def __repr__(self):
+        return 'Predicate({!r}, {!r}, {!r})'.format(self.column, self.op, self.value)
+
+
+def filter_rows(rows, tests):
+    """Yield the rows that pass all of the tests, functions from Predicate.compile()"""
+
+    if not tests:
+        for row in rows:
+            yield row
+        return
+
+    for row in rows:
+        if all(t(row) for t in tests):
+            yield row
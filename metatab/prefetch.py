@@ -0,0 +1,82 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Prefetch the sources of upcoming resources on background threads, so downloading the next resources
+overlaps with casting and writing the current one"""
+
+from multiprocessing.pool import ThreadPool
+from os import environ
+
+PREFETCH_DEPTH = 2  # Resources fetched ahead of the current one
+
+PREFETCH_BUDGET = 512 * 1024 ** 2  # Bytes of fetched sources that may wait ahead of the current resource
+
+
+class Prefetcher(object):
+    """Iterate over items, calling a fetch function for up to `depth` of the following items on a
+    pool of threads while the caller works on the current one.
+
+    The fetch function returns the number of bytes it fetched, or None. No more items are fetched while the
+    items fetched ahead of the current one hold `budget` bytes or more. A fetch holds an equal share of the
+    budget, budget / depth, from when it starts until it finishes and its size is known, so the fetches that
+    are running count against the budget as well as the finished ones. Errors from the fetch function are
+    recorded in `errors`, by position, and otherwise ignored: the caller will get the error again
+    when it fetches the item itself.
+    """
+
+    def __init__(self, items, fetch, depth=None, budget=None):
+        self.items = list(items)
+        self.fetch = fetch
+
+        self.depth = depth if depth is not None else int(environ.get('METAPACK_PREFETCH_DEPTH', PREFETCH_DEPTH))
+        self.budget = budget if budget is not None else int(environ.get('METAPACK_PREFETCH_BUDGET', PREFETCH_BUDGET))
+
+        self.errors = {}
+
+    def __iter__(self):
+
+        if not self.depth:
+            for item in self.items:
+                yield item
+            return
+
+        pool = ThreadPool(self.depth)
+
+        pending = {}  # Position to the result of the fetch
+        held = {}  # Position to the bytes held by each fetch ahead of the current item
+        next_i = 1
+
+        share = self.budget / float(self.depth)  # Reserved for a fetch until its size is known
+
+        try:
+            # The first item isn't prefetched; the caller fetches it while the next ones are prefetched
+            for i, item in enumerate(self.items):
+
+                for j in [j for j, result in pending.items() if j > i and result.ready()]:
+                    held[j] = self._size(j, pending.pop(j))
+
+                next_i = max(next_i, i + 1)  # Items skipped for the budget are fetched by the caller
+
+                while next_i < len(self.items) and next_i <= i + self.depth and sum(held.values()) < self.budget:
+                    pending[next_i] = pool.apply_async(self.fetch, (self.items[next_i],))
+                    held[next_i] = share
+                    next_i += 1
+
+                if i in pending:
+                    self._size(i, pending.pop(i))  # Wait for the fetch to finish
+
+                held.pop(i, None)
+
+                yield item
+
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def _size(self, i, result):
+
+        try:
+            return result.get() or 0
+        except Exception as e:
+            self.errors[i] = e
+            return 0
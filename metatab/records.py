@@ -0,0 +1,133 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Lightweight record classes for resource rows. A record is a tuple, with the values available by
+attribute, using the header sanitized to an identifier, and by key, using the header, like a dict"""
+
+import keyword
+import re
+from operator import itemgetter
+
+from six import string_types
+
+_classes = {}  # Record classes, by headers
+
+
+def field_names(headers):
+    """Return identifiers for the headers, unique, and not keywords or names used by the record class"""
+
+    names = []
+    seen = set(vars(Record))
+
+    for i, h in enumerate(headers):
+        name = re.sub(r'\W', '_', h or '').strip('_') or 'col{}'.format(i + 1)
+
+        if name[0].isdigit():
+            name = '_' + name
+
+        if keyword.iskeyword(name):
+            name += '_'
+
+        base, n = name, 1
+        while name in seen:
+            n += 1
+            name = '{}_{}'.format(base, n)
+
+        seen.add(name)
+        names.append(name)
+
+    return names
+
+
+class Record(tuple):
+    """Base class for record classes from record_class()"""
+
+    __slots__ = ()
+
+    headers = ()
+    fields = ()
+    _index = {}
+
+    @classmethod
+    def _make(cls, row):
+        """Make a record from a row, padding short rows with None and truncating long ones"""
+
+        n = len(cls.headers)
+
+        if len(row) != n:
+            row = (list(row) + [None] * n)[:n]
+
+        return tuple.__new__(cls, row)
+
+    def __getitem__(self, k):
+
+        if isinstance(k, string_types):
+            try:
+                return tuple.__getitem__(self, self._index[k])
+            except KeyError:
+                raise KeyError(k)
+
+        return tuple.__getitem__(self, k)
+
+    def __contains__(self, k):
+        """Records are like dicts for membership: True if k is a header"""
+        return k in self._index
+
+    def get(self, k, default=None):
+        try:
+            return self[k]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return list(self.headers)
+
+    def items(self):
+        return list(zip(self.headers, self))
+
+    def values(self):
+        return list(self)
+
+    def _asdict(self):
+        return {h: self[h] for h in self.headers}
+
+    def __repr__(self):
+        return '{}({})'.format(type(self).__name__,
+                               ', '.join('{}={!r}'.format(f, v) for f, v in zip(self.fields, self)))
+
+
+def record_class(headers, name='Record'):
+    """Return a record class for rows with the given headers. Classes are cached, so all of the resources
+    with the same headers share one class"""
+
+    headers = tuple(headers)
+
+    try:
+        return _classes[(headers, name)]
+    except KeyError:
+        pass
+
+    fields = field_names(headers)
+
+    # Headers and field names both work as keys. A duplicated header is the first column with that header,
+    # and a header is never shadowed by another column's field name
+    index = {}
+
+    for k, i in list(zip(headers, range(len(headers)))) + list(zip(fields, range(len(fields)))):
+        index.setdefault(k, i)
+
+    namespace = {
+        '__slots__': (),
+        'headers': headers,
+        'fields': tuple(fields),
+        '_index': index,
+    }
+
+    for i, f in enumerate(fields):
+        namespace[f] = property(itemgetter(i))
+
+    cls = type(str(name), (Record,), namespace)
+
+    _classes[(headers, name)] = cls
+
+    return cls
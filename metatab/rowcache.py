@@ -0,0 +1,176 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""A cache of cast resource rows, stored as Parquet files in the metapack cache. Entries are keyed on the
+resolved URL, the version of the source, and the schema, and the least recently used entries are
+evicted when the cache grows past its maximum size.
+
+The cache is off by default, since every uncached iteration also writes the rows to a Parquet file. Set
+METAPACK_ROW_CACHE_SIZE to the maximum size of the cache, in bytes, to enable it."""
+
+import json
+from hashlib import sha1
+from itertools import islice
+from os import close, environ, listdir, makedirs, remove, rename, stat, utime
+from os.path import exists, isdir, join
+from tempfile import mkstemp
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from .arrow import arrow_schema, parquet_rows, PARQUET_BATCH_SIZE
+
+CACHE_DIR = 'cast-rows'
+
+# Maximum size of a RowCache, in bytes
+DEFAULT_MAX_SIZE = 2 * 1024 ** 3
+
+# Schema datatypes that survive a round trip through the cache. Resources with other datatypes aren't cached
+CACHEABLE_TYPES = (None, 'integer', 'int', 'number', 'float', 'string', 'str', 'text')
+
+
+def cache_key(*parts):
+    """Return a key for a cache entry from JSON serializable parts"""
+    return sha1(json.dumps(parts, sort_keys=True, default=str).encode('utf8')).hexdigest()
+
+
+class RowCacheWriter(object):
+    """Write rows to a temporary file, which becomes a cache entry on commit(). Any row that can't be
+    stored exactly aborts the write, so a cache entry always returns the same rows as the source"""
+
+    def __init__(self, cache, key, headers, datatypes):
+        self.cache = cache
+        self.key = key
+        self.headers = headers
+        self.schema = arrow_schema(headers, datatypes)
+
+        # A unique file, so readers of the same resource in other processes don't write to it too
+        fd, self.path = mkstemp(suffix='.tmp', dir=cache.directory)
+        close(fd)
+
+        self._writer = pq.ParquetWriter(self.path, self.schema)
+        self._rows = []
+        self.aborted = False
+
+    def add(self, row):
+
+        if self.aborted:
+            return
+
+        if len(row) != len(self.headers):
+            return self.discard()
+
+        self._rows.append(row)
+
+        if len(self._rows) >= PARQUET_BATCH_SIZE:
+            self._flush()
+
+    def _flush(self):
+
+        cols = list(zip(*self._rows)) if self._rows else [[] for _ in self.headers]
+
+        try:
+            arrays = [pa.array(list(c), type=f.type) for c, f in zip(cols, self.schema)]
+            self._writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+        except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, ValueError, OverflowError):
+            self.discard()
+
+        self._rows = []
+
+    def commit(self):
+        """Close the file and move it into the cache"""
+
+        if self.aborted:
+            return
+
+        self._flush()
+
+        if self.aborted:
+            return
+
+        self._writer.close()
+        self._writer = None
+
+        rename(self.path, self.cache.path(self.key))
+
+        self.cache.evict()
+
+    def discard(self):
+        """Abandon the write, and remove the temporary file"""
+
+        self.aborted = True
+
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+        if exists(self.path):
+            remove(self.path)
+
+
+class RowCache(object):
+    """A directory of Parquet files of cast rows, with least recently used eviction"""
+
+    def __init__(self, directory, max_size=DEFAULT_MAX_SIZE):
+        self.directory = directory
+        self.max_size = max_size
+
+        if not isdir(directory):
+            makedirs(directory)
+
+    @classmethod
+    def for_cache(cls, cache):
+        """Return the RowCache in a metapack cache, or None if the cache isn't enabled with
+        METAPACK_ROW_CACHE_SIZE"""
+
+        max_size = int(environ.get('METAPACK_ROW_CACHE_SIZE') or 0)
+
+        if not max_size or cache is None:
+            return None
+
+        return cls(join(cache.getsyspath('/'), CACHE_DIR), max_size)
+
+    def path(self, key):
+        return join(self.directory, key + '.parquet')
+
+    def get(self, key):
+        """Return the path of the entry for the key, or None. Touches the entry, for LRU eviction"""
+
+        path = self.path(key)
+
+        if not exists(path):
+            return None
+
+        utime(path, None)
+
+        return path
+
+    def rows(self, key):
+        """Yield the rows of an entry, as lists"""
+
+        return islice(parquet_rows(self.path(key)), 1, None)  # Skip the header row
+
+    def writer(self, key, headers, datatypes):
+        return RowCacheWriter(self, key, headers, datatypes)
+
+    def evict(self):
+        """Remove the least recently used entries until the cache is no larger than max_size"""
+
+        entries = []
+
+        for fn in listdir(self.directory):
+            if fn.endswith('.parquet'):
+                st = stat(join(self.directory, fn))
+                entries.append((st.st_mtime, st.st_size, fn))
+
+        total = sum(e[1] for e in entries)
+
+        for mtime, size, fn in sorted(entries):
+            if total <= self.max_size:
+                break
+
+            try:
+                remove(join(self.directory, fn))
+                total -= size
+            except OSError:
+                pass  # Probably removed by another process
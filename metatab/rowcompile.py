@@ -0,0 +1,313 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Generate and compile a row processing function for a resource schema. The function casts each
+column, runs its transforms and inserts the columns that aren't in the source, without the per-column
+dispatch of a generic row processor. The most recently used functions are cached, so a schema is usually
+compiled once. """
+
+import ast
+import re
+from collections import OrderedDict
+
+import six
+from six import text_type
+
+from .exc import MetatabError
+
+MAX_COLUMN_ERRORS = 100  # Messages recorded per column
+
+IDENTIFIER = re.compile(r'^[A-Za-z_]\w*$')
+
+# Arguments that transform functions may declare; a function that declares none of them is called with the value
+TRANSFORM_ARGS = ('v', 'row', 'row_n', 'i_s', 'i_d', 'header_s', 'header_d', 'scratch', 'errors')
+
+
+def _int(v):
+    try:
+        return int(v)
+    except ValueError:
+        f = float(v)  # Integers formatted as floats, like '1.0'
+        if not f.is_integer():
+            raise
+        return int(f)
+
+
+def _text(v):
+    return v if isinstance(v, text_type) else text_type(v)
+
+
+# Casts for the datatypes that can be compiled. Schemas with other datatypes use rowpipe's RowProcessor
+CASTS = {
+    None: None,
+    'integer': _int,
+    'int': _int,
+    'number': float,
+    'float': float,
+    'string': _text,
+    'str': _text,
+    'text': _text,
+    'unicode': _text,
+}
+
+STRING_TYPES = ('string', 'str', 'text', 'unicode')
+
+
+def empty_str(v):
+    return ''
+
+
+# Transform functions that are always available
+TRANSFORMS = {
+    'empty_str': empty_str,
+}
+
+MAX_COMPILED = 100  # Compiled functions that are kept
+
+_compiled = OrderedDict()  # Compiled functions, by schema, least recently used first
+
+
+class CompileError(MetatabError):
+    """The schema has a feature that can't be compiled"""
+
+
+def _call_args(f):
+    """Return the keyword arguments to call a transform function with, or None to call it with the value"""
+
+    try:
+        if six.PY2:
+            from inspect import getargspec
+            args = getargspec(f).args
+        else:
+            from inspect import signature
+            args = list(signature(f).parameters)
+    except (TypeError, ValueError):  # Builtins and other callables without a signature
+        return None
+
+    call_args = [a for a in args if a in TRANSFORM_ARGS]
+
+    return call_args if call_args else None
+
+
+def _segments(transform):
+    """Split a transform into (is_initializer, code) segments. The initializer, marked with '^',
+    creates the value; the others modify it"""
+
+    for seg in (transform or '').split('|'):
+        seg = seg.strip()
+
+        if not seg:
+            continue
+
+        if seg.startswith('^'):
+            yield True, seg[1:].strip()
+        else:
+            yield False, seg
+
+
+class _Generator(object):
+    """Generate the source of a row processing function"""
+
+    def __init__(self, columns, env):
+        self.columns = columns
+        self.env = env
+        self.names = {}  # Objects referenced by the generated code
+        self.lines = []
+        self.indent = 1
+
+    def ref(self, prefix, obj):
+        name = '_{}_{}'.format(prefix, len(self.names))
+        self.names[name] = obj
+        return name
+
+    def emit(self, indent, line):
+        self.lines.append('    ' * indent + line)
+
+    def transform_code(self, seg, i_d, header_d, i_s, header_s):
+
+        if IDENTIFIER.match(seg):
+            if seg in self.env:
+                f = self.env[seg]
+            elif seg in TRANSFORMS:
+                f = TRANSFORMS[seg]
+            elif isinstance(six.moves.builtins.__dict__.get(seg), type):
+                f = six.moves.builtins.__dict__[seg]  # Types like int and str
+            else:
+                raise CompileError("Unknown transform function '{}'".format(seg))
+
+            call_args = _call_args(f)
+            fname = self.ref('f', f)
+
+            if call_args is None:
+                return '{}(v)'.format(fname)
+
+            values = dict(v='v', row='row', row_n='row_n', i_s=repr(i_s), i_d=repr(i_d),
+                          header_s=repr(header_s), header_d=repr(header_d), scratch='scratch', errors='errors')
+
+            return '{}({})'.format(fname, ', '.join('{}={}'.format(a, values[a]) for a in call_args))
+
+        # An expression of the value, the source row and the row number
+        try:
+            tree = ast.parse(seg, mode='eval')
+        except SyntaxError:
+            raise CompileError("Can't compile transform '{}'".format(seg))
+
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Name):
+                if node.id in self.env:
+                    self.names[node.id] = self.env[node.id]
+                elif node.id in TRANSFORMS:
+                    self.names[node.id] = TRANSFORMS[node.id]
+                elif node.id not in TRANSFORM_ARGS and node.id not in six.moves.builtins.__dict__:
+                    raise CompileError("Unknown name '{}' in transform '{}'".format(node.id, seg))
+
+        return '({})'.format(seg)
+
+    def generate(self):
+
+        self.emit(0, 'def process_row(row, row_n, errors, scratch):')
+        self.emit(1, 'n = len(row)')
+
+        out = []
+
+        for i_d, (header, source_index, datatype, valuetype, transform) in enumerate(self.columns):
+
+            if datatype not in CASTS:
+                raise CompileError("Can't compile a cast to '{}'".format(datatype))
+
+            # Only value types that are the same as the datatype can be compiled. rowpipe casts other value
+            # types, such as labels and geoids, with their own classes
+            if valuetype and (valuetype not in CASTS or CASTS[valuetype] is not CASTS[datatype]):
+                raise CompileError("Can't compile the value type '{}'".format(valuetype))
+
+            cast = CASTS[datatype]
+            header_s = header if source_index is not None else None
+            var = 'd{}'.format(i_d)
+
+            self.emit(1, '# {}'.format(header).replace('\n', ' '))
+
+            if source_index is None:
+                self.emit(1, 'v = None')
+            else:
+                self.emit(1, 'v = row[{0}] if n > {0} else None'.format(source_index))
+
+            segments = list(_segments(transform))
+            initializers = [code for init, code in segments if init]
+            transforms = [code for init, code in segments if not init]
+
+            for code in initializers:
+                self.emit_transform(code, i_d, header, source_index, header_s)
+
+            if cast is not None:
+                empty = "v is None" if datatype in STRING_TYPES else "v is None or v == ''"
+                self.emit(1, 'if {}:'.format(empty))
+                self.emit(2, 'v = None')
+                self.emit(1, 'else:')
+                self.emit_guarded(2, header, 'v = {}(v)'.format(self.ref('cast', cast)),
+                                  "Failed to cast '{v}' to " + datatype + " in row {row_n}")
+
+            if transforms:  # Transforms aren't applied to empty values
+                self.emit(1, 'if v is not None:')
+                self.indent = 2
+
+                for code in transforms:
+                    self.emit_transform(code, i_d, header, source_index, header_s)
+
+                self.indent = 1
+
+            self.emit(1, '{} = v'.format(var))
+            out.append(var)
+
+        self.emit(1, 'return [{}]'.format(', '.join(out)))
+
+        return '\n'.join(self.lines) + '\n'
+
+    def emit_transform(self, seg, i_d, header_d, i_s, header_s):
+
+        self.emit_guarded(self.indent, header_d, 'v = {}'.format(self.transform_code(seg, i_d, header_d, i_s, header_s)),
+                          "Failed to transform '{v}' with '" + seg.replace('{', '{{').replace('}', '}}') +
+                          "' in row {row_n}: {e}")
+
+    def emit_guarded(self, indent, header, line, template):
+        """Emit a line that sets v, recording an error from the message template and setting v to None
+        if it fails"""
+
+        self.emit(indent, 'try:')
+        self.emit(indent + 1, line)
+        self.emit(indent, 'except Exception as e:')
+        self.emit(indent + 1, '_error(errors, {!r}, {!r}, v, row_n, e)'.format(header, template))
+        self.emit(indent + 1, 'v = None')
+
+
+def _error(errors, header, template, v, row_n, e):
+
+    messages = errors.setdefault(header, [])
+
+    if len(messages) < MAX_COLUMN_ERRORS:
+        messages.append(template.format(v=v, row_n=row_n, e=e))
+
+
+def compile_row_processor(columns, env=None):
+    """Return a compiled function process_row(row, row_n, errors, scratch) that returns the processed
+    destination row for a source row. Raises CompileError if the schema can't be compiled.
+
+    :param columns: A list of (header, source_index, datatype, valuetype, transform) tuples, one per
+    destination column. source_index is None for columns that aren't in the source.
+    :param env: A dict of functions and other values for transforms
+    """
+
+    env = env or {}
+
+    columns = tuple(tuple(c) for c in columns)
+
+    gen = _Generator(columns, env)
+    source = gen.generate()
+
+    # The key includes the identities of the referenced functions, since the env can change between resources
+    key = (columns, tuple(sorted((k, id(v)) for k, v in gen.names.items())))
+
+    try:
+        f = _compiled.pop(key)
+        _compiled[key] = f  # Now the most recently used
+        return f
+    except KeyError:
+        pass
+
+    namespace = dict(gen.names)
+    namespace['_error'] = _error
+
+    exec(compile(source, '<row processor>', 'exec'), namespace)
+
+    f = namespace['process_row']
+    f.source = source
+
+    _compiled[key] = f
+
+    while len(_compiled) > MAX_COMPILED:
+        _compiled.popitem(last=False)
+
+    return f
+
+
+class CompiledRowProcessor(object):
+    """Iterate over the processed rows of a source, like rowpipe's RowProcessor. Errors are recorded in
+    `errors`, a dict of column header to a list of messages"""
+
+    def __init__(self, source, process_row):
+        """
+        :param source: An iterable of source rows, without the header
+        :param process_row: A function from compile_row_processor()
+
+        """
+        self.source = source
+        self.process_row = process_row
+        self.errors = OrderedDict()
+
+    def __iter__(self):
+
+        process_row = self.process_row
+        errors = self.errors
+        scratch = {}
+
+        for row_n, row in enumerate(self.source, 1):
+            yield process_row(row, row_n, errors, scratch)
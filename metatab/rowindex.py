@@ -0,0 +1,119 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Sidecar indexes of the byte offsets of rows in package CSV files, so a range of rows can be read
+without scanning the file from the top. The index for ``data/<name>.csv`` is ``data/<name>.csv.idx`` """
+
+import mmap
+import struct
+from itertools import islice
+from os import stat
+from os.path import exists
+
+import unicodecsv as csv
+
+INDEX_INTERVAL = 1000  # Rows between indexed offsets
+INDEX_SUFFIX = '.idx'
+
+# Magic, version, interval, number of rows, size and modification time of the CSV file; then the offsets
+HEADER = struct.Struct('<4sHIQQd')
+MAGIC = b'MTRI'
+VERSION = 2
+
+
+def index_path(csv_path):
+    return csv_path + INDEX_SUFFIX
+
+
+class RowIndex(object):
+    """The byte offsets of every `interval`th row of a CSV file, counting from the first row after the header"""
+
+    def __init__(self, interval=INDEX_INTERVAL, offsets=None, n_rows=0, file_size=None, file_mtime=None):
+        self.interval = interval
+        self.offsets = offsets if offsets is not None else []
+        self.n_rows = n_rows
+        self.file_size = file_size
+        self.file_mtime = file_mtime
+
+    def add(self, row_n, offset):
+        """Record the offset of a row, if it is on the interval. Call for every row, in order"""
+
+        if row_n % self.interval == 0:
+            self.offsets.append(offset)
+
+        self.n_rows = row_n + 1
+
+    def write(self, path, csv_path):
+        """Write the index, recording the size and modification time of the CSV file to detect a stale index"""
+
+        st = stat(csv_path)
+        self.file_size = st.st_size
+        self.file_mtime = st.st_mtime
+
+        with open(path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, self.interval, self.n_rows, self.file_size, self.file_mtime))
+            f.write(struct.pack('<{}Q'.format(len(self.offsets)), *self.offsets))
+
+    @classmethod
+    def read(cls, path):
+
+        with open(path, 'rb') as f:
+            magic, version, interval, n_rows, file_size, file_mtime = HEADER.unpack(f.read(HEADER.size))
+
+            if magic != MAGIC or version != VERSION:
+                raise ValueError("Not a row index: '{}'".format(path))
+
+            data = f.read()
+
+        offsets = list(struct.unpack('<{}Q'.format(len(data) // 8), data))
+
+        return cls(interval, offsets, n_rows, file_size, file_mtime)
+
+    @classmethod
+    def for_csv(cls, csv_path):
+        """Return the index for a CSV file, or None if it doesn't have one, or the index is stale: the
+        size or modification time of the CSV file has changed since the index was written"""
+
+        path = index_path(csv_path)
+
+        if not exists(path):
+            return None
+
+        try:
+            index = cls.read(path)
+        except (ValueError, struct.error):
+            return None
+
+        st = stat(csv_path)
+
+        if index.file_size != st.st_size or index.file_mtime != st.st_mtime:
+            return None
+
+        return index
+
+    def rows(self, csv_path, start, stop, encoding='utf8'):
+        """Yield the rows of the CSV file from start up to stop, as lists of strings, seeking to the
+        nearest indexed row before start"""
+
+        stop = min(stop, self.n_rows)
+
+        if start >= stop:
+            return
+
+        block = start // self.interval
+
+        with open(csv_path, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+            try:
+                mm.seek(self.offsets[block])
+
+                # The reader joins the lines of quoted values that have newlines
+                reader = csv.reader(iter(mm.readline, b''), encoding=encoding)
+
+                skip = start - block * self.interval
+
+                for row in islice(reader, skip, skip + stop - start):
+                    yield row
+            finally:
+                mm.close()
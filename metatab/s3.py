@@ -127,7 +127,35 @@ class S3Bucket(object):
             for c in page['Contents']:
                 yield c
 
-    def write(self, body, path, acl=None):
+    def read(self, path):
+        """Return the contents of an object, or None if it doesn't exist"""
+        from botocore.exceptions import ClientError
+
+        key = join(self._prefix, path).strip('/')
+
+        try:
+            return self._bucket.Object(key).get()['Body'].read()
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey'):
+                return None
+            raise
+
+    def open_writer(self, path, acl=None, part_size=None, threads=None):
+        """Return a MultipartWriter, a binary file-like object that streams what is written to it to
+        an object, uploading parts while more is written. The object is created when the writer is closed"""
+        import mimetypes
+        from metatab.multipart import MultipartWriter
+
+        acl = acl if acl is not None else self._acl
+
+        key = join(self._prefix, path).strip('/')
+
+        ct = mimetypes.guess_type(key)[0]
+
+        return MultipartWriter(self._s3.meta.client, self._bucket_name, key, part_size, threads,
+                               ACL=acl, ContentType=ct if ct else 'binary/octet-stream')
+
+    def write(self, body, path, acl=None, skip_existing=True):
         from botocore.exceptions import ClientError
         import mimetypes
 
@@ -139,20 +167,22 @@ class S3Bucket(object):
 
         key = join(self._prefix, path).strip('/')
 
-        try:
-            o = self._bucket.Object(key)
-            if o.content_length == len(body):
-                prt("File '{}' already in bucket; skipping".format(key))
-                return self.access_url(path)
-            else:
-                prt("File '{}' already in bucket, but length is different; re-wirtting".format(key))
-
-        except ClientError as e:
-            if int(e.response['Error']['Code']) in (403, 405):
-                err("S3 Access failed for '{}:{}': {}\nNOTE: With Docker, this error is often the result of container clock drift. Check your container clock. "
-                    .format(self._bucket_name, key, e))
-            elif int(e.response['Error']['Code']) != 404:
-                err("S3 Access failed for '{}:{}': {}".format(self._bucket_name, key, e))
+        # Objects of the same size are assumed to be unchanged
+        if skip_existing:
+            try:
+                o = self._bucket.Object(key)
+                if o.content_length == len(body):
+                    prt("File '{}' already in bucket; skipping".format(key))
+                    return self.access_url(path)
+                else:
+                    prt("File '{}' already in bucket, but length is different; re-wirtting".format(key))
+
+            except ClientError as e:
+                if int(e.response['Error']['Code']) in (403, 405):
+                    err("S3 Access failed for '{}:{}': {}\nNOTE: With Docker, this error is often the result of container clock drift. Check your container clock. "
+                        .format(self._bucket_name, key, e))
+                elif int(e.response['Error']['Code']) != 404:
+                    err("S3 Access failed for '{}:{}': {}".format(self._bucket_name, key, e))
 
         ct = mimetypes.guess_type(key)[0]
 
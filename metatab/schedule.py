@@ -0,0 +1,174 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Build the resources of a package in worker processes, running resources that don't depend on each other
+at the same time. A resource runs only after the resources it depends on are finished, and the caller has
+handled them, so programs that read earlier resources from the package metadata find them there."""
+
+import multiprocessing
+import pickle
+from collections import OrderedDict
+from multiprocessing import Pool
+
+import six
+from six.moves.queue import Empty, Queue
+
+from rowgenerators import Url
+from .exc import PackageError
+
+# Source protocols for programs and notebooks, which may read the resources built before them
+PROGRAM_PROTOS = ('program', 'ipynb')
+
+POLL_INTERVAL = 1  # Seconds between checks for worker processes that have died while waiting for a result
+
+
+def resource_dependencies(resources):
+    """Return an OrderedDict of the name of each resource to the set of names of the resources it must be
+    built after.
+
+    Dependencies are declared with DependsOn properties, each a comma separated list of names. A program or
+    notebook without declared dependencies may read any resource built before it, so it depends on all of
+    the earlier resources. Other resources have no dependencies. Raises PackageError for unknown names
+    and for cycles.
+    """
+
+    names = [r.name for r in resources]
+
+    deps = OrderedDict()
+
+    for i, r in enumerate(resources):
+
+        declared = set(n.strip() for t in r.find('dependson') for n in (t.value or '').split(',') if n.strip())
+
+        if declared:
+            unknown = declared - set(names)
+
+            if unknown:
+                raise PackageError("Resource '{}' depends on unknown resources: {}"
+                                   .format(r.name, ', '.join(sorted(unknown))))
+
+            deps[r.name] = declared
+
+        elif Url(r.value).proto in PROGRAM_PROTOS:
+            deps[r.name] = set(names[:i])
+
+        else:
+            deps[r.name] = set()
+
+    check_cycles(deps)
+
+    return deps
+
+
+def check_cycles(deps):
+    """Raise PackageError if the dependencies have a cycle"""
+
+    done = set()
+    remaining = OrderedDict(deps)
+
+    while remaining:
+        ready = [name for name, d in remaining.items() if d <= done]
+
+        if not ready:
+            raise PackageError("Resources have circular dependencies: {}".format(', '.join(remaining)))
+
+        for name in ready:
+            done.add(name)
+            del remaining[name]
+
+
+def env_is_sendable(env):
+    """Return True if an env, like the dict of the package's lib module, can be sent to worker processes.
+
+    Functions are pickled by name, so with the fork start method, where the workers have the parent's
+    modules, an env that survives a pickle round trip can be sent. With other start methods, like spawn,
+    the workers import modules from scratch, and can't import a lib module loaded from a package
+    directory, so only an empty env can be sent.
+    """
+
+    if not env:
+        return True
+
+    get_start_method = getattr(multiprocessing, 'get_start_method', lambda: 'fork')  # Python 2 always forks
+
+    if get_start_method() != 'fork':
+        return False
+
+    try:
+        pickle.loads(pickle.dumps(env))
+        return True
+    except (pickle.PicklingError, TypeError, AttributeError):
+        return False
+
+
+def _run(args):
+    """Call the worker with a task in a worker process, returning (result, error)"""
+
+    worker, task = args
+
+    try:
+        return worker(task), None
+    except Exception as e:
+        return None, '{}: {}'.format(type(e).__name__, e)
+
+
+def run_scheduled(tasks, deps, worker, processes=None):
+    """Run the worker on the tasks in a pool of processes, yielding (name, result, error) tuples as they
+    finish, where error is the message of an exception from the worker, or None.
+    A task starts only after all of the tasks it depends on have been yielded, and the caller has asked
+    for the next result. Tasks that are ready at the same time start in the order of `tasks`.
+
+    :param tasks: An OrderedDict of name to the argument for the worker
+    :param deps: A dict of name to the set of names of the tasks it depends on, from resource_dependencies()
+    :param worker: A module level function, so it can be sent to the worker processes
+    :param processes: Number of worker processes. Defaults to the number of CPUs
+
+    Errors that _run() can't catch, like a result that can't be sent back, are yielded like errors from the
+    worker. A worker process that dies loses its task, so if one does, PackageError is raised.
+    """
+
+    check_cycles(deps)
+
+    waiting = list(tasks)
+    done = set()
+    running = 0
+
+    finished = Queue()
+
+    pool = Pool(processes)
+
+    workers = list(pool._pool)  # The pool replaces a worker that dies, so the originals are kept to check
+
+    def error_callback(name):
+        if six.PY2:
+            return {}  # Python 2 pools have no error callback
+
+        return dict(error_callback=lambda e: finished.put((name, None, '{}: {}'.format(type(e).__name__, e))))
+
+    try:
+        while waiting or running:
+
+            for name in [name for name in waiting if deps.get(name, set()) <= done]:
+                waiting.remove(name)
+                running += 1
+                pool.apply_async(_run, ((worker, tasks[name]),),
+                                 callback=lambda result, name=name: finished.put((name,) + tuple(result)),
+                                 **error_callback(name))
+
+            while True:
+                try:
+                    name, result, error = finished.get(timeout=POLL_INTERVAL)
+                    break
+                except Empty:
+                    if any(p.exitcode is not None for p in workers):
+                        raise PackageError("A worker process exited before finishing its task")
+
+            running -= 1
+
+            yield name, result, error
+
+            done.add(name)
+
+    finally:
+        pool.terminate()
+        pool.join()
@@ -0,0 +1,177 @@
+# Copyright (c) 2017 Civic Knowledge. This file is licensed under the terms of the
+# Revised BSD License, included in this distribution as LICENSE
+
+"""Column statistics gathered in one pass over a resource, in bounded memory: counts, minimum and maximum,
+mean and standard deviation, an approximate distinct count from a HyperLogLog sketch, and a median
+estimated from a reservoir sample"""
+
+import random
+import struct
+from collections import OrderedDict
+from hashlib import sha1
+from math import log, sqrt
+
+from six import text_type, integer_types
+
+SAMPLE_SIZE = 1000  # Values in each column's reservoir sample
+
+HLL_PRECISION = 12  # 2**12 registers per sketch, for a standard error of about 1.6%
+
+# Properties that compute_stats() sets on Table.Column terms
+STATS_PROPERTIES = ('count', 'nulls', 'distinct', 'min', 'max', 'mean', 'std', 'median')
+
+
+class HyperLogLog(object):
+    """A HyperLogLog sketch, for approximate distinct counts. Values are hashed by their text, so sketches
+    from different processes can be merged"""
+
+    def __init__(self, p=HLL_PRECISION):
+        self.p = p
+        self.m = 1 << p
+        self.registers = bytearray(self.m)
+
+    def add(self, v):
+
+        x = struct.unpack('<Q', sha1(text_type(v).encode('utf8')).digest()[:8])[0]
+
+        i = x >> (64 - self.p)
+        w = x & ((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - w.bit_length() + 1
+
+        if rho > self.registers[i]:
+            self.registers[i] = rho
+
+    def merge(self, other):
+        self.registers = bytearray(max(a, b) for a, b in zip(self.registers, other.registers))
+
+    def count(self):
+
+        m = self.m
+        alpha = 0.7213 / (1 + 1.079 / m)
+
+        e = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+
+        zeros = self.registers.count(0)
+
+        if e <= 2.5 * m and zeros:
+            e = m * log(float(m) / zeros)  # Linear counting, for small cardinalities
+
+        return int(round(e))
+
+
+class Reservoir(object):
+    """A uniform random sample of up to `size` values from a stream"""
+
+    def __init__(self, size=SAMPLE_SIZE, seed=None):
+        self.size = size
+        self.n = 0
+        self.values = []
+        self._random = random.Random(seed)
+
+    def add(self, v):
+
+        self.n += 1
+
+        if len(self.values) < self.size:
+            self.values.append(v)
+        else:
+            j = self._random.randrange(self.n)
+            if j < self.size:
+                self.values[j] = v
+
+
+def _is_number(v):
+    return isinstance(v, (float,) + integer_types) and not isinstance(v, bool)
+
+
+class ColumnStats(object):
+    """Statistics for the values of one column"""
+
+    def __init__(self, header, sample_size=SAMPLE_SIZE, seed=None):
+        self.header = header
+        self.count = 0
+        self.nulls = 0
+        self.min = None
+        self.max = None
+
+        self.hll = HyperLogLog()
+        self.sample = Reservoir(sample_size, seed)
+
+        self._n_numbers = 0
+        self._mean = 0.0
+        self._m2 = 0.0
+
+    def add(self, v):
+
+        self.count += 1
+
+        if v is None or v == '':
+            self.nulls += 1
+            return
+
+        self.hll.add(v)
+        self.sample.add(v)
+
+        try:
+            if self.min is None or v < self.min:
+                self.min = v
+            if self.max is None or v > self.max:
+                self.max = v
+        except TypeError:
+            pass  # Values of a different type than the first, which failed to cast
+
+        if _is_number(v) and v == v:  # Not NaN
+            # Welford's algorithm for the running mean and variance
+            self._n_numbers += 1
+            delta = v - self._mean
+            self._mean += delta / float(self._n_numbers)
+            self._m2 += delta * (v - self._mean)
+
+    @property
+    def median(self):
+        """The median of the numbers in the sample, or None"""
+
+        numbers = sorted(v for v in self.sample.values if _is_number(v))
+
+        if not numbers:
+            return None
+
+        mid = len(numbers) // 2
+
+        return numbers[mid] if len(numbers) % 2 else (numbers[mid - 1] + numbers[mid]) / 2.0
+
+    def as_dict(self):
+        """Return the statistics, with the keys in STATS_PROPERTIES. Numeric statistics are None
+        for columns without numbers"""
+
+        numeric = self._n_numbers > 0
+
+        return OrderedDict([
+            ('count', self.count),
+            ('nulls', self.nulls),
+            ('distinct', self.hll.count()),
+            ('min', self.min),
+            ('max', self.max),
+            ('mean', self._mean if numeric else None),
+            ('std', sqrt(self._m2 / (self._n_numbers - 1)) if self._n_numbers > 1 else None),
+            ('median', self.median),
+        ])
+
+
+class TableStats(OrderedDict):
+    """A ColumnStats for each column of a table, by header"""
+
+    def __init__(self, headers, sample_size=SAMPLE_SIZE, seed=None):
+        self._columns = [ColumnStats(h, sample_size, seed) for h in headers]
+        super(TableStats, self).__init__(zip(headers, self._columns))
+
+    def add(self, row):
+
+        for cs, v in zip(self._columns, row):
+            cs.add(v)
+
+        for cs in self._columns[len(row):]:  # Short rows
+            cs.add(None)
+
+    def as_dict(self):
+        return OrderedDict((h, cs.as_dict()) for h, cs in self.items())
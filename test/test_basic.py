@@ -3,7 +3,7 @@ from __future__ import print_function
 import json
 import unittest
 
-from metatab import IncludeError
+from metatab import IncludeError, MetatabError
 from metatab import MetatabRowGenerator, TermParser, CsvPathRowGenerator, parse_file
 from metatab.doc import MetatabDoc
 from metatab.util import flatten, declaration_path
@@ -11,6 +11,7 @@ from metatab import TermParser, CsvPathRowGenerator, Serializer, Term
 from collections import defaultdict
 from metatab.doc import Resource
 import csv
+from io import BytesIO
 from os.path import dirname
 from metatab.doc import open_package
 import json
@@ -23,6 +24,61 @@ def test_data(*paths):
     return abspath(join(dirname(dirname(abspath(__file__))), 'test-data', *paths))
 
 
+def local_doc(d, rows, datatypes=('integer', 'number', 'string')):
+    """Write a metadata file, with a 'data' resource for a CSV file of the rows, in the directory d, and
+    return the document"""
+    from os.path import join
+    from metatab.package import write_csv
+
+    headers = ['a', 'b', 'c'][:len(datatypes)]
+
+    write_csv(join(d, 'data.csv'), headers, iter(rows))
+
+    with open(join(d, 'metadata.csv'), 'w') as f:
+        w = csv.writer(f)
+        w.writerows([['Declare', 'metatab-latest'], ['Title', 'Local'],
+                     ['Section', 'Resources', 'Name'], ['Datafile', 'data.csv', 'data'],
+                     ['Section', 'Schema', 'DataType'], ['Table', 'data']] +
+                    [['Table.Column', h, dt] for h, dt in zip(headers, datatypes)])
+
+    return MetatabDoc(join(d, 'metadata.csv'))
+
+
+class LocalS3Client(object):
+    """A local stand-in for the multipart upload methods of a boto3 S3 client, storing objects in a dict"""
+
+    def __init__(self, fail_part=None):
+        self.objects = {}
+        self.uploads = {}
+        self.part_sizes = []
+        self.aborted = []
+        self.fail_part = fail_part
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def create_multipart_upload(self, Bucket, Key, **kwargs):
+        upload_id = 'upload{}'.format(len(self.uploads) + 1)
+        self.uploads[upload_id] = {}
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_part:
+            raise IOError('Failed to upload part {}'.format(PartNumber))
+
+        self.uploads[UploadId][PartNumber] = Body
+        self.part_sizes.append(len(Body))
+        return {'ETag': 'etag{}'.format(PartNumber)}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)
+        self.objects[(Bucket, Key)] = b''.join(parts[p['PartNumber']] for p in MultipartUpload['Parts'])
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId, None)
+        self.aborted.append(UploadId)
+
+
 class MyTestCase(unittest.TestCase):
     def compare_dict(self, a, b):
 
@@ -172,6 +228,36 @@ class MyTestCase(unittest.TestCase):
         for t in doc.as_dict()['parent']:
             self.assertEquals({'prop1': 'prop1', 'prop2': 'prop2', '@value': 'parent'}, t)
 
+    def test_arg_children(self):
+
+        fn = test_data('include1.csv')  # Not acutally used. Sets base directory
+
+        # In datapackage-latest, Resource is a synonym for Resources, and the children of the
+        # parent are named from the section's parameter map, after the synonym is substituted
+        doc = MetatabDoc(MetatabRowGenerator([
+            ['Declare', 'datapackage-latest', 'extra'],
+            ['Include', 'include3.csv', 'extra'],
+            ['Section', 'Resources', 'Name', 'Title'],
+            ['Resource', 'http://example.com/data.csv', 'data', 'Data Title', 'unnamed'],
+        ], fn))
+
+        t = doc.find_first('Root.Resources')
+
+        self.assertEqual('http://example.com/data.csv', t.value)
+        self.assertEqual([('resources.name', 'data'), ('resources.title', 'Data Title'), ('resources.2', 'unnamed')],
+                         [(c.join_lc, c.value) for c in t.children])
+        self.assertTrue(all(c.parent is t for c in t.children))
+        self.assertEqual('data', t.get_value('name'))
+
+        # Include and Declare terms don't get children from their arguments
+        for name in ('Root.Include', 'Root.Declare'):
+            t = doc.find_first(name)
+            self.assertEqual(['extra'], t.args)
+            self.assertEqual([], t.children)
+
+        self.assertEqual(['Include File 3'], [t.value for t in doc.find('Root.Note')])
+        self.assertFalse(any(t.record_term_lc in ('0', 'extra') for t in doc.terms))
+
 
 
     def test_includes(self):
@@ -267,6 +353,30 @@ class MyTestCase(unittest.TestCase):
 
         self.assertEquals('cdph.ca.gov-hci-registered_voters-county', doc.find_first('Root.Identifier').value)
 
+    def test_find_properties(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+
+        t = doc.find_first('Root.Datafile', name='example2')
+
+        self.assertEqual('http://example.com/example2.csv', t.value)
+        self.assertEqual([t], doc.find('Root.Datafile', section='Resources', name='example2', grain='Tract'))
+        self.assertEqual([], doc.find('Root.Datafile', section='Resources', name='example2', grain='County'))
+        self.assertEqual([t], doc.find('Root.Datafile', url='http://example.com/example2.csv'))
+
+        # Each call returns a new wrapper, so one caller's env isn't replaced by another's
+        r = doc.resource('example2', env={'f': len})
+        self.assertIsNot(r, doc.resource('example2'))
+        self.assertEqual({'f': len}, r.env)
+
+        # Changing the term updates the index
+        t['name'] = 'example3'
+
+        self.assertIsNone(doc.find_first('Root.Datafile', name='example2'))
+        self.assertEqual(t, doc.find_first('Root.Datafile', name='example3'))
+        self.assertIsNone(doc.resource('example2'))
+        self.assertIsNot(r, doc.resource('example3'))
+
     def test_sections(self):
 
 
@@ -417,6 +527,1054 @@ class MyTestCase(unittest.TestCase):
 
             self.assertIsNone(doc.get_value('Root.Name'))
 
+    def test_as_dict_memo(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+
+        d1 = doc['Schema'].as_dict()
+        d2 = doc['Schema'].as_dict()
+
+        self.assertEqual(d1, d2)
+
+        # Altering the returned dict must not alter the memo
+        d1['foo'] = 'bar'
+        self.assertNotIn('foo', doc['Schema'].as_dict())
+
+        # Changing a term must invalidate the section's dict
+        c = doc.find_first('Table.Column')
+        c['datatype'] = 'foobar'
+
+        self.assertEqual('foobar', doc['Schema'].as_dict()['table']['column'][0]['datatype'])
+        self.assertEqual('foobar', doc.as_dict()['table']['column'][0]['datatype'])
+
+        doc.find_first('Root.Title').value = 'New Title'
+
+        self.assertEqual('New Title', doc['Root'].as_dict()['title'])
+
+    def test_fingerprint(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+
+        fp = doc.fingerprint()
+        schema_fp = doc.fingerprint(sections='Schema')
+
+        self.assertEqual(fp, MetatabDoc(test_data('example1.csv')).fingerprint())
+
+        # Volatile terms are excluded
+        doc['Root']['Modified'] = '2017-01-01T00:00:00'
+        self.assertEqual(fp, doc.fingerprint())
+        self.assertNotEqual(fp, doc.fingerprint(exclude=[]))
+
+        doc.find_first('Root.Title').value = 'New Title'
+        self.assertNotEqual(fp, doc.fingerprint())
+        self.assertEqual(schema_fp, doc.fingerprint(sections='Schema'))
+
+        doc.find_first('Table.Column')['datatype'] = 'foobar'
+        self.assertNotEqual(schema_fp, doc.fingerprint(sections='Schema'))
+
+    def test_diff(self):
+        import metatab
+        from metatab import diff
+
+        # Only the public names of the compare module are exported
+        self.assertFalse(hasattr(metatab, 'Counter'))
+        self.assertFalse(hasattr(metatab, '_identity'))
+
+        a = MetatabDoc(test_data('example1.csv'))
+        b = MetatabDoc(test_data('example1.csv'))
+
+        self.assertEqual({}, diff(a, b))
+
+        b.find_first('Root.Title').value = 'New Title'
+        b.find_first('Table.Column')['datatype'] = 'foobar'
+        b.remove_term(b.find_first('Root.Datafile', name='example2'))
+        b['Root']['Modified'] = '2017-01-01T00:00:00'
+
+        d = diff(a, b)
+
+        self.assertEqual(['root', 'resources', 'schema'], list(d.keys()))
+
+        (ta, tb), = d['root']['changed']
+        self.assertEqual('New Title', tb.value)
+
+        self.assertEqual(['example2'], [t.get_value('name') for t in d['resources']['removed']])
+        self.assertEqual([], d['resources']['added'])
+
+        (ta, tb), = d['schema']['changed']
+        self.assertEqual('table.column', tb.qualified_term)
+        self.assertEqual('foobar', tb.get_value('datatype'))
+
+    def test_numpy_caster(self):
+        from metatab.npcast import NumpyCaster
+
+        caster = NumpyCaster([('a', 'integer', 0), ('b', 'number', 1), ('c', 'string', 2), ('d', 'integer', None)])
+
+        cols = caster.cast([['1', '2.5', 'x'], ['', 'abc', ''], ['3.0', '4', 'y']])
+
+        self.assertEqual(['a', 'b', 'c', 'd'], list(cols.keys()))
+        self.assertEqual('int64', cols['a'].dtype.name)
+        self.assertEqual('float64', cols['b'].dtype.name)
+
+        self.assertEqual([[1, 2.5, 'x', None], [None, None, None, None], [3, 4.0, 'y', None]],
+                         NumpyCaster.to_rows(cols))
+
+        self.assertEqual(['b'], list(caster.errors.keys()))
+        self.assertIn("'abc'", caster.errors['b'][0])
+
+        # With reuse, a batch is cast into the arrays of the previous one
+        a = caster.cast([['1']], reuse=True)
+        b = caster.cast([['2']], reuse=True)
+        self.assertEqual([2], a['a'].tolist())
+        self.assertEqual([2], b['a'].tolist())
+
+        # Non-integral values in integer columns are errors, not truncated
+        caster = NumpyCaster([('a', 'integer', 0)])
+        cols = caster.cast([[1.7], [2.0], ['2.5'], [2 ** 62 + 1], ['1e3']])
+
+        self.assertEqual([None, 2, None, 2 ** 62 + 1, 1000], cols['a'].tolist())
+        self.assertEqual(2, len(caster.errors['a']))
+        self.assertIn("'1.7'", caster.errors['a'][0])
+
+        # Numeric cells in string columns become strings, like with RowProcessor, and untyped columns
+        # are passed through
+        caster = NumpyCaster([('zip', 'string', 0), ('any', None, 1)])
+        cols = caster.cast([[94103, 1], ['02134', 2.5], [None, None]])
+
+        self.assertEqual(['94103', '02134', None], cols['zip'].tolist())
+        self.assertEqual([1, 2.5, None], cols['any'].tolist())
+
+        # Datatypes without a bulk cast aren't passed through as strings
+        with self.assertRaises(MetatabError):
+            NumpyCaster([('a', 'date', 0)])
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        self.assertEqual(r.headers, [c[0] for c in r._batch_columns()])
+
+    def test_frame_engine(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        # Value types are cast by the RowProcessor
+        self.assertEqual('rowpipe', r._frame_engine())
+
+        for i, c in r._all_column_terms():
+            c['valuetype'] = None
+
+        self.assertEqual('numpy', r._frame_engine())
+
+        # So are datatypes without a bulk cast
+        for i, c in r._all_column_terms():
+            if c.get_value('name') == 'reportyear':
+                c['datatype'] = 'date'
+
+        self.assertEqual('rowpipe', r._frame_engine())
+        self.assertEqual('numpy', r.select(['gvid', 'percent'])._frame_engine())
+
+    def test_iter_dataframes(self):
+        from tempfile import mkdtemp
+        import pandas as pd
+
+        # Bad values in the same column, with the same message, in every chunk
+        rows = [['x' if i % 10 == 3 else i, i / 2.0, 'row {}'.format(i)] for i in range(25)]
+
+        r = local_doc(mkdtemp(), rows).resource('data')
+
+        df = r.dataframe()
+        chunks = list(r.iter_dataframes(chunksize=10))
+
+        self.assertEqual([10, 10, 5], [len(c) for c in chunks])
+        pd.testing.assert_frame_equal(df, pd.concat(chunks))
+
+        self.assertEqual(3, len(df.metatab_errors['a']))
+        self.assertEqual([[e] for e in df.metatab_errors['a']], [c.metatab_errors['a'] for c in chunks])
+        self.assertEqual([['a'], ['a'], ['a']], [list(c.metatab_errors) for c in chunks])
+
+        # pandas.read_csv, like the RowProcessor, only treats empty cells as missing
+        r = local_doc(mkdtemp(), [[1, 1.0, 'NA'], [2, 2.0, 'null'], [3, 3.0, '']]).resource('data')
+
+        self.assertTrue(r._package_csv_path())
+
+        for df in (r.dataframe(), pd.concat(r.iter_dataframes())):
+            self.assertEqual(['NA', 'null'], list(df['c'][:2]))
+            self.assertTrue(df['c'].isna()[2])
+
+    def test_select(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        s = r.select(['percent', 'gvid', 'reportyear'])
+
+        self.assertEqual(['percent', 'gvid', 'reportyear'], s.headers)
+        self.assertEqual(27, len(s.source_headers))
+        self.assertEqual([('percent', 'float', 16), ('gvid', 'str', 2), ('reportyear', 'int', 0)],
+                         s._batch_columns())
+        self.assertEqual(27, len(r.headers))
+
+        # Columns that a transform refers to are also processed
+        for i, c in r._all_column_terms():
+            if c.get_value('name') == 'percent':
+                c.new_child('Column.Transform', 'numerator / denominator')
+
+        s = r.select(['percent'])
+
+        self.assertEqual(['numerator', 'denominator', 'percent'],
+                         [c.get_value('name') for i, c in s._processor_columns()])
+
+        with self.assertRaises(MetatabError):
+            r.select(['percent', 'not_a_column'])
+
+    def test_where(self):
+        from metatab.predicate import Predicate, filter_rows, RAW_CASTS
+
+        p = Predicate.parse("year >= 2010")
+        self.assertEqual(('year', '>=', 2010), (p.column, p.op, p.value))
+
+        p = Predicate.parse("state not in ('CA', 'NV')")
+        self.assertEqual(('state', 'not in', ('CA', 'NV')), (p.column, p.op, p.value))
+
+        self.assertEqual('CA', Predicate.parse("state = CA").value)
+
+        rows = [['2009', 'CA'], ['2010', 'NV'], ['', 'OR'], ['2011.0', 'CA'], ['x', 'WA']]
+
+        tests = [Predicate.parse("year >= 2010").compile(0, RAW_CASTS['integer'])]
+        self.assertEqual([['2010', 'NV'], ['2011.0', 'CA']], list(filter_rows(rows, tests)))
+
+        tests = [Predicate('year', '!=', '2010').compile(0, RAW_CASTS['integer']),
+                 Predicate.parse("state in ('CA', 'OR')").compile(1, RAW_CASTS['string'])]
+        self.assertEqual([['2009', 'CA'], ['', 'OR'], ['2011.0', 'CA']], list(filter_rows(rows, tests)))
+
+        with self.assertRaises(MetatabError):
+            Predicate.parse("year >= 'x'").compile(0, RAW_CASTS['integer'])
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        w = r.where('reportyear >= 2010', gvid='0E06000US0600100010').select(['percent'])
+
+        self.assertEqual(['percent'], w.headers)
+        self.assertEqual(2, len(w._predicates))
+
+        raw, post = w._split_predicates()
+        self.assertEqual([('reportyear', 0), ('gvid', 2)], [(p.column, i) for p, i, cast in raw])
+        self.assertEqual([], post)
+
+        with self.assertRaises(MetatabError):
+            r.where('not_a_column == 1')
+
+        # A column without a datatype is compared after casting by the RowProcessor, since the numpy
+        # engine has no stage after casting
+        for i, c in r._all_column_terms():
+            c['valuetype'] = None
+
+            if c.get_value('name') == 'gvid':
+                c['datatype'] = None
+
+        w = r.where(gvid='0E06000US0600100010')
+
+        self.assertEqual('rowpipe', w._frame_engine())
+        self.assertEqual('gvid', w._split_predicates()[1][0][0].column)
+
+        with self.assertRaises(MetatabError):
+            w._split_predicates('numpy')
+
+        self.assertEqual('numpy', r.where('reportyear >= 2010')._frame_engine())
+
+    def test_compiled_row_processor(self):
+        from metatab.rowcompile import CompiledRowProcessor, CompileError, compile_row_processor
+
+        def double(v, row_n):
+            return v * 2 + row_n
+
+        columns = [('a', 0, 'integer', None, None),
+                   ('b', 1, 'number', None, 'double'),
+                   ('c', None, 'text', None, '^empty_str'),
+                   ('d', 2, 'string', 'string', 'v.upper()')]
+
+        process_row = compile_row_processor(columns, {'double': double})
+
+        self.assertIs(process_row, compile_row_processor(columns, {'double': double}))
+
+        rp = CompiledRowProcessor(iter([['1', '1.5', 'x'], ['1.0', '', None], ['bad', '2']]), process_row)
+
+        self.assertEqual([[1, 4.0, '', 'X'], [1, None, '', None], [None, 7.0, '', None]], list(rp))
+        self.assertEqual(['a'], list(rp.errors.keys()))
+        self.assertIn("'bad'", rp.errors['a'][0])
+
+        with self.assertRaises(CompileError):
+            compile_row_processor([('a', 0, 'date', None, None)])
+
+        with self.assertRaises(CompileError):
+            compile_row_processor([('a', 0, 'integer', None, 'not_a_function')])
+
+        # Value types are cast by rowpipe
+        with self.assertRaises(CompileError):
+            compile_row_processor([('a', 0, 'string', 'label', None)])
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        self.assertEqual(r.headers, [c[0] for c in r._compiled_columns()])
+
+        with self.assertRaises(CompileError):
+            compile_row_processor(r._compiled_columns())
+
+        for i, c in r._all_column_terms():
+            c['valuetype'] = None
+
+        compile_row_processor(r._compiled_columns())
+
+    def test_row_index(self):
+        from tempfile import mkdtemp
+        from os import stat, utime
+        from os.path import join
+        from metatab.package import write_csv
+        from metatab.rowindex import RowIndex, index_path
+
+        path = join(mkdtemp(), 'rows.csv')
+
+        rows = [[i, 'line\n{}'.format(i)] for i in range(250)]
+
+        index = RowIndex(interval=100)
+        write_csv(path, ['a', 'b'], iter(rows), index=index)
+        index.write(index_path(path), path)
+
+        index = RowIndex.for_csv(path)
+
+        self.assertEqual(250, index.n_rows)
+        self.assertEqual(3, len(index.offsets))
+
+        self.assertEqual([['99', 'line\n99'], ['100', 'line\n100']], list(index.rows(path, 99, 101)))
+        self.assertEqual([['249', 'line\n249']], list(index.rows(path, 249, 300)))
+        self.assertEqual([], list(index.rows(path, 300, 400)))
+
+        # A changed CSV file makes the index stale, even if the size is the same
+        st = stat(path)
+
+        with open(path, 'r+b') as f:
+            f.write(b'A')
+
+        utime(path, (st.st_atime, st.st_mtime + 1))
+
+        self.assertEqual(st.st_size, stat(path).st_size)
+        self.assertIsNone(RowIndex.for_csv(path))
+
+        index = RowIndex(interval=100)
+        write_csv(path, ['a', 'b'], iter(rows), index=index)
+        index.write(index_path(path), path)
+
+        self.assertIsNotNone(RowIndex.for_csv(path))
+
+        with open(path, 'ab') as f:
+            f.write(b'250,x\r\n')
+
+        self.assertIsNone(RowIndex.for_csv(path))
+
+    def test_parallel_ranges(self):
+        from tempfile import mkdtemp
+        from os.path import join
+        from metatab.package import write_csv
+        from metatab.parallel import read_range, cast_range, cast_ranges, PENDING_PER_PROCESS
+        from metatab.rowindex import RowIndex, index_path
+
+        path = join(mkdtemp(), 'rows.csv')
+
+        rows = [[i, 'a "quoted"\nvalue, {}'.format(i)] for i in range(500)]
+
+        index = RowIndex(interval=75)
+        write_csv(path, ['a', 'b'], iter(rows), index=index)
+        index.write(index_path(path), path)
+
+        # Ranges start on the indexed rows, which aren't split by the newlines in the quoted values
+        ends = index.offsets[1:] + [index.file_size]
+        ranges = list(zip(index.offsets, ends))
+
+        self.assertEqual(7, len(ranges))
+
+        read = [row for s, e in ranges for row in read_range(path, s, e)]
+
+        self.assertEqual([[str(a), b] for a, b in rows], read)
+
+        tasks = [dict(path=path, start=s, end=e, first_row=1, encoding='utf8',
+                      columns=[('a', 0, 'integer', None, None), ('b', 1, 'string', None, None)],
+                      env={}, raw=[], post=[], indexes=[0]) for s, e in ranges]
+
+        self.assertEqual([[i] for i in range(500)], [row for rows, errors in map(cast_range, tasks) for row in rows])
+
+        self.assertEqual([[i] for i in range(500)],
+                         [row for rows, errors in cast_ranges(tasks, processes=2) for row in rows])
+
+        # Only a few ranges are sent to the workers ahead of the caller
+        sent = []
+
+        def gen_tasks():
+            for task in tasks:
+                sent.append(task)
+                yield task
+
+        results = cast_ranges(gen_tasks(), processes=1)
+        next(results)
+        self.assertEqual(PENDING_PER_PROCESS + 1, len(sent))
+
+        self.assertEqual(list(range(500)),
+                         sorted(row[0] for rows, errors in cast_ranges(tasks, processes=2, ordered=False)
+                                for row in rows))
+
+    def test_parallel_tasks(self):
+        from tempfile import mkdtemp
+        from os.path import join
+        from metatab.package import write_csv
+        from metatab.rowindex import RowIndex, index_path
+
+        d = mkdtemp()
+        rows = [[i, i / 2.0, 'row {}'.format(i)] for i in range(250)]
+        r = local_doc(d, rows).resource('data')
+
+        self.assertIsNone(r._parallel_tasks(4))  # compile_rows isn't set
+
+        r.compile_rows = True
+
+        self.assertIsNone(r._parallel_tasks(4))  # No row index
+
+        index = RowIndex(interval=100)
+        path = join(d, 'data.csv')
+        write_csv(path, ['a', 'b', 'c'], iter(rows), index=index)
+        index.write(index_path(path), path)
+
+        tasks = r._parallel_tasks(4)
+
+        self.assertEqual([1, 101, 201], [t['first_row'] for t in tasks])
+        self.assertEqual(rows, list(r.iter_parallel(processes=2)))
+
+        for i, c in r._all_column_terms():
+            if c.get_value('name') == 'a':
+                c['transform'] = 'v'
+
+        self.assertIsNone(r._parallel_tasks(4))
+
+    def test_stats(self):
+        from metatab.stats import HyperLogLog, Reservoir, TableStats
+
+        hll = HyperLogLog()
+        for i in range(50000):
+            hll.add(i % 20000)
+
+        self.assertLess(abs(hll.count() - 20000), 20000 * 0.05)
+
+        other = HyperLogLog()
+        for i in range(10):
+            other.add('x{}'.format(i))
+
+        self.assertEqual(10, other.count())
+
+        hll.merge(other)
+        self.assertLess(abs(hll.count() - 20010), 20010 * 0.05)
+
+        res = Reservoir(10, seed=1)
+        for i in range(1000):
+            res.add(i)
+
+        self.assertEqual(10, len(res.values))
+        self.assertEqual(1000, res.n)
+
+        ts = TableStats(['a', 'b'], seed=1)
+        for row in [[1, 'x'], [None, 'y'], [3, ''], [5]]:
+            ts.add(row)
+
+        stats = ts.as_dict()
+
+        self.assertEqual(dict(count=4, nulls=1, distinct=3, min=1, max=5, mean=3.0, std=2.0, median=3),
+                         dict(stats['a']))
+        self.assertEqual(dict(count=4, nulls=2, distinct=2, min='x', max='y', mean=None, std=None, median=None),
+                         dict(stats['b']))
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        fingerprint = r.schema_term[0].fingerprint(exclude=['Column.Min', 'Column.Mean'])
+
+        r.write_stats({'percent': dict(min=0.5, mean=None)})
+
+        c = doc.find_first('Table.Column', value='percent')
+
+        self.assertEqual('0.5', c.get_value('min'))
+        self.assertIsNone(c.get_value('mean'))
+        self.assertEqual(fingerprint, r.schema_term[0].fingerprint(exclude=['Column.Min', 'Column.Mean']))
+
+    def test_resource_attributes(self):
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        self.assertEqual('example1', r.name)
+        self.assertEqual('http://example.com/example1.csv', r.url)
+        self.assertIsNone(r.description)  # A common property without a child
+
+        with self.assertRaises(AttributeError):
+            r.not_a_property
+
+        # Changes through the resource are written to the original term, but each resource keeps its own url
+        r2 = doc.resource('example1')
+
+        r.url = 'other.csv'
+        self.assertEqual('other.csv', doc.find_first('Root.Datafile', name='example1').get_value('url'))
+        self.assertEqual('http://example.com/example1.csv', r2.url)
+
+        t = doc.find_first('Root.Datafile', name='example1')
+        t.new_child('Datafile.Foo', 'bar')
+        self.assertEqual('bar', r.foo)
+        self.assertEqual('bar', t.find_first('foo').value)
+
+    def test_records(self):
+        from metatab.records import record_class
+
+        Rec = record_class(['Year', 'geo id', '1st', 'class', 'get', 'Year'])
+
+        self.assertIs(Rec, record_class(['Year', 'geo id', '1st', 'class', 'get', 'Year']))
+        self.assertEqual(('Year', 'geo_id', '_1st', 'class_', 'get_2', 'Year_2'), Rec.fields)
+
+        r = Rec._make([2010, 'g1', 'a', 'b', 'c'])
+
+        self.assertEqual((2010, 'g1', 'a', 'b', 'c', None), tuple(r))
+        self.assertEqual('g1', r.geo_id)
+        self.assertEqual('g1', r['geo id'])
+        self.assertEqual('g1', r['geo_id'])
+        self.assertEqual('b', r.class_)
+        self.assertEqual('a', r[2])
+        self.assertIn('geo id', r)
+        self.assertEqual({'Year': 2010, 'geo id': 'g1', '1st': 'a', 'class': 'b', 'get': 'c'}, dict(r))
+        self.assertEqual(dict(r), r._asdict())
+        self.assertEqual(2010, r['Year'])  # The first of the duplicated headers
+        self.assertEqual(None, r['Year_2'])
+
+        with self.assertRaises(KeyError):
+            r['not a header']
+
+        with self.assertRaises(AttributeError):
+            r.geo_id = 1
+
+    def test_prefetch(self):
+        from threading import Event
+        from metatab.prefetch import Prefetcher
+
+        items = list('abcdef')
+
+        fetched = []
+        started = {item: Event() for item in items}
+        gates = {item: Event() for item in items}  # A fetch finishes when its gate is set
+
+        def fetch(item):
+            started[item].set()
+            self.assertTrue(gates[item].wait(5))
+            if item == 'c':
+                raise IOError('failed')
+            fetched.append(item)
+            return 100
+
+        for e in gates.values():
+            e.set()
+
+        seen = []
+        p = Prefetcher(items, fetch, depth=2)
+        for item in p:
+            if item == 'a':
+                # The next items are fetched while the current one is used
+                self.assertTrue(started['b'].wait(5))
+
+            seen.append((item, set(fetched)))
+
+        self.assertEqual(items, [item for item, _ in seen])
+        self.assertFalse(started['a'].is_set())  # The caller fetches the first item
+        self.assertEqual({'b', 'd', 'e', 'f'}, set(fetched))
+        self.assertEqual(4, len(fetched))
+        self.assertEqual([2], list(p.errors))
+
+        # An item's fetch is finished before the item is used
+        for i, (item, f) in enumerate(seen):
+            self.assertLessEqual(set(items[1:i + 1]) - {'c'}, f)
+
+        # With no budget, or no depth, nothing is fetched in the background
+        for depth, budget in ((2, 0), (0, None)):
+            del fetched[:]
+            self.assertEqual(items, list(Prefetcher(items, fetch, depth=depth, budget=budget)))
+            self.assertEqual([], fetched)
+
+        # A running fetch reserves its share of the budget. While 'c' is running, and 'b' hasn't been used,
+        # the budget is full, so 'd' isn't started
+        for e in list(started.values()) + list(gates.values()):
+            e.clear()
+
+        gates['b'].set()
+
+        p = iter(Prefetcher(items, fetch, depth=2, budget=200))
+
+        self.assertEqual('a', next(p))
+        self.assertEqual('b', next(p))
+        self.assertTrue(started['c'].wait(5))
+        self.assertFalse(started['d'].is_set())
+
+        gates['c'].set()
+        self.assertEqual('c', next(p))
+        self.assertTrue(started['d'].wait(5))
+
+        for e in gates.values():
+            e.set()
+
+        self.assertEqual(list('def'), list(p))
+
+    def test_build_schedule(self):
+        from collections import OrderedDict
+        from metatab.exc import PackageError
+        from os import _exit, devnull
+        from metatab.schedule import env_is_sendable, resource_dependencies, run_scheduled
+
+        doc = MetatabDoc()
+        s = doc.new_section('Resources', ['Name', 'DependsOn'])
+        s.new_term('Root.Datafile', 'http://example.com/a.csv', name='a')
+        s.new_term('Root.Datafile', 'http://example.com/b.csv', name='b', dependson='a')
+        s.new_term('Root.Datafile', 'http://example.com/c.csv', name='c')
+        s.new_term('Root.Datafile', 'program:d.py', name='d')
+
+        deps = resource_dependencies(list(doc.resources()))
+
+        self.assertEqual({'a': set(), 'b': {'a'}, 'c': set(), 'd': {'a', 'b', 'c'}}, dict(deps))
+
+        tasks = OrderedDict([('a', '1'), ('b', '2'), ('c', 'x'), ('d', '4')])
+
+        results = list(run_scheduled(tasks, deps, int, 2))
+
+        order = [name for name, _, _ in results]
+        self.assertLess(order.index('a'), order.index('b'))
+        self.assertEqual('d', order[-1])
+
+        results = {name: (result, error) for name, result, error in results}
+        self.assertEqual((2, None), results['b'])
+        self.assertIsNone(results['c'][0])
+        self.assertIn('ValueError', results['c'][1])
+
+        # A result that can't be sent back is an error, and a worker that dies doesn't hang the build
+        self.assertEqual([('a', None)], [(n, r) for n, r, e in run_scheduled({'a': devnull}, {}, open, 1)])
+
+        with self.assertRaises(PackageError):
+            list(run_scheduled({'a': 3}, {}, _exit, 1))
+
+        self.assertTrue(env_is_sendable({'int': int}))
+        self.assertFalse(env_is_sendable({'f': lambda x: x}))
+
+        s.new_term('Root.Datafile', 'http://example.com/e.csv', name='e', dependson='f')
+        s.new_term('Root.Datafile', 'http://example.com/f.csv', name='f', dependson='e')
+
+        with self.assertRaises(PackageError):
+            resource_dependencies(list(doc.resources()))
+
+    def test_checkpoint(self):
+        import tempfile
+        from os.path import join
+        from metatab.checkpoint import Checkpoint, file_checksum
+
+        d = tempfile.mkdtemp()
+        data_path = join(d, 'example.csv')
+
+        with open(data_path, 'w') as f:
+            f.write('a,b\n1,2\n')
+
+        self.assertIsNone(Checkpoint.read(d, 'example'))
+
+        fingerprints = {'source': 's1', 'schema': 'h1'}
+
+        Checkpoint('example', fingerprints, file_checksum(data_path)).write(d)
+
+        cp = Checkpoint.read(d, 'example')
+        self.assertTrue(cp.is_current(fingerprints, data_path))
+        self.assertFalse(cp.is_current({'source': 's2', 'schema': 'h1'}, data_path))
+
+        # A source without a version may have changed
+        Checkpoint('example', {'source': None, 'schema': 'h1'}, file_checksum(data_path)).write(d)
+        self.assertFalse(Checkpoint.read(d, 'example').is_current({'source': None, 'schema': 'h1'}, data_path))
+
+        with open(data_path, 'a') as f:
+            f.write('3,4\n')
+
+        self.assertFalse(cp.is_current(fingerprints, data_path))
+
+        Checkpoint.remove(d, 'example')
+        self.assertIsNone(Checkpoint.read(d, 'example'))
+
+        self.assertEqual(cp.as_dict(), Checkpoint.loads(cp.dumps()).as_dict())
+        self.assertIsNone(Checkpoint.loads(b''))
+
+    def test_filesystem_package(self):
+        from tempfile import mkdtemp
+        from os.path import join
+        from metatab.package import FileSystemPackage, ParquetPackage
+        from metatab.arrow import parquet_rows
+
+        d = mkdtemp()
+        rows = [[i, i / 2.0, 'row {}'.format(i)] for i in range(25)]
+
+        for cls in (FileSystemPackage, ParquetPackage):
+            p = cls(local_doc(d, rows))
+            p.sections.root.new_term('Name', 'local')
+            p.compile_rows = True
+
+            # The resource's url is set to the package data file while the source is being read
+            doc = MetatabDoc(p.save(join(d, 'build')))
+            r = doc.resource('data')
+
+            if cls is ParquetPackage:
+                self.assertEqual('data/data.parquet', r.url)
+                self.assertEqual(rows, list(parquet_rows(join(d, 'build', 'local-parquet', r.url)))[1:])
+            else:
+                self.assertEqual('data/data.csv', r.url)
+                self.assertEqual(rows, list(r.iter_rows()))
+
+    def test_depends_fingerprint(self):
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        from os.path import join
+        from metatab.package import FileSystemPackage
+
+        d = mkdtemp()
+
+        try:
+            with open(join(d, 'metadata.csv'), 'w') as f:
+                csv.writer(f).writerows([['Declare', 'metatab-latest'], ['Title', 'Local'],
+                                         ['Section', 'Resources', 'Name', 'DependsOn'],
+                                         ['Datafile', 'http://example.com/a.csv', 'a'],
+                                         ['Datafile', 'http://example.com/b.csv', 'b', 'a']])
+
+            p = FileSystemPackage(MetatabDoc(join(d, 'metadata.csv')))
+            a, b = p.datafiles
+
+            # A resource's fingerprint depends on the data of the resources it depends on, once they're built
+            self.assertIsNotNone(p._depends_fingerprint(a))
+            self.assertIsNone(p._depends_fingerprint(b))
+
+            p._checksums['a'] = 'c1'
+            f1 = p._depends_fingerprint(b)
+            self.assertIsNotNone(f1)
+
+            p._checksums['a'] = 'c2'
+            self.assertNotEqual(f1, p._depends_fingerprint(b))
+
+        finally:
+            rmtree(d)
+
+    def test_zip_entries(self):
+        import tempfile
+        import zipfile
+        from hashlib import sha1
+        from metatab.exc import PackageError
+        import metatab.package as package
+        from metatab.package import ZipPackage, HashingWriter, write_csv
+
+        with self.assertRaises(PackageError):
+            ZipPackage(compression='rar')
+
+        rows = [[i, 'row {}'.format(i)] for i in range(10000)]
+
+        for compression, compress_type in (('stored', zipfile.ZIP_STORED), ('deflate', zipfile.ZIP_DEFLATED),
+                                           ('bzip2', zipfile.ZIP_BZIP2), ('lzma', zipfile.ZIP_LZMA)):
+            p = ZipPackage(compression=compression, compresslevel=1 if compression != 'lzma' else None)
+            p.sections.root.new_term('Name', 'example')
+
+            path = tempfile.mktemp(suffix='.zip')
+            p._init_zf(path)
+
+            # Rows are streamed into the entry
+            with HashingWriter(p._open_entry('data/example.csv')) as f:
+                write_csv(f, ['id', 'name'], iter(rows))
+
+            p.zf.close()
+
+            with zipfile.ZipFile(path) as zf:
+                data = zf.read('example/data/example.csv')
+                info = zf.getinfo('example/data/example.csv')
+
+            self.assertEqual(compress_type, info.compress_type)
+            self.assertEqual(sha1(data).hexdigest(), f.hexdigest())
+            self.assertEqual(10001, len(data.splitlines()))
+            self.assertTrue(data.startswith(b'id,name\r\n0,row 0\r\n'))
+
+        # Pythons that can't write entries with ZipFile.open(), or set the level, use a temporary file
+        open_write, compresslevel = package.ZIP_OPEN_WRITE, package.ZIP_COMPRESSLEVEL
+
+        try:
+            package.ZIP_OPEN_WRITE = package.ZIP_COMPRESSLEVEL = False
+
+            p = ZipPackage(compression='deflate', compresslevel=1)
+            p.sections.root.new_term('Name', 'example')
+
+            path = tempfile.mktemp(suffix='.zip')
+            p._init_zf(path)
+
+            with HashingWriter(p._open_entry('data/example.csv')) as f:
+                write_csv(f, ['id', 'name'], iter(rows))
+
+            p.zf.close()
+
+            with zipfile.ZipFile(path) as zf:
+                self.assertEqual(f.hexdigest(), sha1(zf.read('example/data/example.csv')).hexdigest())
+                self.assertEqual(zipfile.ZIP_DEFLATED, zf.getinfo('example/data/example.csv').compress_type)
+
+        finally:
+            package.ZIP_OPEN_WRITE, package.ZIP_COMPRESSLEVEL = open_write, compresslevel
+
+    def test_multipart_upload(self):
+        from metatab.multipart import MultipartWriter
+        from metatab.package import write_csv
+
+        rows = [[i, 'row {}'.format(i)] for i in range(10000)]
+
+        expected = BytesIO()
+        write_csv(expected, ['id', 'name'], iter(rows))
+        expected = expected.getvalue()
+
+        # Rows are uploaded in parts of at least the part size, as they are written
+        client = LocalS3Client()
+        with MultipartWriter(client, 'bucket', 'data/example.csv', part_size=10000, threads=2) as w:
+            write_csv(w, ['id', 'name'], iter(rows))
+
+        self.assertEqual(expected, client.objects[('bucket', 'data/example.csv')])
+        self.assertEqual(len(expected), w.size)
+        self.assertTrue(len(client.part_sizes) > 5)
+        self.assertTrue(all(size >= 10000 for size in client.part_sizes[:-1]))
+        self.assertEqual({}, client.uploads)
+
+        # A small object is uploaded in one request
+        client = LocalS3Client()
+        with MultipartWriter(client, 'bucket', 'small.csv') as w:
+            w.write(b'a,b\r\n')
+
+        self.assertEqual(b'a,b\r\n', client.objects[('bucket', 'small.csv')])
+        self.assertEqual([], client.part_sizes)
+
+        # A failed part aborts the upload, and the object isn't created
+        client = LocalS3Client(fail_part=3)
+        with self.assertRaises(IOError):
+            with MultipartWriter(client, 'bucket', 'data/example.csv', part_size=10000, threads=2) as w:
+                write_csv(w, ['id', 'name'], iter(rows))
+
+        self.assertEqual({}, client.objects)
+        self.assertEqual(['upload1'], client.aborted)
+
+        # So does an error while writing the rows
+        def bad_rows():
+            for row in rows[:5000]:
+                yield row
+            raise ValueError('bad row')
+
+        client = LocalS3Client()
+        with self.assertRaises(ValueError):
+            with MultipartWriter(client, 'bucket', 'data/example.csv', part_size=10000, threads=2) as w:
+                write_csv(w, ['id', 'name'], bad_rows())
+
+        self.assertEqual({}, client.objects)
+        self.assertEqual(['upload1'], client.aborted)
+
+    def test_env_fingerprint(self):
+        from os.path import join
+        from metatab.checkpoint import env_fingerprint
+        from metatab.rowcompile import empty_str
+        import tempfile
+        import sys
+
+        self.assertEqual(env_fingerprint({}), env_fingerprint(None))
+        self.assertNotEqual(env_fingerprint({}), env_fingerprint({'empty_str': empty_str}))
+
+        # Changing the code of the module that defines a function changes the fingerprint
+        d = tempfile.mkdtemp()
+        path = join(d, 'fp_lib.py')
+
+        with open(path, 'w') as f:
+            f.write('def f(v):\n    return v\n')
+
+        sys.path.insert(0, d)
+        try:
+            import fp_lib
+        finally:
+            sys.path.remove(d)
+
+        fp = env_fingerprint({'f': fp_lib.f})
+
+        with open(path, 'a') as f:
+            f.write('# changed\n')
+
+        self.assertNotEqual(fp, env_fingerprint({'f': fp_lib.f}))
+
+    def test_compiled_matches_rowpipe(self):
+        """Check that the compiled row processor casts rows the same way as rowpipe's RowProcessor"""
+        from metatab.rowcompile import CompiledRowProcessor, compile_row_processor
+
+        try:
+            from rowpipe import RowProcessor
+        except ImportError:
+            RowProcessor = None
+
+        if RowProcessor is None:
+            self.skipTest('rowpipe is not installed')
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        for i, c in r._all_column_terms():
+            c['valuetype'] = None
+
+        n = len(r.source_headers)
+        rows = [[str(2000 + i % 20), 'type', 'gvid{}'.format(i)] + [str(i % 100)] * (n - 3) for i in range(2000)]
+
+        rows.append([''] * n)  # Empty values
+
+        generic = list(RowProcessor(iter(rows), r.row_processor_table(), source_headers=r.source_headers,
+                                    env={}))
+        compiled = list(CompiledRowProcessor(iter(rows), compile_row_processor(r._compiled_columns())))
+
+        self.assertEqual(generic, compiled)
+
+    def test_row_processor_benchmark(self):
+        """Compare the time of the compiled row processor to rowpipe's RowProcessor"""
+        from time import time
+        from metatab.rowcompile import CompiledRowProcessor, compile_row_processor
+
+        try:
+            from rowpipe import RowProcessor
+        except ImportError:
+            RowProcessor = None
+
+        if RowProcessor is None:
+            self.skipTest('rowpipe is not installed')
+
+        doc = MetatabDoc(test_data('example1.csv'))
+        r = doc.resource('example1')
+
+        for i, c in r._all_column_terms():
+            c['valuetype'] = None
+
+        n = len(r.source_headers)
+        rows = [[str(2000 + i % 20), 'type', 'gvid{}'.format(i)] + [str(i % 100)] * (n - 3) for i in range(20000)]
+
+        t0 = time()
+        generic = list(RowProcessor(iter(rows), r.row_processor_table(), source_headers=r.source_headers,
+                                    env={}))
+        t1 = time()
+        compiled = list(CompiledRowProcessor(iter(rows), compile_row_processor(r._compiled_columns())))
+        t2 = time()
+
+        self.assertEqual(generic, compiled)
+        self.assertLess(t2 - t1, t1 - t0)
+
+    def test_parquet(self):
+        from tempfile import NamedTemporaryFile
+        from metatab.arrow import write_parquet, parquet_rows
+
+        with NamedTemporaryFile(suffix='.parquet') as f:
+            write_parquet(f.name, ['a', 'b', 'c'], ['integer', 'number', 'string'],
+                          iter([[1, 1.5, 'x'], ['bad', None, 2], [3]]))
+
+            rows = list(parquet_rows(f.name))
+
+        self.assertEqual(['a', 'b', 'c'], rows[0])
+        self.assertEqual([[1, 1.5, 'x'], [None, None, '2'], [3, None, None]], rows[1:])
+
+    def test_to_arrow(self):
+        from tempfile import mkdtemp
+
+        rows = [[i, i / 2.0, 'row {}'.format(i)] for i in range(25)]
+
+        r = local_doc(mkdtemp(), rows).resource('data')
+
+        # More than one batch, so each batch must keep its own values
+        t = r.to_arrow(size=10)
+
+        self.assertEqual(3, len(t.to_batches()))
+        self.assertEqual(rows, [list(row.values()) for row in t.to_pylist()])
+
+    def test_row_cache(self):
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        from metatab.rowcache import RowCache
+
+        d = mkdtemp()
+
+        try:
+            rc = RowCache(d, max_size=10 ** 6)
+
+            w = rc.writer('a', ['a', 'b'], ['integer', 'string'])
+            w.add([1, 'x'])
+            w.add([2, None])
+            w.commit()
+
+            self.assertTrue(rc.get('a'))
+            self.assertEqual([[1, 'x'], [2, None]], list(rc.rows('a')))
+
+            # A value that doesn't match the column type abandons the entry
+            w = rc.writer('b', ['a', 'b'], ['integer', 'string'])
+            w.add(['bad', 'x'])
+            w.commit()
+            self.assertIsNone(rc.get('b'))
+
+            rc.max_size = 0
+            rc.evict()
+            self.assertIsNone(rc.get('a'))
+
+        finally:
+            rmtree(d)
+
+    def test_resource_row_cache(self):
+        from tempfile import mkdtemp
+        from shutil import rmtree
+        from os import listdir, stat, utime
+        from os.path import join
+        from metatab.rowcache import RowCache
+
+        # The first iteration fills the cache, and the second reads it
+        d = mkdtemp()
+
+        try:
+            r = local_doc(d, [[i, i / 2.0, 'row {}'.format(i)] for i in range(10)]).resource('data')
+
+            self.assertIsNone(r._row_cache()[0])  # Off, unless enabled
+
+            r.row_cache = RowCache(join(d, 'cache'))
+            rc, key = r._row_cache()
+
+            # Statistics are computed without the cache
+            self.assertEqual(10, r.compute_stats(write=False, parallel=False)['a']['count'])
+            self.assertFalse(rc.get(key))
+
+            rows = list(r)
+            self.assertEqual(['a', 'b', 'c'], rows[0])
+            self.assertEqual([3, 1.5, 'row 3'], rows[4])
+            self.assertEqual(key + '.parquet', ''.join(listdir(rc.directory)))
+
+            # Change the source without changing its version, so the rows must come from the cache
+            path = join(d, 'data.csv')
+            st = stat(path)
+
+            with open(path, 'rb') as f:
+                data = f.read()
+
+            with open(path, 'wb') as f:
+                f.write(data.replace(b'row 3', b'row X'))
+
+            utime(path, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+            self.assertEqual(rows, list(r))
+            self.assertEqual(rows, list(r.select(['a', 'b', 'c'])))
+
+            # Changing the source changes the key
+            with open(path, 'a') as f:
+                f.write('10,5.0,row 10\r\n')
+
+            self.assertNotEqual(key, r._row_cache()[1])
+            self.assertEqual(12, len(list(r)))
+
+        finally:
+            rmtree(d)
+
     def test_descendents(self):
 
         doc = MetatabDoc(test_data('example1.csv'))
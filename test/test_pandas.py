@@ -21,5 +21,51 @@ class MyTestCase(unittest.TestCase):
 
         print(df.head())
 
+    def test_frame_builder(self):
+        from collections import OrderedDict
+        import numpy as np
+        from metatab.doc import ColumnBatch
+        from metatab.pands import FrameBuilder
+
+        def batch(a, b, c):
+            cols = OrderedDict([('a', np.ma.MaskedArray(a, mask=[v == 0 for v in a])),
+                                ('b', np.ma.MaskedArray(b)),
+                                ('c', c)])
+            return ColumnBatch(cols, list(cols.keys()), {})
+
+        fb = FrameBuilder(['a', 'b', 'c'], ['integer', 'number', 'string'], [None, None, ['x', 'y']])
+
+        self.assertTrue(fb.add(batch([1, 0], [1.5, 2.5], ['x', 'y']), limit=3))
+        self.assertFalse(fb.add(batch([3, 4], [3.5, 4.5], ['y', 'x']), limit=3))
+
+        df = fb.frame()
+
+        self.assertEqual((3, 3), df.shape)
+        self.assertEqual(['Int64', 'float64', 'category'], [str(e) for e in df.dtypes])
+        self.assertTrue(df['a'].isna()[1])
+        self.assertEqual([1.5, 2.5, 3.5], list(df['b']))
+
+        # Value set categories are strings, so they're cast for numeric columns
+        fb = FrameBuilder(['a', 'b'], ['integer', 'integer'], [['1', '2'], ['1', 'x']])
+        fb.add(ColumnBatch([np.ma.MaskedArray([1, 2, 0], mask=[False, False, True]),
+                            np.ma.MaskedArray([1, 2, 3])], ['a', 'b'], {}))
+
+        df = fb.frame()
+
+        self.assertEqual(['category', 'Int64'], [str(e) for e in df.dtypes])
+        self.assertEqual([1, 2], list(df['a'].cat.categories))
+        self.assertEqual([1, 2], list(df['a'][:2]))
+        self.assertTrue(df['a'].isna()[2])
+
+        # Datatypes are paired with the columns by position, so duplicated headers keep their own types
+        fb = FrameBuilder(['a', 'a'], ['integer', 'string'])
+        fb.add(ColumnBatch([np.ma.MaskedArray([1, 2]), ['x', 'y']], ['a', 'a'], {}))
+
+        df = fb.frame()
+
+        self.assertEqual('Int64', str(df.dtypes.iloc[0]))
+        self.assertNotEqual('Int64', str(df.dtypes.iloc[1]))
+        self.assertEqual([[1, 'x'], [2, 'y']], df.values.tolist())
+
 if __name__ == '__main__':
     unittest.main()